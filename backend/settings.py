@@ -53,6 +53,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    "core.middleware.TenantContextMiddleware",
+    "core.middleware.LogoVariantCacheMiddleware",
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -147,7 +149,7 @@ AUTH_USER_MODEL = "users.User"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.TenantJWTAuthentication",
         "rest_framework.authentication.SessionAuthentication",
         # Más adelante podemos meter JWT
     ],
@@ -155,8 +157,55 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.IsAuthenticated",
     ],
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    # Paginación por cursor (keyset) en todos los listados
+    "DEFAULT_PAGINATION_CLASS": "core.pagination.KeysetPagination",
+    "PAGE_SIZE": 50,
 }
 
+SIMPLE_JWT = {
+    "TOKEN_OBTAIN_SERIALIZER": "users.serializers.TenantTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "users.serializers.TenantTokenRefreshSerializer",
+}
+
+# Embebe workspaces/roles firmados en el access token; las lecturas pueden
+# autenticarse sin cargar el usuario (users.authentication).
+# Desactivado por defecto: requiere un cache compartido entre procesos
+# (REDIS_URL), ver users.checks
+JWT_TENANT_CLAIMS = os.getenv("JWT_TENANT_CLAIMS", "false").lower() in ("1", "true", "yes")
+
+# Cache compartido entre workers; sin REDIS_URL Django usa LocMemCache (por proceso)
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+
+# Adjuntos guardados una sola vez por workspace según su SHA-256 (core.blobs).
+# Los adjuntos existentes se migran con `manage.py dedupe_attachments`
+ATTACHMENT_CONTENT_ADDRESSED = os.getenv("ATTACHMENT_CONTENT_ADDRESSED", "false").lower() in ("1", "true", "yes")
+
+# Cola de trabajos (core.jobs): en producción las tareas lentas las ejecuta
+# `manage.py run_worker`. Sin worker (desarrollo) JOB_QUEUE_EAGER=true las
+# corre en el mismo proceso al hacer commit
+JOB_QUEUE_EAGER = os.getenv("JOB_QUEUE_EAGER", "false").lower() in ("1", "true", "yes")
+
+# Correo saliente; sin EMAIL_HOST los correos solo se imprimen en consola
+if os.getenv("EMAIL_HOST"):
+    EMAIL_HOST = os.getenv("EMAIL_HOST")
+    EMAIL_PORT = int(os.getenv("EMAIL_PORT", "587"))
+    EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER", "")
+    EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD", "")
+    EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "true").lower() in ("1", "true", "yes")
+    DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", "webmaster@localhost")
+else:
+    EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
+
+# Manda por correo la invitación al portal (core.tasks); sin esto solo se
+# regresa el enlace en la respuesta
+CLIENT_INVITATION_EMAIL = os.getenv("CLIENT_INVITATION_EMAIL", "false").lower() in ("1", "true", "yes")
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "Sistema Profesionales API",
     "DESCRIPTION": "Documentación OpenAPI para el backend.",
@@ -1,10 +1,11 @@
 # apps/core/admin.py
 from django.contrib import admin
-from .models import Workspace, WorkspaceMember, Client, Service, Appointment, Consultation
+from .models import Workspace, WorkspaceMember, Client, Service, Appointment, AppointmentSeries, Consultation
 
 admin.site.register(Workspace)
 admin.site.register(WorkspaceMember)
 admin.site.register(Client)
 admin.site.register(Service)
 admin.site.register(Appointment)
+admin.site.register(AppointmentSeries)
 admin.site.register(Consultation)
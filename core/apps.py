@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from . import signals, tasks  # noqa: F401
+        from .search import ensure_sqlite_search_triggers
+
+        post_migrate.connect(ensure_sqlite_search_triggers, sender=self)
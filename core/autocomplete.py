@@ -0,0 +1,107 @@
+# core/autocomplete.py
+import re
+import unicodedata
+from difflib import SequenceMatcher
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+# Campos que necesita el selector de clientes (nada más)
+AUTOCOMPLETE_FIELDS = ("id", "full_name", "email", "phone")
+
+FUZZY_MIN_LENGTH = 3
+# Sin pg_trgm (SQLite en desarrollo) el difuso se hace en Python sobre a lo
+# más este número de candidatos
+FALLBACK_CANDIDATES = 5000
+FALLBACK_CUTOFF = 0.6
+
+
+def normalize_text(value):
+    """'  José   PÉREZ ' -> 'jose perez' (minúsculas, sin acentos, espacios simples)."""
+    value = unicodedata.normalize("NFKD", value or "")
+    value = "".join(ch for ch in value if not unicodedata.combining(ch))
+    return " ".join(value.lower().split())
+
+
+def normalize_email(value):
+    return (value or "").strip().lower()
+
+
+def normalize_phone(value):
+    return re.sub(r"\D", "", value or "")
+
+
+def _prefix(field, value):
+    """
+    Prefijo como rango [valor, valor+1) para que use el índice B-tree en
+    cualquier motor; el startswith deja el resultado exacto sin importar la
+    collation.
+    """
+    upper = value[:-1] + chr(ord(value[-1]) + 1)
+    return Q(**{f"{field}__gte": value, f"{field}__lt": upper, f"{field}__startswith": value})
+
+
+def prefix_filter(query):
+    name = normalize_text(query)
+    condition = Q(pk__in=[])
+    if name:
+        condition |= _prefix("search_name", name)
+    email = normalize_email(query)
+    if email:
+        condition |= _prefix("search_email", email)
+    phone = normalize_phone(query)
+    if len(phone) >= 3:
+        condition |= _prefix("search_phone", phone)
+    return condition
+
+
+def _fuzzy_postgres(queryset, name, limit):
+    """word_similarity de pg_trgm (índice GIN core_client_search_name_trgm)."""
+    return list(
+        queryset
+        .filter(RawSQL("%s <%% core_client.search_name", [name], output_field=BooleanField()))
+        .annotate(similarity=RawSQL("word_similarity(%s, core_client.search_name)", [name], output_field=FloatField()))
+        .order_by("-similarity", "search_name", "id")
+        .values(*AUTOCOMPLETE_FIELDS)[:limit]
+    )
+
+
+def _fuzzy_fallback(queryset, name, limit):
+    """Difuso con difflib: se compara contra el nombre completo y cada palabra."""
+    scored = []
+    candidates = queryset.values(*AUTOCOMPLETE_FIELDS, "search_name")[:FALLBACK_CANDIDATES]
+    for row in candidates:
+        best = 0
+        for token in [row["search_name"], *row["search_name"].split()]:
+            matcher = SequenceMatcher(None, name, token)
+            if matcher.quick_ratio() >= FALLBACK_CUTOFF:
+                best = max(best, matcher.ratio())
+        if best >= FALLBACK_CUTOFF:
+            scored.append((-best, row["search_name"], row["id"], row))
+    scored.sort(key=lambda item: item[:3])
+    return [{field: row[field] for field in AUTOCOMPLETE_FIELDS} for *_, row in scored[:limit]]
+
+
+def autocomplete_clients(queryset, query, limit=10):
+    """
+    Clientes para el selector: primero coincidencias por prefijo (nombre,
+    correo o teléfono) y, si faltan, coincidencias aproximadas por nombre.
+    """
+    results = list(
+        queryset
+        .filter(prefix_filter(query))
+        .order_by("search_name", "id")
+        .values(*AUTOCOMPLETE_FIELDS)[:limit]
+    )
+
+    name = normalize_text(query)
+    if len(results) >= limit or len(name) < FUZZY_MIN_LENGTH:
+        return results
+
+    remaining = queryset.exclude(pk__in=[row["id"] for row in results])
+    if connection.vendor == "postgresql":
+        results += _fuzzy_postgres(remaining, name, limit - len(results))
+    else:
+        results += _fuzzy_fallback(remaining, name, limit - len(results))
+    return results
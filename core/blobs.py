@@ -0,0 +1,167 @@
+# core/blobs.py
+import hashlib
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import AttachmentBlob, attachment_blob_upload_to
+
+# Adjuntos guardados una vez por workspace según su SHA-256. Opcional: los
+# adjuntos previos se migran con el comando dedupe_attachments
+CONTENT_ADDRESSED = getattr(settings, "ATTACHMENT_CONTENT_ADDRESSED", False)
+
+READ_CHUNK = 1024 * 1024
+HEAD_SIZE = 512
+
+
+class HashingReader:
+    """Envuelve un archivo: calcula SHA-256, tamaño y primeros bytes al leer."""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.head = b""
+        self.created_blob = False
+
+    def read(self, size=-1):
+        data = self.fileobj.read(READ_CHUNK if size is None or size < 0 else size)
+        self.digest.update(data)
+        self.size += len(data)
+        if len(self.head) < HEAD_SIZE:
+            self.head += data[:HEAD_SIZE - len(self.head)]
+        return data
+
+    def exhaust(self):
+        while self.read(READ_CHUNK):
+            pass
+        return self
+
+    @property
+    def sha256(self):
+        return self.digest.hexdigest()
+
+
+def acquire_blob(workspace_id, sha256, size_bytes, open_content):
+    """
+    (blob, creado) del workspace con ese contenido, sumando una referencia.
+    Si no existe, escribe `open_content()` en el storage; si ya existe no
+    escribe nada.
+    """
+    with transaction.atomic():
+        # El lock evita que release_blob lo borre entre el get y el +1
+        blob = AttachmentBlob.objects.select_for_update().filter(workspace_id=workspace_id, sha256=sha256).first()
+        if blob is not None:
+            AttachmentBlob.objects.filter(pk=blob.pk).update(ref_count=F("ref_count") + 1)
+            return blob, False
+
+    blob = AttachmentBlob(workspace_id=workspace_id, sha256=sha256, size_bytes=size_bytes, ref_count=1)
+    name = attachment_blob_upload_to(blob, "")
+    blob.file.name = default_storage.save(name, File(open_content(), name=name))
+    with transaction.atomic():
+        existing, created = AttachmentBlob.objects.get_or_create(
+            workspace_id=workspace_id,
+            sha256=sha256,
+            defaults={"file": blob.file.name, "size_bytes": size_bytes, "ref_count": 1},
+        )
+        if not created:
+            # Otra subida del mismo contenido ganó la carrera
+            AttachmentBlob.objects.filter(pk=existing.pk).update(ref_count=F("ref_count") + 1)
+    if not created and existing.file.name != blob.file.name:
+        default_storage.delete(blob.file.name)
+    return existing, created
+
+
+def release_blob(blob_id):
+    """Quita una referencia; sin referencias, borra el blob y su archivo."""
+    if not blob_id:
+        return
+    with transaction.atomic():
+        AttachmentBlob.objects.filter(pk=blob_id, ref_count__gt=0).update(ref_count=F("ref_count") - 1)
+        orphan = AttachmentBlob.objects.select_for_update().filter(pk=blob_id, ref_count=0).first()
+        if orphan is None:
+            return
+        names = [orphan.file.name, orphan.thumbnail.name, orphan.preview.name]
+        orphan.delete()
+        transaction.on_commit(lambda: delete_stored(names))
+
+
+def delete_stored(names):
+    for name in names:
+        if name:
+            default_storage.delete(name)
+
+
+def store_attachment_content(attachment, open_content, filename):
+    """
+    Guarda el contenido de `attachment` (sin salvar el modelo) y regresa el
+    HashingReader con tamaño, SHA-256 y primeros bytes. `open_content()`
+    debe regresar el contenido desde el inicio cada vez que se llama.
+
+    Por contenido: se lee una vez para el SHA-256 y solo se escribe si el
+    workspace no tiene ya ese contenido. Si no, se escribe como siempre en
+    la ruta del expediente.
+    """
+    if not CONTENT_ADDRESSED:
+        reader = HashingReader(open_content())
+        attachment.file.save(filename, File(reader, name=filename), save=False)
+        return reader
+
+    reader = HashingReader(open_content()).exhaust()
+    blob, reader.created_blob = acquire_blob(attachment.workspace_id, reader.sha256, reader.size, open_content)
+    attachment.blob = blob
+    attachment.file.name = blob.file.name
+    return reader
+
+
+def discard_attachment_content(attachment, content):
+    """Deshace store_attachment_content (p. ej. si el tamaño no cuadra)."""
+    if attachment.blob_id:
+        blob = attachment.blob
+        release_blob(blob.pk)
+        if content.created_blob:
+            # Si la transacción de afuera se revierte, el on_commit de
+            # release_blob no corre: el archivo recién escrito se borra aquí
+            default_storage.delete(blob.file.name)
+        attachment.blob = None
+    elif attachment.file:
+        attachment.file.delete(save=False)
+
+
+def adopt_attachment_file(attachment):
+    """
+    Pasa un adjunto previo (sin blob) a almacenamiento por contenido sin
+    copiar bytes: si el workspace ya tiene ese contenido se apunta al blob y
+    se borra el archivo duplicado; si no, su archivo se vuelve el blob.
+    Regresa los bytes liberados.
+    """
+    with attachment.file.storage.open(attachment.file.name, "rb") as fileobj:
+        content = HashingReader(fileobj).exhaust()
+
+    old_name = attachment.file.name
+    with transaction.atomic():
+        blob = AttachmentBlob.objects.select_for_update().filter(
+            workspace_id=attachment.workspace_id, sha256=content.sha256,
+        ).first()
+        if blob is None:
+            blob = AttachmentBlob.objects.create(
+                workspace_id=attachment.workspace_id,
+                sha256=content.sha256,
+                file=old_name,
+                size_bytes=content.size,
+                ref_count=1,
+            )
+        else:
+            AttachmentBlob.objects.filter(pk=blob.pk).update(ref_count=F("ref_count") + 1)
+
+        type(attachment).objects.filter(pk=attachment.pk).update(
+            blob=blob, file=blob.file.name, size_bytes=content.size, updated_at=timezone.now(),
+        )
+        if blob.file.name == old_name:
+            return 0
+        transaction.on_commit(lambda: default_storage.delete(old_name))
+    return content.size
@@ -0,0 +1,306 @@
+# core/bulk.py
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .exceptions import AppointmentConflict
+from .models import Appointment, Client, Service
+from .scheduling import FREE_STATUSES, BatchOverlapChecker, default_end, is_overlap_violation, span_error
+from .serializers import AppointmentBulkItemSerializer
+from .tenancy import workspace_staff
+
+CONFLICT_MESSAGE = "El profesional ya tiene una cita en ese horario."
+SIMPLE_FIELDS = ["status", "modality", "notes_internal", "notes_for_client"]
+
+
+def _ok(index, pk):
+    return {"index": index, "id": pk, "ok": True}
+
+
+def _error(index, errors, pk=None):
+    return {"index": index, "id": pk, "ok": False, "errors": errors}
+
+
+def _validate_items(items, partial):
+    """Valida la forma de cada item: [(index, validated_data | None, errores | None)]."""
+    rows = []
+    for index, raw in enumerate(items):
+        serializer = AppointmentBulkItemSerializer(data=raw, partial=partial)
+        if serializer.is_valid():
+            rows.append((index, serializer.validated_data, None))
+        else:
+            rows.append((index, None, serializer.errors))
+    return rows
+
+
+def _load_related(workspace_ids, rows):
+    """
+    Clientes, servicios y profesionales del lote: un query por tipo (más
+    uno para saber en qué workspace atiende cada profesional).
+    """
+    valid = [data for _, data, _ in rows if data is not None]
+    client_ids = {d["client"] for d in valid if d.get("client")}
+    service_ids = {d["service"] for d in valid if d.get("service")}
+    professional_ids = {d["professional"] for d in valid if d.get("professional")}
+    staff = workspace_staff(workspace_ids, professional_ids)
+    users = get_user_model().objects.filter(is_active=True).in_bulk({user_id for _, user_id in staff})
+    return (
+        Client.objects.for_workspaces(workspace_ids).in_bulk(client_ids),
+        Service.objects.for_workspaces(workspace_ids).in_bulk(service_ids),
+        # {(workspace_id, user_id): usuario}
+        {key: users[key[1]] for key in staff if key[1] in users},
+    )
+
+
+def _resolve_relations(data, workspace_id, clients, services, professionals, errors):
+    """Traduce ids -> instancias (de los mapas precargados) validando el workspace."""
+    resolved = {}
+    if "client" in data:
+        client = clients.get(data["client"])
+        if client is None or client.workspace_id != workspace_id:
+            errors["client"] = ["Cliente no encontrado en el workspace."]
+        resolved["client"] = client
+    if "service" in data:
+        service = None
+        if data["service"]:
+            service = services.get(data["service"])
+            if service is None or service.workspace_id != workspace_id:
+                errors["service"] = ["Servicio no encontrado en el workspace."]
+        resolved["service"] = service
+    if "professional" in data:
+        professional = None
+        if data["professional"]:
+            professional = professionals.get((workspace_id, data["professional"]))
+            if professional is None:
+                errors["professional"] = ["Profesional no encontrado en el workspace."]
+        resolved["professional"] = professional
+    return resolved
+
+
+def _reserve_slots(pending, results, stored=None):
+    """
+    Revisa traslapes de todo el lote contra la agenda (un query) y entre sí.
+    Regresa solo los items que pasan; los demás quedan como error en `results`.
+
+    `stored`: {pk: (professional_id, start, end)} de citas que el lote mueve.
+    Su horario guardado se considera libre, pero si una se rechaza se queda
+    donde estaba: su horario vuelve a estar ocupado y se revisa otra vez el
+    resto (normalmente basta una vuelta).
+    """
+    stored = stored or {}
+    candidates = list(pending)
+    kept = []
+    while True:
+        active = [(index, appt) for index, appt in candidates if appt.status not in FREE_STATUSES]
+        checker = BatchOverlapChecker(
+            [(appt.professional_id, appt.start, appt.end) for _, appt in active]
+            + [stored[pk] for pk in kept],
+            exclude_ids=list(stored),
+        )
+        for pk in kept:
+            checker.occupy(*stored[pk])
+
+        accepted, rejected = [], []
+        for index, appt in sorted(candidates, key=lambda item: item[1].start):
+            if appt.status not in FREE_STATUSES and not checker.reserve(appt.professional_id, appt.start, appt.end):
+                results[index] = _error(index, {"start": [CONFLICT_MESSAGE]}, pk=appt.pk)
+                rejected.append((index, appt))
+                continue
+            accepted.append((index, appt))
+
+        newly_kept = [appt.pk for _, appt in rejected if appt.pk in stored]
+        if not newly_kept:
+            return sorted(accepted, key=lambda item: item[0])
+        # Con más horarios ocupados los rechazados siguen rechazados
+        kept += newly_kept
+        rejected_ids = {index for index, _ in rejected}
+        candidates = [(index, appt) for index, appt in candidates if index not in rejected_ids]
+
+
+def _atomic(write):
+    """Escribe el lote en una transacción; una carrera con la exclusion constraint -> 409."""
+    try:
+        with transaction.atomic():
+            write()
+    except IntegrityError as exc:
+        if not is_overlap_violation(exc):
+            raise
+        raise AppointmentConflict(detail="Otra operación ocupó alguno de los horarios; intenta de nuevo.")
+
+
+def bulk_create_appointments(workspace, user, items):
+    """
+    Crea varias citas con un solo bulk_create.
+    Sin 'end' se usa la duración del servicio o 30 minutos (igual que perform_create).
+    Regresa (resultados por item, citas creadas).
+    """
+    rows = _validate_items(items, partial=False)
+    clients, services, professionals = _load_related([workspace.pk], rows)
+
+    results = [None] * len(items)
+    pending = []
+    for index, data, errors in rows:
+        if errors:
+            results[index] = _error(index, errors)
+            continue
+        errors = {}
+        related = _resolve_relations(data, workspace.pk, clients, services, professionals, errors)
+        start = data["start"]
+        end = data.get("end") or default_end(start, related.get("service"))
+        span = span_error(start, end)
+        if span:
+            errors["end"] = [span]
+        if errors:
+            results[index] = _error(index, errors)
+            continue
+        pending.append((index, Appointment(
+            workspace=workspace,
+            client=related["client"],
+            service=related.get("service"),
+            professional=related.get("professional") or user,
+            start=start,
+            end=end,
+            status=data.get("status", Appointment.STATUS_SCHEDULED),
+            modality=data.get("modality", Appointment.MODALITY_PRESENTIAL),
+            notes_internal=data.get("notes_internal", ""),
+            notes_for_client=data.get("notes_for_client", ""),
+        )))
+
+    created = []
+
+    def write():
+        accepted = _reserve_slots(pending, results)
+        created.extend(appt for _, appt in accepted)
+        Appointment.objects.bulk_create(created)
+        for index, appt in accepted:
+            results[index] = _ok(index, appt.pk)
+
+    _atomic(write)
+    return results, created
+
+
+def bulk_update_appointments(queryset, items):
+    """
+    Edición parcial de varias citas con un solo bulk_update.
+    Si cambia 'start' sin 'end', la cita conserva su duración.
+    Regresa (resultados por item, citas actualizadas).
+    """
+    rows = _validate_items(items, partial=True)
+    ids = {data["id"] for _, data, _ in rows if data and data.get("id")}
+    appointments = queryset.select_related("client", "service").in_bulk(ids)
+    clients, services, professionals = _load_related({a.workspace_id for a in appointments.values()}, rows)
+
+    results = [None] * len(items)
+    pending = []
+    stored = {}
+    seen = set()
+    fields = set()
+    for index, data, errors in rows:
+        if errors:
+            results[index] = _error(index, errors)
+            continue
+        pk = data.get("id")
+        appt = appointments.get(pk)
+        if appt is None:
+            results[index] = _error(index, {"id": ["Cita no encontrada."]}, pk=pk)
+            continue
+        if pk in seen:
+            results[index] = _error(index, {"id": ["Cita repetida en el lote."]}, pk=pk)
+            continue
+        seen.add(pk)
+
+        errors = {}
+        related = _resolve_relations(data, appt.workspace_id, clients, services, professionals, errors)
+        start = data.get("start", appt.start)
+        end = data.get("end") or (start + (appt.end - appt.start) if "start" in data else appt.end)
+        span = span_error(start, end)
+        if span:
+            errors["end"] = [span]
+        if errors:
+            results[index] = _error(index, errors, pk=pk)
+            continue
+
+        status = data.get("status", appt.status)
+        if status != appt.status and status not in Appointment.STATUS_TRANSITIONS[appt.status]:
+            results[index] = _error(
+                index, {"status": [f"No se puede pasar de '{appt.status}' a '{status}'."]}, pk=pk
+            )
+            continue
+
+        if appt.status not in FREE_STATUSES:
+            stored[pk] = (appt.professional_id, appt.start, appt.end)
+        for name, value in related.items():
+            setattr(appt, name, value)
+        for name in SIMPLE_FIELDS:
+            if name in data:
+                setattr(appt, name, data[name])
+        if start != appt.start and appt.reminder_sent_at:
+            # Reprogramada: vuelve a tocar recordatorio (core.reminders)
+            appt.reminder_sent_at = None
+            fields.add("reminder_sent_at")
+        appt.start, appt.end = start, end
+        fields.update(related)
+        fields.update(name for name in SIMPLE_FIELDS if name in data)
+        if "start" in data or "end" in data:
+            fields.update(["start", "end"])
+        pending.append((index, appt))
+
+    updated = []
+
+    def write():
+        accepted = _reserve_slots(pending, results, stored)
+        now = timezone.now()
+        for index, appt in accepted:
+            # bulk_update no aplica auto_now
+            appt.updated_at = now
+            updated.append(appt)
+            results[index] = _ok(index, appt.pk)
+        if updated:
+            Appointment.objects.bulk_update(updated, sorted(fields | {"updated_at"}))
+
+    _atomic(write)
+    return results, updated
+
+
+def bulk_change_status(queryset, ids, status):
+    """
+    Cambio de estado masivo (p. ej. cancelar la agenda de un día) con un
+    solo UPDATE. Respeta Appointment.STATUS_TRANSITIONS y, al reactivar
+    citas canceladas, revisa traslapes. Regresa resultados por id.
+    """
+    appointments = queryset.select_related(None).only("id", "status", "professional", "start", "end").in_bulk(ids)
+
+    results = [None] * len(ids)
+    pending = []
+    for index, pk in enumerate(ids):
+        appt = appointments.get(pk)
+        if appt is None:
+            results[index] = _error(index, {"id": ["Cita no encontrada."]}, pk=pk)
+        elif appt.status == status:
+            results[index] = _ok(index, pk)
+        elif status not in Appointment.STATUS_TRANSITIONS[appt.status]:
+            results[index] = _error(
+                index, {"status": [f"No se puede pasar de '{appt.status}' a '{status}'."]}, pk=pk
+            )
+        else:
+            pending.append((index, appt))
+
+    def write():
+        accepted = pending
+        if status not in FREE_STATUSES:
+            # Reactivar canceladas / no-show vuelve a ocupar su horario
+            reactivated = [(index, appt) for index, appt in pending if appt.status in FREE_STATUSES]
+            for _, appt in reactivated:
+                appt.status = status
+            kept = {index for index, _ in _reserve_slots(reactivated, results)}
+            blocked = {index for index, _ in reactivated} - kept
+            accepted = [(index, appt) for index, appt in pending if index not in blocked]
+        if accepted:
+            queryset.filter(pk__in=[appt.pk for _, appt in accepted]).update(
+                status=status, updated_at=timezone.now()
+            )
+        for index, appt in accepted:
+            results[index] = _ok(index, appt.pk)
+
+    _atomic(write)
+    return results
@@ -0,0 +1,97 @@
+# core/casefile_stats.py
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest, Substr
+from django.utils import timezone
+
+from .models import CaseAttachment, CaseEvent, CaseFile
+
+PREVIEW_LENGTH = 200
+
+
+def event_preview(body):
+    return (body or "")[:PREVIEW_LENGTH]
+
+
+def stats_expressions(CaseEvent, CaseAttachment):
+    """
+    Expresiones para recalcular el resumen de expedientes en un solo UPDATE.
+    (La migración 0017 tiene su propia copia; cambios aquí no la afectan.)
+    """
+    events = CaseEvent.objects.filter(casefile=OuterRef("pk")).order_by()
+    attachments = CaseAttachment.objects.filter(casefile=OuterRef("pk")).order_by()
+    latest = events.order_by("-happened_at", "-id")
+    last_event_at = Subquery(latest.values("happened_at")[:1])
+
+    def count(qs):
+        return Coalesce(Subquery(qs.values("casefile").annotate(n=Count("id")).values("n")), 0)
+
+    return {
+        "events_count": count(events),
+        "attachments_count": count(attachments),
+        "last_event_at": last_event_at,
+        "last_event_title": Coalesce(Subquery(latest.values("title")[:1]), Value("")),
+        "last_event_preview": Coalesce(
+            Subquery(latest.annotate(preview=Substr("body", 1, PREVIEW_LENGTH)).values("preview")[:1]),
+            Value(""),
+        ),
+        # Greatest con NULL: Postgres lo ignora, SQLite regresa NULL
+        "last_activity_at": Coalesce(Greatest(F("opened_at"), last_event_at), F("opened_at")),
+    }
+
+
+def recompute_casefile_stats(queryset):
+    """Recalcula el resumen de los expedientes del queryset (un UPDATE)."""
+    return queryset.update(**stats_expressions(CaseEvent, CaseAttachment), updated_at=timezone.now())
+
+
+# -------------------------
+# incrementales (core.signals)
+# -------------------------
+def event_added(event):
+    CaseFile.objects.filter(pk=event.casefile_id).update(
+        events_count=F("events_count") + 1,
+        last_activity_at=Greatest(F("last_activity_at"), Value(event.happened_at)),
+        updated_at=timezone.now(),
+    )
+    # Solo si es el evento más reciente
+    CaseFile.objects.filter(
+        Q(last_event_at__isnull=True) | Q(last_event_at__lte=event.happened_at),
+        pk=event.casefile_id,
+    ).update(
+        last_event_at=event.happened_at,
+        last_event_title=event.title,
+        last_event_preview=event_preview(event.body),
+        updated_at=timezone.now(),
+    )
+
+
+def event_removed(casefile_id):
+    adjust_events(casefile_id, -1)
+    refresh_last_event([casefile_id])
+
+
+def refresh_last_event(casefile_ids):
+    """Vuelve a tomar el último evento (editado / borrado / movido de expediente)."""
+    expressions = stats_expressions(CaseEvent, CaseAttachment)
+    CaseFile.objects.filter(pk__in=[pk for pk in casefile_ids if pk]).update(
+        last_event_at=expressions["last_event_at"],
+        last_event_title=expressions["last_event_title"],
+        last_event_preview=expressions["last_event_preview"],
+        last_activity_at=expressions["last_activity_at"],
+        updated_at=timezone.now(),
+    )
+
+
+def adjust_events(casefile_id, delta):
+    _adjust(casefile_id, "events_count", delta)
+
+
+def adjust_attachments(casefile_id, delta):
+    _adjust(casefile_id, "attachments_count", delta)
+
+
+def _adjust(casefile_id, field, delta):
+    qs = CaseFile.objects.filter(pk=casefile_id)
+    if delta < 0:
+        qs = qs.filter(**{f"{field}__gte": -delta})
+    qs.update(**{field: F(field) + delta}, updated_at=timezone.now())
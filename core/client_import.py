@@ -0,0 +1,137 @@
+# core/client_import.py
+import csv
+import io
+
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from .autocomplete import normalize_text
+from .models import Client
+from .serializers import ClientImportRowSerializer
+
+BATCH_SIZE = 1000
+# Errores que se regresan en el reporte (el conteo siempre es completo)
+MAX_REPORTED_ERRORS = 1000
+
+# Encabezado del CSV (normalizado) -> campo del modelo
+COLUMN_ALIASES = {
+    "full_name": "full_name",
+    "nombre": "full_name",
+    "nombre completo": "full_name",
+    "email": "email",
+    "correo": "email",
+    "phone": "phone",
+    "telefono": "phone",
+    "document_id": "document_id",
+    "documento": "document_id",
+    "rfc": "document_id",
+    "curp": "document_id",
+    "birth_date": "birth_date",
+    "fecha de nacimiento": "birth_date",
+    "fecha_nacimiento": "birth_date",
+    "notes": "notes",
+    "notas": "notes",
+}
+
+DUPLICATE_MESSAGE = "Ya existe un cliente con este correo o teléfono."
+
+
+def open_csv(fileobj):
+    """
+    Lector de filas en streaming sobre un archivo binario (subido o en
+    disco). Acepta UTF-8 con o sin BOM y separador ',' o ';' (Excel en
+    español). Regresa (columnas reconocidas, iterador de (línea, dict)).
+    """
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    header_line = text.readline()
+    if not header_line.strip():
+        raise ValueError("El archivo está vacío.")
+    delimiter = ";" if header_line.count(";") > header_line.count(",") else ","
+
+    header = next(csv.reader([header_line], delimiter=delimiter))
+    fields = [COLUMN_ALIASES.get(normalize_text(name)) for name in header]
+    if "full_name" not in fields:
+        raise ValueError("Falta la columna 'full_name' (o 'nombre').")
+
+    def rows():
+        reader = csv.reader(text, delimiter=delimiter)
+        for values in reader:
+            if not any(value.strip() for value in values):
+                continue
+            # +1 por el encabezado, que ya se leyó aparte
+            yield reader.line_num + 1, {
+                field: value.strip()
+                for field, value in zip(fields, values)
+                if field and value.strip()
+            }
+
+    return [field for field in fields if field], rows()
+
+
+def existing_keys(workspace_id):
+    """Correos y teléfonos normalizados del workspace: un solo query."""
+    emails, phones = set(), set()
+    keys = Client.objects.filter(workspace_id=workspace_id).values_list("search_email", "search_phone")
+    for email, phone in keys.iterator(chunk_size=5000):
+        if email:
+            emails.add(email)
+        if phone:
+            phones.add(phone)
+    return emails, phones
+
+
+def import_clients(workspace_id, rows, batch_size=BATCH_SIZE, dry_run=False):
+    """
+    Crea clientes a partir de `rows` ((línea, dict con campos de Client)),
+    con bulk_create por lotes, cada lote en su transacción. Se omiten las
+    filas cuyo correo o teléfono ya existe en el workspace (o se repite en
+    el mismo archivo); el duplicado se revisa contra sets en memoria
+    precargados con un solo query, no con un exists() por fila.
+    """
+    emails, phones = existing_keys(workspace_id)
+    # Una sola instancia: los campos del serializer se construyen una vez
+    validator = ClientImportRowSerializer()
+    report = {"created": 0, "duplicates": 0, "failed": 0, "errors": [], "file_error": None}
+
+    def report_error(line, errors, counter="failed"):
+        report[counter] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"row": line, "errors": errors})
+
+    def flush(batch):
+        if batch and not dry_run:
+            with transaction.atomic():
+                Client.objects.bulk_create(batch, batch_size=batch_size)
+        report["created"] += len(batch)
+
+    batch = []
+    try:
+        for line, raw in rows:
+            try:
+                data = validator.run_validation(raw)
+            except ValidationError as exc:
+                report_error(line, exc.detail)
+                continue
+
+            client = Client(workspace_id=workspace_id, **data)
+            client.set_search_keys()
+            email, phone = client.search_email, client.search_phone
+            if (email and email in emails) or (phone and phone in phones):
+                report_error(line, {"non_field_errors": [DUPLICATE_MESSAGE]}, counter="duplicates")
+                continue
+
+            if email:
+                emails.add(email)
+            if phone:
+                phones.add(phone)
+            batch.append(client)
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+    except (ValueError, csv.Error) as exc:
+        # Archivo corrupto a media lectura (p. ej. no es UTF-8): se conserva
+        # lo ya importado y se reporta dónde se detuvo
+        report["file_error"] = str(exc)
+    flush(batch)
+
+    return report
@@ -0,0 +1,70 @@
+# core/conditional.py
+import hashlib
+
+from django.db.models import Count, Max, QuerySet
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+# El navegador guarda la respuesta pero revalida siempre (If-None-Match)
+CACHE_CONTROL = "private, no-cache"
+
+
+class Validators:
+    def __init__(self, etag, last_modified):
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def apply(self, response):
+        response["ETag"] = self.etag
+        if self.last_modified:
+            response["Last-Modified"] = http_date(self.last_modified)
+        response["Cache-Control"] = CACHE_CONTROL
+        return response
+
+
+def snapshot(queryset, *related):
+    """
+    (count, max(updated_at)) en un solo aggregate: detecta altas, cambios y
+    bajas. `related`: FKs que también se serializan (p. ej. "service"); su
+    updated_at entra en el mismo query.
+    """
+    stats = queryset.order_by().aggregate(
+        count=Count("pk"),
+        last=Max("updated_at"),
+        **{f"last_{name}": Max(f"{name}__updated_at") for name in related},
+    )
+    count = stats.pop("count")
+    values = list(stats.values())
+    # El máximo general da Last-Modified; cada máximo por separado va a la ETag
+    return (count, max((value for value in values if value), default=None), *values)
+
+
+def objects_snapshot(objects):
+    """Lo mismo para objetos ya cargados (sin query)."""
+    objects = list(objects)
+    return len(objects), max((obj.updated_at for obj in objects), default=None)
+
+
+def validators(request, *parts, extra=()):
+    """
+    ETag / Last-Modified de una respuesta sin serializar nada. `parts`:
+    querysets (ver snapshot) o tuplas (count, updated_at, ...) ya calculadas.
+    La ETag incluye usuario, URL completa (página, filtros) y Accept.
+    """
+    key = [str(request.user.pk), request.get_full_path(), request.headers.get("Accept", ""), *map(str, extra)]
+    last = None
+    for part in parts:
+        count, updated, *rest = snapshot(part) if isinstance(part, QuerySet) else part
+        key.append(":".join(str(value.timestamp() if value else 0) for value in (updated, *rest)) + f":{count}")
+        if updated and (last is None or updated > last):
+            last = updated
+    digest = hashlib.sha1("|".join(key).encode()).hexdigest()
+    return Validators(f'W/"{digest}"', int(last.timestamp()) if last else None)
+
+
+def not_modified(request, validators):
+    """304 (con los mismos validadores) si el cliente ya tiene esta versión; si no, None."""
+    response = get_conditional_response(request, etag=validators.etag, last_modified=validators.last_modified)
+    if response is not None:
+        validators.apply(response)
+    return response
@@ -0,0 +1,217 @@
+# core/derivatives.py
+import io
+import logging
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .blobs import delete_stored
+from .jobs import enqueue
+from .models import AttachmentBlob, CaseAttachment
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = getattr(settings, "ATTACHMENT_THUMBNAIL_SIZE", 320)
+PREVIEW_SIZE = getattr(settings, "ATTACHMENT_PREVIEW_SIZE", 1280)
+JPEG_QUALITY = 80
+
+IMAGE_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp", "image/tiff", "image/bmp"}
+PDF_TYPE = "application/pdf"
+# Pillow no rasteriza PDF: la primera página se hace con pdftoppm (poppler)
+# si está instalado; si no, los PDF se quedan sin derivados
+PDF_RENDERER = shutil.which("pdftoppm")
+PDF_TIMEOUT = 30
+# Derivados de un blob (ver models.attachment_blob_derivative_upload_to): los
+# comparten sus adjuntos y se borran con el blob, nunca desde un adjunto
+BLOB_PREFIX = "blobs/"
+
+def supports_derivatives(attachment):
+    if attachment.mime_type in IMAGE_TYPES:
+        return True
+    return attachment.mime_type == PDF_TYPE and PDF_RENDERER is not None
+
+
+def schedule_derivatives(attachment):
+    """
+    Encola la generación de derivados (tarea "core.generate_derivatives",
+    nunca dentro de la petición). Si el archivo ya no admite derivados,
+    quita los viejos.
+    """
+    if attachment.blob_id and attachment.blob.thumbnail:
+        # Ese contenido ya se procesó: se reutilizan los derivados del blob
+        blob = attachment.blob
+        names = [attachment.thumbnail.name, attachment.preview.name]
+        CaseAttachment.objects.filter(pk=attachment.pk).update(
+            thumbnail=blob.thumbnail.name, preview=blob.preview.name,
+            derivatives_status=CaseAttachment.DERIVATIVES_READY, updated_at=timezone.now(),
+        )
+        transaction.on_commit(lambda: delete_files(names))
+        attachment.thumbnail, attachment.preview = blob.thumbnail.name, blob.preview.name
+        attachment.derivatives_status = CaseAttachment.DERIVATIVES_READY
+        return False
+
+    if not supports_derivatives(attachment):
+        if attachment.thumbnail or attachment.preview:
+            names = [attachment.thumbnail.name, attachment.preview.name]
+            CaseAttachment.objects.filter(pk=attachment.pk).update(
+                thumbnail="", preview="", derivatives_status=CaseAttachment.DERIVATIVES_NONE, updated_at=timezone.now(),
+            )
+            transaction.on_commit(lambda: delete_files(names))
+            attachment.thumbnail = attachment.preview = ""
+            attachment.derivatives_status = CaseAttachment.DERIVATIVES_NONE
+        return False
+
+    CaseAttachment.objects.filter(pk=attachment.pk).update(
+        derivatives_status=CaseAttachment.DERIVATIVES_PENDING, updated_at=timezone.now(),
+    )
+    attachment.derivatives_status = CaseAttachment.DERIVATIVES_PENDING
+    enqueue("core.generate_derivatives", attachment_id=attachment.pk)
+    return True
+
+
+def delete_files(names):
+    """Borra derivados propios de un adjunto (los de un blob se quedan)."""
+    for name in names:
+        if name and not name.startswith(BLOB_PREFIX):
+            default_storage.delete(name)
+
+
+def _render_pdf_page(attachment):
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            source = attachment.file.path
+        except NotImplementedError:
+            # Storage remoto: copia local por bloques
+            source = str(Path(tmp) / "source.pdf")
+            with attachment.file.open("rb") as src, open(source, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+
+        output = Path(tmp) / "page"
+        subprocess.run(
+            [PDF_RENDERER, "-f", "1", "-l", "1", "-singlefile", "-png",
+             "-scale-to", str(PREVIEW_SIZE), source, str(output)],
+            check=True,
+            timeout=PDF_TIMEOUT,
+            capture_output=True,
+        )
+        with Image.open(f"{output}.png") as image:
+            image.load()
+            return image.copy()
+
+
+def _open_image(attachment):
+    if attachment.mime_type == PDF_TYPE:
+        return _render_pdf_page(attachment)
+    with attachment.file.open("rb") as fileobj:
+        image = Image.open(fileobj)
+        # JPEG: decodifica directo a escala reducida (mucho menos memoria)
+        image.draft("RGB", (PREVIEW_SIZE, PREVIEW_SIZE))
+        image.load()
+    return image
+
+
+def _flatten(image):
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ("RGB", "L"):
+        return image
+    image = image.convert("RGBA")
+    background = Image.new("RGB", image.size, "white")
+    background.paste(image, mask=image.getchannel("A"))
+    return background
+
+
+def _encode(image, size):
+    resized = image.copy()
+    resized.thumbnail((size, size), Image.Resampling.LANCZOS)
+    output = io.BytesIO()
+    resized.save(output, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return ContentFile(output.getvalue())
+
+
+def generate_derivatives(attachment_id):
+    """Genera miniatura y vista previa del adjunto (la parte lenta, fuera de la petición)."""
+    attachment = CaseAttachment.objects.select_related("blob").filter(pk=attachment_id).first()
+    if attachment is None or not attachment.file:
+        return None
+    if attachment.blob_id:
+        return _generate_blob_derivatives(attachment)
+
+    previous = [attachment.thumbnail.name, attachment.preview.name]
+    written = []
+    try:
+        image = _flatten(_open_image(attachment))
+        attachment.thumbnail.save("thumbnail.jpg", _encode(image, THUMBNAIL_SIZE), save=False)
+        written.append(attachment.thumbnail.name)
+        attachment.preview.save("preview.jpg", _encode(image, PREVIEW_SIZE), save=False)
+        status = CaseAttachment.DERIVATIVES_READY
+    except (OSError, ValueError, Image.DecompressionBombError, subprocess.SubprocessError):
+        logger.warning("Adjunto %s sin derivados", attachment_id, exc_info=True)
+        delete_files(written)
+        attachment.thumbnail = attachment.preview = ""
+        status = CaseAttachment.DERIVATIVES_FAILED
+
+    # Solo si el archivo no cambió mientras tanto (reemplazo o borrado)
+    updated = CaseAttachment.objects.filter(pk=attachment.pk, file=attachment.file.name).update(
+        thumbnail=attachment.thumbnail.name or "",
+        preview=attachment.preview.name or "",
+        derivatives_status=status,
+        updated_at=timezone.now(),
+    )
+    current = [attachment.thumbnail.name, attachment.preview.name]
+    if updated:
+        delete_files(name for name in previous if name not in current)
+    else:
+        delete_files(name for name in current if name not in previous)
+    return status
+
+
+def _generate_blob_derivatives(attachment):
+    """
+    Como generate_derivatives, pero guardados en el blob: el mismo contenido
+    se procesa una sola vez aunque lo usen varios adjuntos.
+    """
+    blob = attachment.blob
+    if not blob.thumbnail:
+        written = []
+        try:
+            image = _flatten(_open_image(attachment))
+            blob.thumbnail.save("thumbnail.jpg", _encode(image, THUMBNAIL_SIZE), save=False)
+            written.append(blob.thumbnail.name)
+            blob.preview.save("preview.jpg", _encode(image, PREVIEW_SIZE), save=False)
+            written.append(blob.preview.name)
+        except (OSError, ValueError, Image.DecompressionBombError, subprocess.SubprocessError):
+            logger.warning("Adjunto %s sin derivados", attachment.pk, exc_info=True)
+            delete_stored(written)
+            CaseAttachment.objects.filter(pk=attachment.pk, blob_id=blob.pk).update(
+                derivatives_status=CaseAttachment.DERIVATIVES_FAILED, updated_at=timezone.now(),
+            )
+            return CaseAttachment.DERIVATIVES_FAILED
+
+        claimed = AttachmentBlob.objects.filter(pk=blob.pk, thumbnail="").update(
+            thumbnail=blob.thumbnail.name, preview=blob.preview.name,
+        )
+        if not claimed:
+            # Otro job los generó primero (o el blob ya no existe)
+            delete_stored(written)
+            blob = AttachmentBlob.objects.filter(pk=blob.pk).first()
+            if blob is None:
+                return None
+
+    previous = [attachment.thumbnail.name, attachment.preview.name]
+    updated = CaseAttachment.objects.filter(pk=attachment.pk, blob_id=blob.pk).update(
+        thumbnail=blob.thumbnail.name,
+        preview=blob.preview.name,
+        derivatives_status=CaseAttachment.DERIVATIVES_READY,
+        updated_at=timezone.now(),
+    )
+    if updated:
+        delete_files(previous)
+    return CaseAttachment.DERIVATIVES_READY
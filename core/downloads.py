@@ -0,0 +1,191 @@
+# core/downloads.py
+import hashlib
+import re
+import time
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core import signing
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header
+
+from .models import WorkspaceMember
+
+DOWNLOAD_SALT = "core.downloads"
+# Vigencia del token firmado que lleva file_url (para <a>, <img>, visores PDF)
+DOWNLOAD_TOKEN_MAX_AGE = getattr(settings, "ATTACHMENT_DOWNLOAD_TOKEN_MAX_AGE", 60 * 60)
+
+# "" (Django manda los bytes), "x-accel" (nginx) o "x-sendfile" (Apache/lighttpd)
+DOWNLOAD_BACKEND = getattr(settings, "ATTACHMENT_DOWNLOAD_BACKEND", "")
+# location `internal` de nginx que apunta a MEDIA_ROOT
+ACCEL_PREFIX = getattr(settings, "ATTACHMENT_ACCEL_PREFIX", "/protected-media/")
+
+CACHE_CONTROL = "private, max-age=3600"
+DERIVATIVE_CONTENT_TYPE = "image/jpeg"
+STREAM_CHUNK = 64 * 1024
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def token_epoch():
+    """
+    Cambia cada media vigencia del token: va en la ETag de respuestas con
+    file_url para que una copia en caché no reparta tokens ya vencidos.
+    """
+    return int(time.time() // max(DOWNLOAD_TOKEN_MAX_AGE // 2, 1))
+
+
+def make_download_token(attachment_id, user_id):
+    """
+    Firma (adjunto, usuario, token_epoch) sin timestamp: el mismo adjunto
+    tiene la misma URL para el mismo usuario durante toda la época (los
+    listados no cambian en cada render y el navegador reusa su caché).
+    """
+    payload = {"a": attachment_id, "u": user_id, "e": token_epoch()}
+    return signing.Signer(salt=DOWNLOAD_SALT).sign_object(payload, compress=True)
+
+
+def load_download_token(token, attachment_id):
+    """
+    user_id del token si es válido, de este adjunto y de la época actual o
+    la anterior (vigencia entre media y una DOWNLOAD_TOKEN_MAX_AGE); si no, None.
+    """
+    try:
+        payload = signing.Signer(salt=DOWNLOAD_SALT).unsign_object(token)
+    except signing.BadSignature:
+        return None
+    if not isinstance(payload, dict) or payload.get("a") != attachment_id:
+        return None
+    if not isinstance(payload.get("e"), int) or not 0 <= token_epoch() - payload["e"] <= 1:
+        return None
+    return payload.get("u")
+
+
+def can_download(tenant, user_id, attachment):
+    """
+    Equipo del workspace: cualquier adjunto. Portal: solo adjuntos no
+    privados de eventos visibles de su propio expediente.
+    """
+    role = tenant.role_for(attachment.workspace_id)
+    if role is not None and role != WorkspaceMember.ROLE_CLIENT:
+        return True
+    client = attachment.casefile.client
+    return (
+        not attachment.is_private
+        and attachment.event.visible_to_client
+        and client.is_active
+        and client.portal_user_id == user_id
+    )
+
+
+def attachment_etag(attachment, fieldfile, variant=None):
+    """
+    ETag fuerte. El original con blob usa su SHA-256 (el contenido mismo);
+    sin blob, y para los derivados, el nombre en storage, que cambia si se
+    reemplaza el archivo (nunca se sobreescribe en su lugar).
+    """
+    if variant is None and attachment.blob_id:
+        return f'"{attachment.blob.sha256}"'
+    digest = hashlib.sha1(f"{attachment.pk}:{fieldfile.name}".encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def parse_range(header, size):
+    """
+    (inicio, fin) inclusivo de un Range de un solo tramo; None si no hay o no
+    se entiende (se manda completo); False si no se puede satisfacer.
+    """
+    match = RANGE_RE.match(header or "")
+    if not match or size == 0:
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    elif last:
+        start = max(size - int(last), 0)
+        end = size - 1
+    else:
+        return None
+    if start >= size:
+        return False
+    return start, end
+
+
+def _iter_range(fileobj, start, length):
+    try:
+        fileobj.seek(start)
+        while length > 0:
+            data = fileobj.read(min(STREAM_CHUNK, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        fileobj.close()
+
+
+def serve_attachment(request, attachment, as_attachment=False, variant=None):
+    """
+    Respuesta de descarga (ya con permisos revisados): 304 si el ETag
+    coincide; si hay servidor al frente, X-Accel-Redirect / X-Sendfile y él
+    manda los bytes (y atiende Range); si no, FileResponse con Range.
+    `variant`: None (original), "thumbnail" o "preview" (ver core.derivatives).
+    """
+    fieldfile = getattr(attachment, variant) if variant else attachment.file
+    etag = attachment_etag(attachment, fieldfile, variant)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        not_modified["Cache-Control"] = CACHE_CONTROL
+        return not_modified
+
+    filename = attachment.original_name or attachment.file.name.rsplit("/", 1)[-1]
+    if variant:
+        content_type = DERIVATIVE_CONTENT_TYPE
+        filename = f"{filename.rsplit('.', 1)[0]}-{variant}.jpg"
+    else:
+        content_type = attachment.mime_type or "application/octet-stream"
+    headers = {
+        "ETag": etag,
+        "Cache-Control": CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": content_disposition_header(as_attachment, filename),
+        "X-Content-Type-Options": "nosniff",
+    }
+
+    if DOWNLOAD_BACKEND == "x-accel":
+        response = HttpResponse(content_type=content_type, headers=headers)
+        response["X-Accel-Redirect"] = ACCEL_PREFIX.rstrip("/") + "/" + quote(fieldfile.name)
+        return response
+    if DOWNLOAD_BACKEND == "x-sendfile":
+        response = HttpResponse(content_type=content_type, headers=headers)
+        response["X-Sendfile"] = fieldfile.path
+        return response
+
+    size = fieldfile.size
+    byte_range = None
+    if_range = request.headers.get("If-Range")
+    if request.method == "GET" and (not if_range or if_range == etag):
+        byte_range = parse_range(request.headers.get("Range"), size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416, headers=headers)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    fileobj = fieldfile.storage.open(fieldfile.name, "rb")
+    if byte_range is None:
+        return FileResponse(
+            fileobj, as_attachment=as_attachment, filename=filename, content_type=content_type, headers=headers,
+        )
+
+    start, end = byte_range
+    length = end - start + 1
+    response = StreamingHttpResponse(
+        _iter_range(fileobj, start, length), status=206, content_type=content_type, headers=headers,
+    )
+    response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Content-Length"] = length
+    return response
@@ -0,0 +1,19 @@
+# core/exceptions.py
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class AppointmentConflict(APIException):
+    """
+    409 cuando la cita se traslapa con otra del mismo profesional.
+    La respuesta incluye la cita en conflicto (None si es de un workspace
+    al que el usuario no tiene acceso).
+    """
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "El profesional ya tiene una cita en ese horario."
+    default_code = "appointment_conflict"
+
+    def __init__(self, conflict_data=None, detail=None):
+        super().__init__(detail=detail, code=self.default_code)
+        # `conflict` va tal cual (ids/fechas), sin convertir a ErrorDetail
+        self.detail = {"detail": self.detail, "conflict": conflict_data}
@@ -0,0 +1,112 @@
+# core/export.py
+import csv
+import json
+import zlib
+from datetime import date, datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Appointment, CaseEvent, Client, Consultation
+
+# dataset -> (modelo, columnas de values()). Solo columnas planas: nada de
+# serializers ni instancias, para que la memoria no crezca con el tamaño.
+EXPORTS = {
+    "clients": (Client, [
+        "id", "full_name", "email", "phone", "document_id", "birth_date",
+        "notes", "is_active", "portal_user_id", "created_at",
+    ]),
+    "appointments": (Appointment, [
+        "id", "client_id", "client__full_name", "service_id", "service__name",
+        "professional_id", "series_id", "start", "end", "status", "modality",
+        "notes_internal", "notes_for_client", "created_at", "updated_at",
+    ]),
+    "consultations": (Consultation, [
+        "id", "client_id", "professional_id", "appointment_id", "title", "notes",
+        "extra_data", "visible_to_client", "created_at",
+    ]),
+    "caseevents": (CaseEvent, [
+        "id", "casefile_id", "casefile__client_id", "event_type", "title", "body",
+        "happened_at", "visible_to_client", "appointment_id", "consultation_id",
+        "created_by_id", "created_at", "extra_data",
+    ]),
+}
+
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+CHUNK_SIZE = 2000
+# Se junta la salida en bloques de ~64 KB antes de mandarla (o comprimirla)
+BUFFER_SIZE = 64 * 1024
+
+
+class _Line:
+    """Pseudo-archivo para csv.writer: regresa la línea en vez de escribirla."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def _csv_lines(columns, rows):
+    writer = csv.writer(_Line())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([_csv_value(row[column]) for column in columns])
+
+
+def _ndjson_lines(columns, rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
+
+
+def export_rows(workspace_id, dataset, chunk_size=CHUNK_SIZE):
+    model, columns = EXPORTS[dataset]
+    rows = (
+        model.objects
+        .filter(workspace_id=workspace_id)
+        .order_by("id")
+        .values(*columns)
+        .iterator(chunk_size=chunk_size)
+    )
+    return columns, rows
+
+
+def iter_export(workspace_id, dataset, fmt="csv", compress=False, chunk_size=CHUNK_SIZE):
+    """
+    Exportación como generador de bytes (CSV o NDJSON, opcionalmente gzip).
+    Recorre la tabla con .iterator(): memoria constante sin importar cuántas
+    filas haya.
+    """
+    columns, rows = export_rows(workspace_id, dataset, chunk_size=chunk_size)
+    lines = _csv_lines(columns, rows) if fmt == "csv" else _ndjson_lines(columns, rows)
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if compress else None
+
+    buffer = []
+    size = 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= BUFFER_SIZE:
+            data = "".join(buffer).encode("utf-8")
+            buffer, size = [], 0
+            if compressor:
+                data = compressor.compress(data)
+            if data:
+                yield data
+
+    data = "".join(buffer).encode("utf-8")
+    if compressor:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
@@ -0,0 +1,120 @@
+# core/ics.py
+import secrets
+from datetime import timezone as dt_timezone
+
+from django.core import signing
+from django.utils.crypto import constant_time_compare
+
+FEED_SALT = "core.ics.feed"
+
+FEED_PROFESSIONAL = "pro"
+FEED_WORKSPACE = "ws"
+FEED_CLIENT = "client"
+FEED_KINDS = {FEED_PROFESSIONAL, FEED_WORKSPACE, FEED_CLIENT}
+
+ICS_STATUS = {
+    "scheduled": "TENTATIVE",
+    "confirmed": "CONFIRMED",
+    "completed": "CONFIRMED",
+    "cancelled": "CANCELLED",
+    "no_show": "CANCELLED",
+}
+
+
+def feed_secret(user, rotate=False):
+    """
+    Secreto de los feeds del usuario; se genera la primera vez que se pide.
+    Con rotate=True se reemplaza y todas sus URLs anteriores dejan de servir.
+    """
+    if rotate or not user.calendar_feed_secret:
+        user.calendar_feed_secret = secrets.token_urlsafe(16)
+        type(user).objects.filter(pk=user.pk).update(calendar_feed_secret=user.calendar_feed_secret)
+    return user.calendar_feed_secret
+
+
+def make_feed_token(kind, user, workspace_id=None):
+    """
+    Token firmado para la URL pública del feed. No expira (los calendarios
+    se suscriben una vez), pero lleva el secreto vigente del usuario.
+    """
+    payload = {"k": kind, "u": user.pk, "s": feed_secret(user)}
+    if workspace_id:
+        payload["w"] = workspace_id
+    return signing.dumps(payload, salt=FEED_SALT, compress=True)
+
+
+def load_feed_token(token):
+    """Regresa el payload o None si la firma no es válida."""
+    try:
+        payload = signing.loads(token, salt=FEED_SALT)
+    except signing.BadSignature:
+        return None
+    if not isinstance(payload, dict) or payload.get("k") not in FEED_KINDS or not payload.get("u"):
+        return None
+    return payload
+
+
+def is_current_feed(payload, user):
+    """¿El token se emitió con el secreto vigente (no rotado) del usuario?"""
+    return bool(user.calendar_feed_secret) and constant_time_compare(payload.get("s") or "", user.calendar_feed_secret)
+
+
+def _escape(value):
+    return (
+        str(value or "")
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def _fold(line):
+    """RFC 5545: líneas de máx. 75 octetos, continuación con un espacio."""
+    data = line.encode("utf-8")
+    if len(data) <= 75:
+        return data + b"\r\n"
+    parts = []
+    while len(data) > 75:
+        cut = 75 if not parts else 74
+        # no partir un caracter multibyte
+        while cut > 0 and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(data[:cut])
+        data = data[cut:]
+    parts.append(data)
+    return b"\r\n ".join(parts) + b"\r\n"
+
+
+def _utc(value):
+    return value.astimezone(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def iter_calendar(rows, name, uid_domain):
+    """
+    Genera el VCALENDAR línea por línea (bytes) a partir de dicts con:
+    id, start, end, status, summary, description, updated_at.
+    Pensado para StreamingHttpResponse sobre un queryset .iterator().
+    """
+    yield _fold("BEGIN:VCALENDAR")
+    yield _fold("VERSION:2.0")
+    yield _fold("PRODID:-//Sistema Profesionales//Agenda//ES")
+    yield _fold("CALSCALE:GREGORIAN")
+    yield _fold("METHOD:PUBLISH")
+    yield _fold(f"X-WR-CALNAME:{_escape(name)}")
+
+    for row in rows:
+        yield b"".join([
+            _fold("BEGIN:VEVENT"),
+            _fold(f"UID:appointment-{row['id']}@{uid_domain}"),
+            _fold(f"DTSTAMP:{_utc(row['updated_at'])}"),
+            _fold(f"DTSTART:{_utc(row['start'])}"),
+            _fold(f"DTEND:{_utc(row['end'])}"),
+            _fold(f"SUMMARY:{_escape(row['summary'])}"),
+            _fold(f"DESCRIPTION:{_escape(row.get('description'))}"),
+            _fold(f"STATUS:{ICS_STATUS.get(row['status'], 'CONFIRMED')}"),
+            _fold("END:VEVENT"),
+        ])
+
+    yield _fold("END:VCALENDAR")
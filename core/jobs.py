@@ -0,0 +1,191 @@
+# core/jobs.py
+import logging
+import random
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_HIGH = 10
+PRIORITY_NORMAL = 0
+PRIORITY_LOW = -10
+
+DEFAULT_MAX_ATTEMPTS = 5
+BACKOFF_BASE = getattr(settings, "JOB_BACKOFF_SECONDS", 10)
+BACKOFF_MAX = getattr(settings, "JOB_BACKOFF_MAX_SECONDS", 60 * 60)
+# Un trabajo "running" sin terminar después de esto se da por perdido
+# (worker caído) y vuelve a la cola
+LOCK_TIMEOUT = timedelta(seconds=getattr(settings, "JOB_LOCK_TIMEOUT_SECONDS", 15 * 60))
+# Sin worker (desarrollo / tests): ejecutar al hacer commit, en el mismo proceso
+ALWAYS_EAGER = getattr(settings, "JOB_QUEUE_EAGER", False)
+# Trabajos terminados se conservan estos días (los fallidos no se borran)
+RETENTION = timedelta(days=getattr(settings, "JOB_RETENTION_DAYS", 7))
+ERROR_MAX_LENGTH = 5000
+
+TASKS = {}
+
+
+def task(name, priority=PRIORITY_NORMAL, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Registra una función como tarea:
+
+        @task("core.algo")
+        def algo(x): ...
+
+        enqueue("core.algo", x=1)
+
+    Los argumentos van como JSON (ids, no instancias).
+    """
+    def decorator(func):
+        TASKS[name] = (func, priority, max_attempts)
+        return func
+    return decorator
+
+
+def enqueue(name, priority=None, run_at=None, **kwargs):
+    """
+    Agrega un trabajo a la cola. Es un INSERT normal: si la transacción
+    actual se revierte, el trabajo tampoco existe.
+    """
+    _, default_priority, max_attempts = TASKS[name]
+    job = Job.objects.create(
+        name=name,
+        payload=kwargs,
+        priority=default_priority if priority is None else priority,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts,
+    )
+    if ALWAYS_EAGER:
+        transaction.on_commit(lambda: run_job(job.pk))
+    return job
+
+
+def backoff(attempts):
+    """Espera exponencial con jitter antes del siguiente intento."""
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def claim_jobs(limit):
+    """
+    Toma hasta `limit` trabajos listos, por prioridad. En Postgres con
+    SELECT ... FOR UPDATE SKIP LOCKED (varios workers no se estorban); en
+    SQLite las escrituras ya van de una en una y el UPDATE condicionado a
+    status='queued' basta para no tomar dos veces el mismo.
+    """
+    if limit <= 0:
+        return []
+    claim = uuid.uuid4().hex
+    now = timezone.now()
+    with transaction.atomic():
+        ready = (
+            Job.objects
+            .filter(status=Job.STATUS_QUEUED, run_at__lte=now)
+            .order_by("-priority", "run_at", "id")
+        )
+        if connection.features.has_select_for_update_skip_locked:
+            ready = ready.select_for_update(skip_locked=True)
+        ids = list(ready.values_list("id", flat=True)[:limit])
+        if not ids:
+            return []
+        Job.objects.filter(pk__in=ids, status=Job.STATUS_QUEUED).update(
+            status=Job.STATUS_RUNNING,
+            claim=claim,
+            locked_at=now,
+            attempts=F("attempts") + 1,
+        )
+    return list(Job.objects.filter(claim=claim).order_by("-priority", "run_at", "id").values_list("id", flat=True))
+
+
+def requeue_stale(now=None):
+    """
+    Trabajos de workers que murieron a medio camino: vuelven a la cola con
+    backoff, o quedan 'failed' si ya agotaron sus intentos (un trabajo que
+    tumba al worker, p. ej. por memoria, no se reintenta para siempre).
+    Regresa cuántos volvieron a la cola.
+    """
+    now = now or timezone.now()
+    stale = Job.objects.filter(status=Job.STATUS_RUNNING, locked_at__lt=now - LOCK_TIMEOUT)
+    error = f"El worker no terminó el trabajo en {LOCK_TIMEOUT} (¿se cayó?)."
+    stale.filter(attempts__gte=F("max_attempts")).update(
+        status=Job.STATUS_FAILED, finished_at=now, last_error=error, claim="", locked_at=None,
+    )
+    requeued = 0
+    for pk, attempts, claim in stale.values_list("id", "attempts", "claim"):
+        # Uno por uno: cada trabajo con su propio backoff (y jitter)
+        requeued += Job.objects.filter(pk=pk, status=Job.STATUS_RUNNING, claim=claim).update(
+            status=Job.STATUS_QUEUED, claim="", locked_at=None, run_at=now + backoff(attempts), last_error=error,
+        )
+    return requeued
+
+
+def run_job(job_id):
+    """
+    Ejecuta un trabajo ya tomado (o, en modo eager, recién creado). Si falla
+    se reintenta con backoff hasta max_attempts; después queda 'failed'.
+    """
+    job = Job.objects.filter(pk=job_id).first()
+    if job is None or job.status in (Job.STATUS_DONE, Job.STATUS_FAILED):
+        return None
+    if job.status == Job.STATUS_QUEUED:
+        # eager: no pasó por claim_jobs, se toma aquí con su propio claim
+        job.claim = uuid.uuid4().hex
+        job.attempts += 1
+        taken = Job.objects.filter(pk=job.pk, status=Job.STATUS_QUEUED).update(
+            status=Job.STATUS_RUNNING, claim=job.claim, attempts=F("attempts") + 1, locked_at=timezone.now(),
+        )
+        if not taken:
+            return None
+    # El resultado solo se guarda si el trabajo sigue siendo de este claim:
+    # si requeue_stale lo devolvió a la cola, otro worker ya lo tiene
+    mine = Job.objects.filter(pk=job.pk, status=Job.STATUS_RUNNING, claim=job.claim)
+
+    entry = TASKS.get(job.name)
+    try:
+        if entry is None:
+            raise LookupError(f"Tarea no registrada: {job.name}")
+        entry[0](**job.payload)
+    except Exception:
+        error = traceback.format_exc()[-ERROR_MAX_LENGTH:]
+        if job.attempts < job.max_attempts:
+            status, run_at, finished_at = Job.STATUS_QUEUED, timezone.now() + backoff(job.attempts), None
+            logger.warning("Trabajo %s (%s) falló, intento %s/%s", job.pk, job.name, job.attempts, job.max_attempts)
+        else:
+            status, run_at, finished_at = Job.STATUS_FAILED, job.run_at, timezone.now()
+            logger.error("Trabajo %s (%s) falló definitivamente:\n%s", job.pk, job.name, error)
+        if not mine.update(
+            status=status, run_at=run_at, finished_at=finished_at, last_error=error, claim="", locked_at=None,
+        ):
+            return _lost(job)
+        return status
+
+    if not mine.update(status=Job.STATUS_DONE, finished_at=timezone.now(), last_error="", claim="", locked_at=None):
+        return _lost(job)
+    return Job.STATUS_DONE
+
+
+def _lost(job):
+    logger.warning("Trabajo %s (%s) se volvió a encolar mientras corría; se descarta este resultado", job.pk, job.name)
+    return None
+
+
+def execute_job(job_id):
+    """Punto de entrada en los hilos / procesos del worker."""
+    try:
+        return run_job(job_id)
+    finally:
+        close_old_connections()
+
+
+def purge_finished(now=None):
+    now = now or timezone.now()
+    deleted, _ = Job.objects.filter(status=Job.STATUS_DONE, finished_at__lt=now - RETENTION).delete()
+    return deleted
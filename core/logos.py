@@ -0,0 +1,73 @@
+# core/logos.py
+import hashlib
+import io
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import Workspace
+
+LOGO_SIZES = getattr(settings, "WORKSPACE_LOGO_SIZES", (64, 128, 256))
+LOGO_FORMATS = {
+    "webp": ("WEBP", {"quality": 85, "method": 6}),
+    "png": ("PNG", {"optimize": True}),
+}
+
+
+VARIANTS_PREFIX = "workspaces/logos/variants/"
+# Ver core.middleware.LogoVariantCacheMiddleware y la regla de nginx del README
+VARIANT_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def variant_name(workspace_id, size, ext, data):
+    # Nombre con hash del contenido: si cambia el logo cambia la URL, así
+    # que el servidor web puede mandarlos con caché "immutable" de un año
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    return f"{VARIANTS_PREFIX}{workspace_id}/logo-{size}.{digest}.{ext}"
+
+
+def _load_logo(workspace):
+    with workspace.logo.open("rb") as fileobj:
+        image = Image.open(fileobj)
+        image.draft("RGB", (max(LOGO_SIZES), max(LOGO_SIZES)))
+        image.load()
+    image = ImageOps.exif_transpose(image)
+    # Conservar transparencia (PNG/WebP la soportan)
+    return image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+
+
+def build_logo_variants(workspace):
+    """
+    Re-codifica el logo en WebP y PNG a cada tamaño (ajustado dentro de un
+    cuadrado de ese lado, sin agrandar) y guarda el mapa en logo_variants.
+    Borra las variantes anteriores que ya no se usan.
+    """
+    previous = {
+        name for formats in (workspace.logo_variants or {}).values() for name in formats.values()
+    }
+    variants = {}
+    if workspace.logo:
+        image = _load_logo(workspace)
+        for size in LOGO_SIZES:
+            resized = image.copy()
+            resized.thumbnail((size, size), Image.Resampling.LANCZOS)
+            variants[str(size)] = {}
+            for ext, (fmt, options) in LOGO_FORMATS.items():
+                output = io.BytesIO()
+                resized.save(output, fmt, **options)
+                data = output.getvalue()
+                name = variant_name(workspace.pk, size, ext, data)
+                if not default_storage.exists(name):
+                    name = default_storage.save(name, ContentFile(data))
+                variants[str(size)][ext] = name
+
+    Workspace.objects.filter(pk=workspace.pk).update(logo_variants=variants, updated_at=timezone.now())
+    workspace.logo_variants = variants
+
+    current = {name for formats in variants.values() for name in formats.values()}
+    for name in previous - current:
+        default_storage.delete(name)
+    return variants
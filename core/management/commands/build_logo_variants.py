@@ -0,0 +1,29 @@
+# core/management/commands/build_logo_variants.py
+from django.core.management.base import BaseCommand
+
+from core.logos import build_logo_variants
+from core.models import Workspace
+
+
+class Command(BaseCommand):
+    help = "Genera las variantes (WebP/PNG por tamaño) del logo de los workspaces."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Regenerar también las que ya existen.")
+
+    def handle(self, *args, **options):
+        qs = Workspace.objects.exclude(logo="").exclude(logo__isnull=True).order_by("pk")
+        if not options["all"]:
+            qs = qs.filter(logo_variants={})
+
+        built = failed = 0
+        for workspace in qs.iterator():
+            try:
+                build_logo_variants(workspace)
+            except (OSError, ValueError) as exc:
+                failed += 1
+                self.stderr.write(f"Workspace {workspace.pk}: {exc}")
+                continue
+            built += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Logos procesados: {built}  Con error: {failed}"))
@@ -0,0 +1,38 @@
+# core/management/commands/dedupe_attachments.py
+from django.core.management.base import BaseCommand
+
+from core.blobs import adopt_attachment_file
+from core.models import CaseAttachment
+
+
+class Command(BaseCommand):
+    help = "Pasa los adjuntos existentes a almacenamiento por contenido (SHA-256) y borra duplicados."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workspace", type=int, help="Solo los adjuntos de este workspace.")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        qs = CaseAttachment.objects.filter(blob__isnull=True).exclude(file="").order_by("pk")
+        if options["workspace"]:
+            qs = qs.filter(workspace_id=options["workspace"])
+
+        processed = freed = missing = 0
+        last_pk = 0
+        while True:
+            batch = list(qs.filter(pk__gt=last_pk).only("pk", "workspace_id", "file")[:options["batch_size"]])
+            if not batch:
+                break
+            for attachment in batch:
+                try:
+                    freed += adopt_attachment_file(attachment)
+                except FileNotFoundError:
+                    missing += 1
+                    self.stderr.write(f"Adjunto {attachment.pk}: no existe {attachment.file.name}")
+                    continue
+                processed += 1
+            last_pk = batch[-1].pk
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Adjuntos procesados: {processed}  Bytes liberados: {freed}  Archivos faltantes: {missing}"
+        ))
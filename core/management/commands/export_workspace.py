@@ -0,0 +1,38 @@
+# core/management/commands/export_workspace.py
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.export import EXPORTS, FORMATS, iter_export
+from core.models import Workspace
+
+
+class Command(BaseCommand):
+    help = "Exporta una tabla del workspace a CSV / NDJSON en streaming (memoria constante)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("workspace", type=int, help="Id del workspace.")
+        parser.add_argument("dataset", choices=sorted(EXPORTS))
+        parser.add_argument("--format", dest="fmt", choices=sorted(FORMATS), default="csv")
+        parser.add_argument("--gzip", action="store_true", help="Comprimir la salida con gzip.")
+        parser.add_argument("--output", "-o", default="-", help="Archivo de salida (default: stdout).")
+
+    def handle(self, *args, **options):
+        if not Workspace.objects.filter(pk=options["workspace"]).exists():
+            raise CommandError(f"No existe el workspace {options['workspace']}.")
+
+        chunks = iter_export(options["workspace"], options["dataset"], options["fmt"], compress=options["gzip"])
+        if options["output"] == "-":
+            out = getattr(self.stdout, "_out", sys.stdout)
+            out = getattr(out, "buffer", out)
+            for chunk in chunks:
+                out.write(chunk)
+            out.flush()
+            return
+
+        written = 0
+        with open(options["output"], "wb") as out:
+            for chunk in chunks:
+                out.write(chunk)
+                written += len(chunk)
+        self.stderr.write(self.style.SUCCESS(f"{options['output']}: {written} bytes"))
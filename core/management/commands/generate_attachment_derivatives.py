@@ -0,0 +1,34 @@
+# core/management/commands/generate_attachment_derivatives.py
+from django.core.management.base import BaseCommand
+
+from core.derivatives import IMAGE_TYPES, PDF_RENDERER, PDF_TYPE, generate_derivatives
+from core.models import CaseAttachment
+
+
+class Command(BaseCommand):
+    help = "Genera miniaturas y vistas previas de adjuntos existentes (imágenes y, con pdftoppm, PDF)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workspace", type=int, help="Solo los adjuntos de este workspace.")
+        parser.add_argument("--all", action="store_true", help="Regenerar también los que ya tienen derivados.")
+
+    def handle(self, *args, **options):
+        mime_types = set(IMAGE_TYPES)
+        if PDF_RENDERER:
+            mime_types.add(PDF_TYPE)
+
+        qs = CaseAttachment.objects.filter(mime_type__in=mime_types).order_by("pk")
+        if options["workspace"]:
+            qs = qs.filter(workspace_id=options["workspace"])
+        if not options["all"]:
+            qs = qs.exclude(derivatives_status=CaseAttachment.DERIVATIVES_READY)
+
+        results = {}
+        for attachment_id in qs.values_list("pk", flat=True).iterator():
+            status = generate_derivatives(attachment_id)
+            results[status] = results.get(status, 0) + 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Listos: {results.get(CaseAttachment.DERIVATIVES_READY, 0)}  "
+            f"Fallidos: {results.get(CaseAttachment.DERIVATIVES_FAILED, 0)}"
+        ))
@@ -0,0 +1,42 @@
+# core/management/commands/import_clients.py
+from django.core.management.base import BaseCommand, CommandError
+
+from core.client_import import BATCH_SIZE, import_clients, open_csv
+from core.models import Workspace
+
+
+class Command(BaseCommand):
+    help = "Importa clientes desde un CSV (por lotes, omitiendo correos/teléfonos ya existentes)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("workspace", type=int, help="Id del workspace.")
+        parser.add_argument("path", help="Archivo CSV (UTF-8, separador ',' o ';').")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument("--dry-run", action="store_true", help="Valida sin guardar nada.")
+
+    def handle(self, *args, **options):
+        if not Workspace.objects.filter(pk=options["workspace"]).exists():
+            raise CommandError(f"No existe el workspace {options['workspace']}.")
+
+        with open(options["path"], "rb") as fileobj:
+            try:
+                _, rows = open_csv(fileobj)
+            except ValueError as exc:
+                raise CommandError(str(exc))
+            report = import_clients(
+                options["workspace"], rows, batch_size=options["batch_size"], dry_run=options["dry_run"]
+            )
+
+        for error in report["errors"]:
+            messages = "; ".join(
+                f"{field}: {' '.join(str(m) for m in msgs)}" for field, msgs in error["errors"].items()
+            )
+            self.stderr.write(f"Fila {error['row']}: {messages}")
+        if report["file_error"]:
+            self.stderr.write(self.style.ERROR(f"Lectura interrumpida: {report['file_error']}"))
+
+        prefix = "[dry-run] " if options["dry_run"] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}Creados: {report['created']}  Duplicados: {report['duplicates']}  "
+            f"Con error: {report['failed']}"
+        ))
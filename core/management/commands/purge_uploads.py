@@ -0,0 +1,12 @@
+# core/management/commands/purge_uploads.py
+from django.core.management.base import BaseCommand
+
+from core.uploads import purge_expired_uploads
+
+
+class Command(BaseCommand):
+    help = "Cancela las subidas por partes expiradas y borra sus partes del storage."
+
+    def handle(self, *args, **options):
+        count = purge_expired_uploads()
+        self.stdout.write(self.style.SUCCESS(f"Subidas expiradas canceladas: {count}"))
@@ -0,0 +1,31 @@
+# core/management/commands/recompute_casefile_stats.py
+from django.core.management.base import BaseCommand
+
+from core.casefile_stats import recompute_casefile_stats
+from core.models import CaseFile
+
+
+class Command(BaseCommand):
+    help = "Recalcula contadores y último evento de los expedientes (por lotes de ids)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workspace", type=int, help="Solo los expedientes de este workspace.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        qs = CaseFile.objects.order_by("pk")
+        if options["workspace"]:
+            qs = qs.filter(workspace_id=options["workspace"])
+
+        batch_size = options["batch_size"]
+        updated = 0
+        last_pk = 0
+        while True:
+            # Lotes por rango de pk: cada UPDATE bloquea pocos renglones
+            ids = list(qs.filter(pk__gt=last_pk).values_list("pk", flat=True)[:batch_size])
+            if not ids:
+                break
+            updated += recompute_casefile_stats(CaseFile.objects.filter(pk__in=ids))
+            last_pk = ids[-1]
+
+        self.stdout.write(self.style.SUCCESS(f"Expedientes recalculados: {updated}"))
@@ -0,0 +1,82 @@
+# core/management/commands/run_worker.py
+import signal
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.jobs import claim_jobs, execute_job, purge_finished, requeue_stale
+
+MAINTENANCE_INTERVAL = 60
+
+
+def _init_process():
+    # Con "spawn"/"forkserver" el proceso hijo arranca sin Django
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = "Worker de la cola de trabajos (core.jobs): toma trabajos por prioridad y los ejecuta en un pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency", type=int, default=getattr(settings, "JOB_WORKER_CONCURRENCY", 4),
+            help="Trabajos en paralelo.",
+        )
+        parser.add_argument("--pool", choices=["thread", "process"], default="thread")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Segundos entre consultas con la cola vacía.")
+        parser.add_argument("--burst", action="store_true", help="Salir cuando no queden trabajos listos.")
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options["concurrency"])
+        poll = options["poll_interval"]
+        stop = threading.Event()
+
+        def request_stop(signum, frame):
+            self.stdout.write("Deteniendo: se terminan los trabajos en curso...")
+            stop.set()
+
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+
+        if options["pool"] == "process":
+            # Los hijos no deben heredar la conexión abierta del padre
+            connections.close_all()
+            pool = ProcessPoolExecutor(max_workers=concurrency, initializer=_init_process)
+        else:
+            pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="job")
+
+        self.stdout.write(f"Worker listo ({options['pool']} x {concurrency}).")
+        running = set()
+        processed = 0
+        last_maintenance = 0.0
+        try:
+            while not stop.is_set():
+                if time.monotonic() - last_maintenance > MAINTENANCE_INTERVAL:
+                    requeue_stale()
+                    purge_finished()
+                    last_maintenance = time.monotonic()
+
+                job_ids = claim_jobs(concurrency - len(running))
+                for job_id in job_ids:
+                    running.add(pool.submit(execute_job, job_id))
+
+                if running:
+                    done, running = wait(running, timeout=poll, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        processed += 1
+                        if future.exception() is not None:
+                            self.stderr.write(f"Error en el worker: {future.exception()!r}")
+                elif options["burst"]:
+                    break
+                else:
+                    stop.wait(poll)
+        finally:
+            pool.shutdown(wait=True)
+            processed += sum(1 for future in running if future.done())
+
+        self.stdout.write(self.style.SUCCESS(f"Worker detenido. Trabajos procesados: {processed}"))
@@ -0,0 +1,24 @@
+# core/management/commands/send_reminders.py
+from django.core.management.base import BaseCommand
+
+from core.reminders import BATCH_SIZE, dispatch_reminders, due_reminders
+
+
+class Command(BaseCommand):
+    help = (
+        "Envía los recordatorios de las citas próximas (APPOINTMENT_REMINDER_LEAD_HOURS). "
+        "Pensado para cron cada pocos minutos; correrlo de más no duplica envíos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument("--dry-run", action="store_true", help="Solo contar los recordatorios pendientes.")
+
+    def handle(self, *args, **options):
+        if options["dry_run"]:
+            self.stdout.write(f"Recordatorios pendientes: {due_reminders().count()}")
+            return
+        report = dispatch_reminders(batch_size=max(1, options["batch_size"]))
+        self.stdout.write(self.style.SUCCESS(
+            f"Enviados: {report['sent']}  Sin correo: {report['skipped']}  Fallidos: {report['failed']}"
+        ))
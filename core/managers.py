@@ -0,0 +1,52 @@
+# core/managers.py
+from datetime import timedelta
+
+from django.db import models
+
+
+class WorkspaceQuerySet(models.QuerySet):
+    def for_tenant(self, tenant):
+        return self.filter(id__in=tenant.workspace_ids)
+
+
+class WorkspaceScopedQuerySet(models.QuerySet):
+    """
+    QuerySet para modelos con FK `workspace`.
+    Filtra con `workspace_id IN (...)` usando los ids ya resueltos del tenant.
+    """
+
+    def for_workspaces(self, workspace_ids):
+        return self.filter(workspace_id__in=list(workspace_ids))
+
+    def for_tenant(self, tenant):
+        return self.for_workspaces(tenant.workspace_ids)
+
+
+class CaseEventQuerySet(WorkspaceScopedQuerySet):
+    def portal_timeline(self):
+        """
+        Timeline visible en el portal: solo eventos visibles y, prefetcheados
+        en `public_attachments`, solo sus adjuntos NO privados.
+        """
+        from .models import CaseAttachment
+
+        public_attachments = CaseAttachment.objects.filter(is_private=False).order_by("-uploaded_at", "-id")
+        return self.filter(visible_to_client=True).prefetch_related(
+            models.Prefetch("attachments", queryset=public_attachments, to_attr="public_attachments")
+        )
+
+
+class AppointmentQuerySet(WorkspaceScopedQuerySet):
+    # Duración máxima de una cita (se valida al guardar, ver
+    # core.scheduling.span_error); acota el rango sobre el índice
+    # (workspace, start) en vez de recorrer el historial completo
+    MAX_SPAN = timedelta(days=1)
+
+    def in_window(self, start=None, end=None):
+        """Citas que se traslapan con [start, end)."""
+        qs = self
+        if start is not None:
+            qs = qs.filter(start__gte=start - self.MAX_SPAN, end__gt=start)
+        if end is not None:
+            qs = qs.filter(start__lt=end)
+        return qs
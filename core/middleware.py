@@ -0,0 +1,38 @@
+# core/middleware.py
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
+from .logos import VARIANT_CACHE_CONTROL, VARIANTS_PREFIX
+from .tenancy import get_tenant_context
+
+
+class TenantContextMiddleware:
+    """
+    Expone `request.tenant` (lazy). Las vistas DRF deben usar
+    get_tenant_context(self.request), que revalida el usuario ya autenticado.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.tenant = SimpleLazyObject(lambda: get_tenant_context(request))
+        return self.get_response(request)
+
+
+class LogoVariantCacheMiddleware:
+    """
+    Caché de un año para las variantes del logo cuando Django sirve MEDIA
+    (DEBUG): su nombre lleva el hash del contenido (core.logos.variant_name).
+    En producción la misma regla va en el servidor web (ver README).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = f"{settings.MEDIA_URL.rstrip('/')}/{VARIANTS_PREFIX}"
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.status_code == 200 and request.path.startswith(self.prefix):
+            response["Cache-Control"] = VARIANT_CACHE_CONTROL
+        return response
@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-17 11:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_appointment_video_room'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workspace',
+            name='working_hours',
+            field=models.JSONField(blank=True, default=dict, help_text='Bloques por día: {"mon": [["09:00", "14:00"], ["16:00", "19:00"]], ...}', verbose_name='Horario laboral'),
+        ),
+        migrations.AddField(
+            model_name='workspacemember',
+            name='working_hours',
+            field=models.JSONField(blank=True, default=dict, help_text='Si se deja vacío se usa el horario del workspace.', verbose_name='Horario laboral'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 6.0 on 2026-10-17 11:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Solo Postgres: exclusion constraint sobre (profesional, rango de tiempo).
+# En otros motores (SQLite en tests) la validación es la de
+# core.scheduling.find_conflict apoyada en el índice parcial.
+# Si ya existen citas traslapadas, hay que corregirlas antes de migrar.
+EXCLUSION_SQL = """
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+ALTER TABLE core_appointment
+    ADD CONSTRAINT core_appointment_no_overlap
+    EXCLUDE USING gist (
+        professional_id WITH =,
+        tstzrange("start", "end", '[)') WITH &&
+    )
+    WHERE (professional_id IS NOT NULL AND status NOT IN ('cancelled', 'no_show'));
+"""
+
+DROP_EXCLUSION_SQL = """
+ALTER TABLE core_appointment DROP CONSTRAINT IF EXISTS core_appointment_no_overlap;
+"""
+
+
+def add_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(EXCLUSION_SQL)
+
+
+def drop_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(DROP_EXCLUSION_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_workspace_working_hours'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('status__in', ['cancelled', 'no_show']), _negated=True), fields=['professional', 'end'], name='core_appt_prof_end_active'),
+        ),
+        migrations.RunPython(add_exclusion_constraint, drop_exclusion_constraint),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-17 12:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_appointment_overlap'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['workspace', 'start'], name='core_appt_ws_start'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['workspace', 'professional', 'start'], name='core_appt_ws_prof_start'),
+        ),
+    ]
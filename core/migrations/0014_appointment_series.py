@@ -0,0 +1,62 @@
+# Generated by Django 6.0 on 2026-10-17 13:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_appointment_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='series_index',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='AppointmentSeries',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateTimeField(verbose_name='Inicio de la primera cita')),
+                ('duration_minutes', models.PositiveIntegerField(verbose_name='Duración (minutos)')),
+                ('freq', models.CharField(choices=[('daily', 'Diaria'), ('weekly', 'Semanal'), ('monthly', 'Mensual')], max_length=10, verbose_name='Frecuencia')),
+                ('interval', models.PositiveSmallIntegerField(default=1, verbose_name='Cada')),
+                ('byweekday', models.JSONField(blank=True, default=list, verbose_name='Días de la semana')),
+                ('count', models.PositiveIntegerField(blank=True, null=True, verbose_name='Número de citas')),
+                ('until', models.DateTimeField(blank=True, null=True, verbose_name='Terminar antes de')),
+                ('modality', models.CharField(choices=[('presential', 'Presencial'), ('online', 'Online')], default='presential', max_length=20, verbose_name='Modalidad')),
+                ('notes_internal', models.TextField(blank=True, verbose_name='Notas internas')),
+                ('notes_for_client', models.TextField(blank=True, verbose_name='Notas visibles para cliente')),
+                ('materialized_until', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('is_complete', models.BooleanField(default=False, editable=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='appointment_series', to='core.client')),
+                ('professional', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='appointment_series_as_professional', to=settings.AUTH_USER_MODEL)),
+                ('service', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='appointment_series', to='core.service')),
+                ('workspace', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='appointment_series', to='core.workspace')),
+            ],
+            options={
+                'verbose_name': 'Serie de citas',
+                'verbose_name_plural': 'Series de citas',
+            },
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='series',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='appointments', to='core.appointmentseries'),
+        ),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(fields=('series', 'series_index'), name='core_appt_series_index_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='appointmentseries',
+            index=models.Index(condition=models.Q(('is_complete', False)), fields=['workspace', 'materialized_until'], name='core_series_pending'),
+        ),
+    ]
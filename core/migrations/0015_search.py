@@ -0,0 +1,101 @@
+# Generated by Django 6.0 on 2026-10-17 14:05
+
+from django.db import migrations
+
+
+# Índices de búsqueda (ver core/search.py). No son campos del modelo: viven
+# solo en la base y se mantienen solos en cada INSERT/UPDATE.
+#
+# Postgres: columna tsvector generada (STORED, config 'spanish') + GIN.
+SEARCH_SOURCES = [
+    # tabla, título (peso A), cuerpo (peso B)
+    # (concat_ws no es IMMUTABLE, no sirve en columnas generadas)
+    ("core_client", "full_name", "coalesce(email, '') || ' ' || coalesce(phone, '') || ' ' || coalesce(document_id, '')"),
+    ("core_consultation", "title", "notes"),
+    ("core_caseevent", "title", "body"),
+]
+
+POSTGRES_FORWARD = []
+POSTGRES_BACKWARD = []
+for table, title, body in SEARCH_SOURCES:
+    POSTGRES_FORWARD += [
+        f"""
+        ALTER TABLE {table} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('spanish'::regconfig, coalesce({title}, '')), 'A') ||
+            setweight(to_tsvector('spanish'::regconfig, coalesce({body}, '')), 'B')
+        ) STORED
+        """,
+        f"CREATE INDEX {table}_search_gin ON {table} USING gin (search_vector)",
+    ]
+    POSTGRES_BACKWARD += [
+        f"DROP INDEX IF EXISTS {table}_search_gin",
+        f"ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector",
+    ]
+
+# SQLite (desarrollo / tests): una tabla FTS5 para los tres modelos,
+# rowid = id * 4 + tipo, alimentada por triggers.
+SQLITE_SOURCES = [
+    # tipo, tabla, parent_id, título, cuerpo
+    (1, "core_client", "NULL", "{row}.full_name",
+     "trim(coalesce({row}.email, '') || ' ' || coalesce({row}.phone, '') || ' ' || coalesce({row}.document_id, ''))"),
+    (2, "core_consultation", "{row}.client_id", "{row}.title", "{row}.notes"),
+    (3, "core_caseevent", "{row}.casefile_id", "{row}.title", "{row}.body"),
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE core_search_fts USING fts5(
+        workspace_id UNINDEXED,
+        parent_id UNINDEXED,
+        title,
+        body,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+]
+SQLITE_BACKWARD = []
+for kind, table, parent, title, body in SQLITE_SOURCES:
+    def values(row):
+        return (
+            f"{row}.id * 4 + {kind}, {row}.workspace_id, {parent.format(row=row)}, "
+            f"{title.format(row=row)}, {body.format(row=row)}"
+        )
+
+    insert = "INSERT INTO core_search_fts (rowid, workspace_id, parent_id, title, body)"
+    delete = f"DELETE FROM core_search_fts WHERE rowid = old.id * 4 + {kind};"
+    SQLITE_FORWARD += [
+        f"{insert} SELECT {values(table)} FROM {table}",
+        f"CREATE TRIGGER {table}_fts_ai AFTER INSERT ON {table} BEGIN {insert} VALUES ({values('new')}); END",
+        f"CREATE TRIGGER {table}_fts_au AFTER UPDATE ON {table} BEGIN {delete} {insert} VALUES ({values('new')}); END",
+        f"CREATE TRIGGER {table}_fts_ad AFTER DELETE ON {table} BEGIN {delete} END",
+    ]
+    SQLITE_BACKWARD += [f"DROP TRIGGER IF EXISTS {table}_fts_{suffix}" for suffix in ("ai", "au", "ad")]
+SQLITE_BACKWARD.append("DROP TABLE IF EXISTS core_search_fts")
+
+STATEMENTS = {
+    "postgresql": (POSTGRES_FORWARD, POSTGRES_BACKWARD),
+    "sqlite": (SQLITE_FORWARD, SQLITE_BACKWARD),
+}
+
+
+def create_search_index(apps, schema_editor):
+    forward, _ = STATEMENTS.get(schema_editor.connection.vendor, ([], []))
+    for sql in forward:
+        schema_editor.execute(sql, params=None)
+
+
+def drop_search_index(apps, schema_editor):
+    _, backward = STATEMENTS.get(schema_editor.connection.vendor, ([], []))
+    for sql in backward:
+        schema_editor.execute(sql, params=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_appointment_series'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
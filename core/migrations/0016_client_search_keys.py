@@ -0,0 +1,87 @@
+# Generated by Django 6.0 on 2026-10-17 14:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+from core.autocomplete import normalize_email, normalize_phone, normalize_text
+
+
+# Solo Postgres: índices trigram para autocompletar con errores de dedo
+# (word_similarity / LIKE 'x%' sobre las claves normalizadas).
+TRIGRAM_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS core_client_search_name_trgm ON core_client USING gin (search_name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS core_client_search_email_trgm ON core_client USING gin (search_email gin_trgm_ops)",
+]
+
+DROP_TRIGRAM_SQL = [
+    "DROP INDEX IF EXISTS core_client_search_name_trgm",
+    "DROP INDEX IF EXISTS core_client_search_email_trgm",
+]
+
+
+def fill_search_keys(apps, schema_editor):
+    Client = apps.get_model("core", "Client")
+    batch = []
+    for client in Client.objects.only("id", "full_name", "email", "phone").iterator(chunk_size=2000):
+        client.search_name = normalize_text(client.full_name)[:150]
+        client.search_email = normalize_email(client.email)[:254]
+        client.search_phone = normalize_phone(client.phone)[:20]
+        batch.append(client)
+        if len(batch) >= 2000:
+            Client.objects.bulk_update(batch, ["search_name", "search_email", "search_phone"])
+            batch = []
+    if batch:
+        Client.objects.bulk_update(batch, ["search_name", "search_email", "search_phone"])
+
+
+def add_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        for sql in TRIGRAM_SQL:
+            schema_editor.execute(sql)
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        for sql in DROP_TRIGRAM_SQL:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='search_email',
+            field=models.CharField(blank=True, editable=False, max_length=254),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='search_name',
+            field=models.CharField(blank=True, editable=False, max_length=150),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='search_phone',
+            field=models.CharField(blank=True, editable=False, max_length=20),
+        ),
+        migrations.RunPython(fill_search_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['workspace', 'search_name'], name='core_client_ws_sname'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['workspace', 'search_email'], name='core_client_ws_semail'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['workspace', 'search_phone'], name='core_client_ws_sphone'),
+        ),
+        migrations.RunPython(add_trigram_indexes, drop_trigram_indexes),
+    ]
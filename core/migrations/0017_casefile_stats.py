@@ -0,0 +1,83 @@
+# Generated by Django 6.0 on 2026-10-17 15:20
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest, Substr
+
+
+def fill_casefile_stats(apps, schema_editor):
+    # Copia congelada de core.casefile_stats.stats_expressions: la migración
+    # no debe cambiar si ese módulo cambia después
+    CaseFile = apps.get_model("core", "CaseFile")
+    CaseEvent = apps.get_model("core", "CaseEvent")
+    CaseAttachment = apps.get_model("core", "CaseAttachment")
+
+    events = CaseEvent.objects.filter(casefile=OuterRef("pk")).order_by()
+    attachments = CaseAttachment.objects.filter(casefile=OuterRef("pk")).order_by()
+    latest = events.order_by("-happened_at", "-id")
+    last_event_at = Subquery(latest.values("happened_at")[:1])
+
+    def count(qs):
+        return Coalesce(Subquery(qs.values("casefile").annotate(n=Count("id")).values("n")), 0)
+
+    CaseFile.objects.update(
+        events_count=count(events),
+        attachments_count=count(attachments),
+        last_event_at=last_event_at,
+        last_event_title=Coalesce(Subquery(latest.values("title")[:1]), Value("")),
+        last_event_preview=Coalesce(
+            Subquery(latest.annotate(preview=Substr("body", 1, 200)).values("preview")[:1]),
+            Value(""),
+        ),
+        last_activity_at=Coalesce(Greatest(F("opened_at"), last_event_at), F("opened_at")),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_client_search_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='casefile',
+            name='attachments_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='casefile',
+            name='events_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='casefile',
+            name='last_activity_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddField(
+            model_name='casefile',
+            name='last_event_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='casefile',
+            name='last_event_preview',
+            field=models.CharField(blank=True, editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='casefile',
+            name='last_event_title',
+            field=models.CharField(blank=True, editable=False, max_length=180),
+        ),
+        migrations.AddIndex(
+            model_name='casefile',
+            index=models.Index(fields=['workspace', '-opened_at', '-id'], name='core_casefile_ws_opened'),
+        ),
+        migrations.AddIndex(
+            model_name='casefile',
+            index=models.Index(fields=['workspace', '-last_activity_at', '-id'], name='core_casefile_ws_activity'),
+        ),
+        migrations.RunPython(fill_casefile_stats, migrations.RunPython.noop),
+    ]
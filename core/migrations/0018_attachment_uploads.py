@@ -0,0 +1,57 @@
+# Generated by Django 6.0 on 2026-10-17 15:10
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_casefile_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttachmentUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('original_name', models.CharField(max_length=255)),
+                ('size_bytes', models.BigIntegerField(help_text='Tamaño total declarado al iniciar')),
+                ('part_size', models.PositiveIntegerField()),
+                ('is_private', models.BooleanField(default=False)),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('complete', 'Completa'), ('aborted', 'Cancelada')], default='pending', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField()),
+                ('attachment', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='upload', to='core.caseattachment')),
+                ('casefile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_uploads', to='core.casefile')),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_uploads', to='core.caseevent')),
+                ('uploaded_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attachment_uploads', to=settings.AUTH_USER_MODEL)),
+                ('workspace', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attachment_uploads', to='core.workspace')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AttachmentUploadPart',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveIntegerField()),
+                ('size_bytes', models.PositiveIntegerField()),
+                ('storage_name', models.CharField(max_length=255)),
+                ('uploaded_at', models.DateTimeField(auto_now=True)),
+                ('upload', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='parts', to='core.attachmentupload')),
+            ],
+            options={
+                'ordering': ['index'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='attachmentupload',
+            index=models.Index(fields=['status', 'expires_at'], name='core_upload_status_exp'),
+        ),
+        migrations.AddConstraint(
+            model_name='attachmentuploadpart',
+            constraint=models.UniqueConstraint(fields=('upload', 'index'), name='core_upload_part_uniq'),
+        ),
+    ]
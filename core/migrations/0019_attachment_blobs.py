@@ -0,0 +1,36 @@
+# Generated by Django 6.0 on 2026-10-17 15:40
+
+import core.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_attachment_uploads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttachmentBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64)),
+                ('file', models.FileField(max_length=255, upload_to=core.models.attachment_blob_upload_to)),
+                ('size_bytes', models.BigIntegerField(default=0)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('workspace', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attachment_blobs', to='core.workspace')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='caseattachment',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='attachments', to='core.attachmentblob'),
+        ),
+        migrations.AddConstraint(
+            model_name='attachmentblob',
+            constraint=models.UniqueConstraint(fields=('workspace', 'sha256'), name='core_blob_ws_sha256_uniq'),
+        ),
+    ]
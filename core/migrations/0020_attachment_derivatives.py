@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-17 16:20
+
+import core.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_attachment_blobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='caseattachment',
+            name='derivatives_status',
+            field=models.CharField(choices=[('none', 'No aplica'), ('pending', 'Pendiente'), ('ready', 'Lista'), ('failed', 'Falló')], default='none', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='caseattachment',
+            name='preview',
+            field=models.FileField(blank=True, max_length=255, upload_to=core.models.attachment_derivative_upload_to),
+        ),
+        migrations.AddField(
+            model_name='caseattachment',
+            name='thumbnail',
+            field=models.FileField(blank=True, max_length=255, upload_to=core.models.attachment_derivative_upload_to),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-17 16:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_attachment_derivatives'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workspace',
+            name='logo_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.0 on 2026-10-17 14:10
+
+import core.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attachmentblob',
+            name='preview',
+            field=models.FileField(blank=True, max_length=255, upload_to=core.models.attachment_blob_derivative_upload_to),
+        ),
+        migrations.AddField(
+            model_name='attachmentblob',
+            name='thumbnail',
+            field=models.FileField(blank=True, max_length=255, upload_to=core.models.attachment_blob_derivative_upload_to),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-17 14:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_attachmentblob_derivatives'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='reminder_claimed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='workspace',
+            name='time_zone',
+            field=models.CharField(blank=True, help_text='Nombre IANA (p. ej. America/Bogota); vacío = TIME_ZONE del servidor', max_length=64, verbose_name='Zona horaria'),
+        ),
+    ]
@@ -6,7 +6,19 @@ from django.utils import timezone
 from datetime import timedelta
 import secrets
 import uuid
-class Workspace(models.Model):
+import zoneinfo
+
+from .autocomplete import normalize_email, normalize_phone, normalize_text
+from .managers import AppointmentQuerySet, CaseEventQuerySet, WorkspaceQuerySet, WorkspaceScopedQuerySet
+from .tracking import TrackedFieldsMixin
+
+
+def get_time_zone(name):
+    """Zona horaria de un workspace (nombre IANA); vacío = TIME_ZONE del servidor."""
+    return zoneinfo.ZoneInfo(name) if name else timezone.get_default_timezone()
+
+
+class Workspace(TrackedFieldsMixin, models.Model):
     NICHE_DOCTOR = "doctor"
     NICHE_DENTIST = "dentist"
     NICHE_LAWYER = "lawyer"
@@ -44,6 +56,9 @@ class Workspace(models.Model):
         blank=True,
         null=True,
     )
+    # {"64": {"webp": <nombre en storage>, "png": ...}, "128": ..., "256": ...}
+    # Se regeneran al cambiar el logo (ver core.logos)
+    logo_variants = models.JSONField(default=dict, blank=True, editable=False)
     primary_color = models.CharField(
         "Color primario",
         max_length=7,
@@ -72,7 +87,26 @@ class Workspace(models.Model):
         help_text="Nombre del tema DaisyUI/Tailwind (light, dark, corporate, etc.)",
     )
     enable_video_calls = models.BooleanField(default=False)
+    time_zone = models.CharField(
+        "Zona horaria",
+        max_length=64,
+        blank=True,
+        help_text="Nombre IANA (p. ej. America/Bogota); vacío = TIME_ZONE del servidor",
+    )
+    working_hours = models.JSONField(
+        "Horario laboral",
+        default=dict,
+        blank=True,
+        help_text='Bloques por día: {"mon": [["09:00", "14:00"], ["16:00", "19:00"]], ...}',
+    )
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = WorkspaceQuerySet.as_manager()
+
+    # Las señales comparan contra los valores cargados de la base en vez de
+    # volver a consultar en cada save (ver users.signals y core.signals)
+    TRACKED_FIELDS = ("owner_id", "slug", "name", "logo")
 
     class Meta:
         verbose_name = "Workspace"
@@ -81,6 +115,9 @@ class Workspace(models.Model):
     def __str__(self):
         return self.name
 
+    def get_timezone(self):
+        return get_time_zone(self.time_zone)
+
 
 class WorkspaceMember(models.Model):
     ROLE_OWNER = "owner"
@@ -107,6 +144,12 @@ class WorkspaceMember(models.Model):
     )
     role = models.CharField("Rol en el workspace", max_length=20, choices=ROLE_CHOICES)
     is_active = models.BooleanField(default=True)
+    working_hours = models.JSONField(
+        "Horario laboral",
+        default=dict,
+        blank=True,
+        help_text="Si se deja vacío se usa el horario del workspace.",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -118,7 +161,7 @@ class WorkspaceMember(models.Model):
         return f"{self.user} @ {self.workspace} ({self.role})"
 
 
-class Client(models.Model):
+class Client(TrackedFieldsMixin, models.Model):
     """
     Cliente/paciente del profesional.
     Puede o no tener usuario con login.
@@ -158,14 +201,50 @@ class Client(models.Model):
 
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Claves normalizadas para autocompletar (ver core.autocomplete).
+    # Se calculan en save(); quien use bulk_create/update debe llamar a
+    # set_search_keys() antes.
+    search_name = models.CharField(max_length=150, blank=True, editable=False)
+    search_email = models.CharField(max_length=254, blank=True, editable=False)
+    search_phone = models.CharField(max_length=20, blank=True, editable=False)
+
+    SEARCH_KEY_SOURCES = {"full_name": "search_name", "email": "search_email", "phone": "search_phone"}
+
+    objects = WorkspaceScopedQuerySet.as_manager()
+
+    # Al cambiar el usuario del portal se invalida la identidad de ambos (users.signals)
+    TRACKED_FIELDS = ("portal_user_id",)
 
     class Meta:
         verbose_name = "Cliente"
         verbose_name_plural = "Clientes"
+        indexes = [
+            # Búsqueda por prefijo (rango sobre B-tree). En Postgres además
+            # hay índices trigram (migración 0016).
+            models.Index(fields=["workspace", "search_name"], name="core_client_ws_sname"),
+            models.Index(fields=["workspace", "search_email"], name="core_client_ws_semail"),
+            models.Index(fields=["workspace", "search_phone"], name="core_client_ws_sphone"),
+        ]
 
     def __str__(self):
         return self.full_name
 
+    def set_search_keys(self):
+        self.search_name = normalize_text(self.full_name)[:150]
+        self.search_email = normalize_email(self.email)[:254]
+        self.search_phone = normalize_phone(self.phone)[:20]
+
+    def save(self, *args, **kwargs):
+        self.set_search_keys()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = set(update_fields) | {
+                key for source, key in self.SEARCH_KEY_SOURCES.items() if source in update_fields
+            }
+        super().save(*args, **kwargs)
+
 
 class ClientInvitation(models.Model):
     workspace = models.ForeignKey(
@@ -224,6 +303,9 @@ class Service(models.Model):
         default=0,
     )
     is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = WorkspaceScopedQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Servicio"
@@ -248,6 +330,15 @@ class Appointment(models.Model):
         (STATUS_NO_SHOW, "No se presentó"),
     ]
 
+    # Cambios de estado permitidos en los cambios masivos
+    STATUS_TRANSITIONS = {
+        STATUS_SCHEDULED: {STATUS_CONFIRMED, STATUS_COMPLETED, STATUS_CANCELLED, STATUS_NO_SHOW},
+        STATUS_CONFIRMED: {STATUS_SCHEDULED, STATUS_COMPLETED, STATUS_CANCELLED, STATUS_NO_SHOW},
+        STATUS_CANCELLED: {STATUS_SCHEDULED, STATUS_CONFIRMED},
+        STATUS_NO_SHOW: {STATUS_COMPLETED},
+        STATUS_COMPLETED: set(),
+    }
+
     MODALITY_PRESENTIAL = "presential"
     MODALITY_ONLINE = "online"
 
@@ -280,6 +371,15 @@ class Appointment(models.Model):
         blank=True,
         related_name="appointments_as_professional",
     )
+    series = models.ForeignKey(
+        "core.AppointmentSeries",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="appointments",
+    )
+    # Número de ocurrencia dentro de la serie (0 = primera)
+    series_index = models.PositiveIntegerField(null=True, blank=True, editable=False)
 
     start = models.DateTimeField("Inicio")
     end = models.DateTimeField("Fin")
@@ -300,21 +400,158 @@ class Appointment(models.Model):
     notes_internal = models.TextField("Notas internas", blank=True)
     notes_for_client = models.TextField("Notas visibles para cliente", blank=True)
     video_room = models.UUIDField(default=uuid.uuid4, null=True, editable=False)
+    # Recordatorio enviado, y el envío en curso que lo tomó (si el proceso
+    # muere, el claim vence y otro lo retoma); ver core.reminders
+    reminder_sent_at = models.DateTimeField(null=True, blank=True, editable=False)
+    reminder_claimed_at = models.DateTimeField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = AppointmentQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_start = instance.__dict__.get("start")
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Reprogramada: el recordatorio enviado era para el horario anterior
+        loaded_start = getattr(self, "_loaded_start", None)
+        if self.reminder_sent_at and loaded_start is not None and loaded_start != self.start:
+            self.reminder_sent_at = None
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "reminder_sent_at"}
+        super().save(*args, **kwargs)
+        self._loaded_start = self.start
+
+    @staticmethod
+    def video_base_url():
+        return getattr(settings, "JITSI_BASE_URL", "https://meet.digitark.cloud").rstrip("/")
 
     @property
     def video_url(self):
-        base = getattr(settings, "JITSI_BASE_URL", "https://meet.digitark.cloud").rstrip("/")
-        return f"{base}/{self.video_room}"
+        return f"{self.video_base_url()}/{self.video_room}"
 
     class Meta:
         verbose_name = "Cita"
         verbose_name_plural = "Citas"
+        indexes = [
+            # Vistas de calendario por rango de fechas
+            models.Index(fields=["workspace", "start"], name="core_appt_ws_start"),
+            models.Index(fields=["workspace", "professional", "start"], name="core_appt_ws_prof_start"),
+            # Búsqueda de traslapes: citas activas del profesional que terminan
+            # después del inicio solicitado (ver core.scheduling.find_conflict).
+            # En Postgres además hay una exclusion constraint (migración 0011).
+            models.Index(
+                fields=["professional", "end"],
+                name="core_appt_prof_end_active",
+                condition=~models.Q(status__in=["cancelled", "no_show"]),
+            ),
+            # Recordatorios pendientes por (estado, inicio); solo las filas
+            # aún sin recordatorio, así el índice no crece con el historial
+            models.Index(
+                fields=["status", "start"],
+                name="core_appt_reminder_due",
+                condition=models.Q(reminder_sent_at__isnull=True),
+            ),
+        ]
+        constraints = [
+            # La expansión de series es idempotente: una ocurrencia, una cita
+            models.UniqueConstraint(fields=["series", "series_index"], name="core_appt_series_index_uniq"),
+        ]
 
     def __str__(self):
         return f"{self.client} - {self.service} ({self.start})"
 
 
+class AppointmentSeries(models.Model):
+    """
+    Cita recurrente (regla tipo RRULE). Las citas concretas solo se
+    materializan hasta `materialized_until`; el resto se genera bajo demanda
+    cuando el calendario consulta rangos más adelante (ver core.recurrence).
+    """
+    FREQ_DAILY = "daily"
+    FREQ_WEEKLY = "weekly"
+    FREQ_MONTHLY = "monthly"
+
+    FREQ_CHOICES = [
+        (FREQ_DAILY, "Diaria"),
+        (FREQ_WEEKLY, "Semanal"),
+        (FREQ_MONTHLY, "Mensual"),
+    ]
+
+    workspace = models.ForeignKey(
+        Workspace,
+        on_delete=models.CASCADE,
+        related_name="appointment_series",
+    )
+    client = models.ForeignKey(
+        Client,
+        on_delete=models.CASCADE,
+        related_name="appointment_series",
+    )
+    service = models.ForeignKey(
+        Service,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="appointment_series",
+    )
+    professional = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="appointment_series_as_professional",
+    )
+
+    # Regla
+    start = models.DateTimeField("Inicio de la primera cita")
+    duration_minutes = models.PositiveIntegerField("Duración (minutos)")
+    freq = models.CharField("Frecuencia", max_length=10, choices=FREQ_CHOICES)
+    interval = models.PositiveSmallIntegerField("Cada", default=1)
+    # Solo semanal: ["mon", "thu"]; vacío = el día de la primera cita
+    byweekday = models.JSONField("Días de la semana", default=list, blank=True)
+    count = models.PositiveIntegerField("Número de citas", null=True, blank=True)
+    until = models.DateTimeField("Terminar antes de", null=True, blank=True)
+
+    # Se copian a cada cita
+    modality = models.CharField(
+        "Modalidad",
+        max_length=20,
+        choices=Appointment.MODALITY_CHOICES,
+        default=Appointment.MODALITY_PRESENTIAL,
+    )
+    notes_internal = models.TextField("Notas internas", blank=True)
+    notes_for_client = models.TextField("Notas visibles para cliente", blank=True)
+
+    # Expansión
+    materialized_until = models.DateTimeField(null=True, blank=True, editable=False)
+    is_complete = models.BooleanField(default=False, editable=False)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = WorkspaceScopedQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Serie de citas"
+        verbose_name_plural = "Series de citas"
+        indexes = [
+            # Series que todavía pueden generar citas (expansión perezosa)
+            models.Index(
+                fields=["workspace", "materialized_until"],
+                name="core_series_pending",
+                condition=models.Q(is_complete=False),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.client} - {self.get_freq_display()} ({self.start})"
+
+
 class AppointmentVideo(models.Model):
     appointment = models.OneToOneField("core.Appointment", on_delete=models.CASCADE, related_name="video")
     room_name = models.CharField(max_length=120, unique=True)
@@ -377,6 +614,9 @@ class Consultation(models.Model):
     )
 
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = WorkspaceScopedQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Consulta"
@@ -410,16 +650,32 @@ class CaseFile(models.Model):
     opened_at = models.DateTimeField(auto_now_add=True)
     closed_at = models.DateTimeField(null=True, blank=True)
 
+    # Resumen desnormalizado: lo mantienen las señales de core.signals
+    # (recalcular con `manage.py recompute_casefile_stats`)
+    events_count = models.PositiveIntegerField(default=0, editable=False)
+    attachments_count = models.PositiveIntegerField(default=0, editable=False)
+    last_event_at = models.DateTimeField(null=True, blank=True, editable=False)
+    last_event_title = models.CharField(max_length=180, blank=True, editable=False)
+    last_event_preview = models.CharField(max_length=200, blank=True, editable=False)
+    # max(opened_at, last_event_at); nunca nulo para poder paginar por cursor
+    last_activity_at = models.DateTimeField(default=timezone.now, editable=False)
+    # También cambia con el resumen (core.casefile_stats); ver core.conditional
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = WorkspaceScopedQuerySet.as_manager()
+
     class Meta:
         indexes = [
             models.Index(fields=["workspace", "client", "status"]),
+            models.Index(fields=["workspace", "-opened_at", "-id"], name="core_casefile_ws_opened"),
+            models.Index(fields=["workspace", "-last_activity_at", "-id"], name="core_casefile_ws_activity"),
         ]
 
     def __str__(self):
         return self.title or f"Expediente {self.client.full_name}"
     
 
-class CaseEvent(models.Model):
+class CaseEvent(TrackedFieldsMixin, models.Model):
     TYPE_NOTE = "note"
     TYPE_CALL = "call"
     TYPE_VISIT = "visit"
@@ -460,10 +716,16 @@ class CaseEvent(models.Model):
     # trazabilidad
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name="created_caseevents")
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     # datos extra (recetas, juzgado, signos vitales, etc.)
     extra_data = models.JSONField(default=dict, blank=True)
 
+    objects = CaseEventQuerySet.as_manager()
+
+    # Para mover el resumen de un expediente a otro (core.signals)
+    TRACKED_FIELDS = ("casefile_id",)
+
     class Meta:
         ordering = ["-happened_at", "-id"]
         indexes = [
@@ -479,12 +741,58 @@ class CaseEvent(models.Model):
 def case_attachment_upload_to(instance, filename):
     return f"casefiles/{instance.workspace_id}/{instance.casefile_id}/{instance.event_id}/{filename}"
 
-class CaseAttachment(models.Model):
+
+def attachment_derivative_upload_to(instance, filename):
+    return f"derivatives/{instance.workspace_id}/{instance.pk}/{filename}"
+
+
+def attachment_blob_upload_to(instance, filename):
+    return f"blobs/{instance.workspace_id}/{instance.sha256[:2]}/{instance.sha256}"
+
+
+def attachment_blob_derivative_upload_to(instance, filename):
+    # Junto al blob: "<sha256>.thumbnail.jpg"
+    return f"{attachment_blob_upload_to(instance, '')}.{filename}"
+
+
+class AttachmentBlob(models.Model):
+    """
+    Contenido de adjuntos guardado una sola vez por workspace, direccionado
+    por su SHA-256 (ver core.blobs). `ref_count` = adjuntos que lo usan; al
+    llegar a 0 se borran el archivo y sus derivados.
+    """
+    workspace = models.ForeignKey("core.Workspace", on_delete=models.CASCADE, related_name="attachment_blobs")
+    sha256 = models.CharField(max_length=64)
+    file = models.FileField(upload_to=attachment_blob_upload_to, max_length=255)
+    size_bytes = models.BigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    # Derivados del contenido: se generan una vez y los comparten sus adjuntos
+    thumbnail = models.FileField(upload_to=attachment_blob_derivative_upload_to, blank=True, max_length=255)
+    preview = models.FileField(upload_to=attachment_blob_derivative_upload_to, blank=True, max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["workspace", "sha256"], name="core_blob_ws_sha256_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.ref_count})"
+
+class CaseAttachment(TrackedFieldsMixin, models.Model):
     workspace = models.ForeignKey("core.Workspace", on_delete=models.CASCADE, related_name="caseattachments")
     casefile = models.ForeignKey(CaseFile, on_delete=models.CASCADE, related_name="attachments")
     event = models.ForeignKey(CaseEvent, on_delete=models.CASCADE, related_name="attachments")
 
     file = models.FileField(upload_to=case_attachment_upload_to)
+    # Con almacenamiento por contenido, `file` apunta al archivo del blob
+    blob = models.ForeignKey(
+        AttachmentBlob,
+        on_delete=models.RESTRICT,
+        null=True,
+        blank=True,
+        related_name="attachments",
+    )
     original_name = models.CharField(max_length=255, blank=True)
     mime_type = models.CharField(max_length=100, blank=True)
     size_bytes = models.BigIntegerField(default=0)
@@ -494,5 +802,154 @@ class CaseAttachment(models.Model):
 
     is_private = models.BooleanField(default=False)  
 
+    # Miniatura y vista previa (JPEG) para listas; se generan en segundo
+    # plano después de subir (ver core.derivatives). Con blob apuntan a los
+    # derivados del blob
+    DERIVATIVES_NONE = "none"
+    DERIVATIVES_PENDING = "pending"
+    DERIVATIVES_READY = "ready"
+    DERIVATIVES_FAILED = "failed"
+
+    DERIVATIVES_STATUS_CHOICES = [
+        (DERIVATIVES_NONE, "No aplica"),
+        (DERIVATIVES_PENDING, "Pendiente"),
+        (DERIVATIVES_READY, "Lista"),
+        (DERIVATIVES_FAILED, "Falló"),
+    ]
+
+    thumbnail = models.FileField(upload_to=attachment_derivative_upload_to, blank=True, max_length=255)
+    preview = models.FileField(upload_to=attachment_derivative_upload_to, blank=True, max_length=255)
+    derivatives_status = models.CharField(
+        max_length=10,
+        choices=DERIVATIVES_STATUS_CHOICES,
+        default=DERIVATIVES_NONE,
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = WorkspaceScopedQuerySet.as_manager()
+
+    # Resumen del expediente y variantes del archivo (core.signals)
+    TRACKED_FIELDS = ("casefile_id", "file")
+
+    def __str__(self):
+        return self.original_name or self.file.name
+
+def attachment_upload_part_to(upload, index):
+    return f"uploads/{upload.workspace_id}/{upload.id}/{index:05d}.part"
+
+
+class AttachmentUpload(models.Model):
+    """
+    Subida por partes (reanudable) de un CaseAttachment: init -> partes ->
+    complete. Las partes se guardan tal cual en el storage y se unen al final
+    (ver core.uploads).
+    """
+    STATUS_PENDING = "pending"
+    STATUS_COMPLETE = "complete"
+    STATUS_ABORTED = "aborted"
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pendiente"),
+        (STATUS_COMPLETE, "Completa"),
+        (STATUS_ABORTED, "Cancelada"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    workspace = models.ForeignKey("core.Workspace", on_delete=models.CASCADE, related_name="attachment_uploads")
+    casefile = models.ForeignKey(CaseFile, on_delete=models.CASCADE, related_name="pending_uploads")
+    event = models.ForeignKey(CaseEvent, on_delete=models.CASCADE, related_name="pending_uploads")
+    uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="attachment_uploads")
+
+    original_name = models.CharField(max_length=255)
+    size_bytes = models.BigIntegerField(help_text="Tamaño total declarado al iniciar")
+    part_size = models.PositiveIntegerField()
+    is_private = models.BooleanField(default=False)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attachment = models.OneToOneField(
+        CaseAttachment,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="upload",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "expires_at"], name="core_upload_status_exp"),
+        ]
+
+    @property
+    def parts_count(self):
+        return max(1, -(-self.size_bytes // self.part_size))
+
+    def expected_part_size(self, index):
+        if index < self.parts_count - 1:
+            return self.part_size
+        return self.size_bytes - self.part_size * (self.parts_count - 1)
+
+    def __str__(self):
+        return f"{self.original_name} ({self.get_status_display()})"
+
+
+class AttachmentUploadPart(models.Model):
+    upload = models.ForeignKey(AttachmentUpload, on_delete=models.CASCADE, related_name="parts")
+    index = models.PositiveIntegerField()
+    size_bytes = models.PositiveIntegerField()
+    storage_name = models.CharField(max_length=255)
+    uploaded_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["index"]
+        constraints = [
+            models.UniqueConstraint(fields=["upload", "index"], name="core_upload_part_uniq"),
+        ]
+
+
+class Job(models.Model):
+    """
+    Trabajo en segundo plano (cola en la base, ver core.jobs). Lo toma el
+    comando `run_worker`.
+    """
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "En cola"),
+        (STATUS_RUNNING, "Ejecutando"),
+        (STATUS_DONE, "Terminado"),
+        (STATUS_FAILED, "Falló"),
+    ]
+
+    name = models.CharField(max_length=100, help_text="Tarea registrada con @task")
+    payload = models.JSONField(default=dict, blank=True)
+    priority = models.SmallIntegerField(default=0, help_text="Mayor = antes")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    last_error = models.TextField(blank=True)
+
+    claim = models.CharField(max_length=32, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Solo la cola pendiente: el worker la recorre por prioridad
+            models.Index(
+                fields=["-priority", "run_at", "id"],
+                name="core_job_queued",
+                condition=models.Q(status="queued"),
+            ),
+            models.Index(fields=["status", "locked_at"], name="core_job_status_locked"),
+        ]
+
     def __str__(self):
-        return self.original_name or self.file.name
\ No newline at end of file
+        return f"{self.name} #{self.pk} ({self.status})"
@@ -0,0 +1,221 @@
+# core/pagination.py
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación por cursor (keyset) sobre el ordering de la vista.
+
+    El ordering debe terminar en un campo único (normalmente "id") para que
+    el cursor sea estable, y ningún campo puede aceptar NULL (la comparación
+    con NULL no ordena). Nunca usa OFFSET: cada página se pide con
+    WHERE (campo1, campo2, ...) < (valores del último registro).
+    """
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    ordering = ("-id",)
+    invalid_cursor_message = "Cursor inválido."
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(view)
+
+        cursor = self.decode_cursor(request)
+        self.reverse = bool(cursor and cursor.get("r"))
+
+        ordering = self.ordering
+        if self.reverse:
+            ordering = [self._invert(field) for field in ordering]
+
+        self._check_ordering(queryset.model)
+        queryset = queryset.order_by(*ordering)
+        if cursor:
+            position = self._parse_position(queryset.model, cursor["p"])
+            queryset = queryset.filter(self._keyset_filter(ordering, position))
+
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+
+        if self.reverse:
+            results.reverse()
+            self.has_previous = has_more
+            self.has_next = True
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        raw = request.query_params.get(self.page_size_query_param)
+        if raw:
+            try:
+                value = int(raw)
+            except (TypeError, ValueError):
+                value = 0
+            if value > 0:
+                return min(value, self.max_page_size)
+        return self.page_size
+
+    def get_ordering(self, view):
+        if view is not None and hasattr(view, "get_ordering"):
+            ordering = view.get_ordering()
+        else:
+            ordering = getattr(view, "ordering", None) or self.ordering
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        return list(ordering)
+
+    # -------------------------
+    # links
+    # -------------------------
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self._link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self._link(self.page[0], reverse=True)
+
+    def _link(self, instance, reverse):
+        position = [self._value_for(instance, field) for field in self.ordering]
+        payload = {"p": position}
+        if reverse:
+            payload["r"] = 1
+        encoded = base64.urlsafe_b64encode(
+            json.dumps(payload, separators=(",", ":")).encode()
+        ).decode().rstrip("=")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    # -------------------------
+    # cursor
+    # -------------------------
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + "=" * (-len(encoded) % 4)
+            cursor = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(cursor, dict) or not isinstance(cursor.get("p"), list):
+            raise NotFound(self.invalid_cursor_message)
+        if len(cursor["p"]) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def _check_ordering(self, model):
+        for field_name in self.ordering:
+            field = model._meta.get_field(field_name.lstrip("-"))
+            if field.null:
+                raise ImproperlyConfigured(
+                    f"KeysetPagination no puede ordenar por '{field.name}': acepta NULL."
+                )
+
+    def _parse_position(self, model, values):
+        position = []
+        for field_name, raw in zip(self.ordering, values):
+            field = model._meta.get_field(field_name.lstrip("-"))
+            try:
+                value = field.to_python(raw)
+            except Exception:
+                raise NotFound(self.invalid_cursor_message)
+            if value is None:
+                raise NotFound(self.invalid_cursor_message)
+            position.append(value)
+        return position
+
+    def _value_for(self, instance, field_name):
+        field = instance._meta.get_field(field_name.lstrip("-"))
+        return field.value_to_string(instance)
+
+    # -------------------------
+    # keyset
+    # -------------------------
+    @staticmethod
+    def _invert(field_name):
+        return field_name[1:] if field_name.startswith("-") else f"-{field_name}"
+
+    @staticmethod
+    def _keyset_filter(ordering, position):
+        """
+        (a, b, c) "después de" (x, y, z) según el ordering:
+            a > x
+            OR (a = x AND b > y)
+            OR (a = x AND b = y AND c > z)
+        (con < para los campos descendentes).
+        """
+        condition = Q()
+        equal_prefix = Q()
+        for field_name, value in zip(ordering, position):
+            name = field_name.lstrip("-")
+            lookup = "lt" if field_name.startswith("-") else "gt"
+            condition |= equal_prefix & Q(**{f"{name}__{lookup}": value})
+            equal_prefix &= Q(**{name: value})
+        return condition
+
+
+class PaginatedAPIViewMixin:
+    """
+    Paginación para APIViews "a mano" (portal de cliente), con la misma
+    interfaz que GenericAPIView.
+    """
+    pagination_class = api_settings.DEFAULT_PAGINATION_CLASS
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            self._paginator = self.pagination_class() if self.pagination_class else None
+        return self._paginator
+
+    def paginate_queryset(self, queryset):
+        if self.paginator is None:
+            return None
+        return self.paginator.paginate_queryset(queryset, self.request, view=self)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def paginated_response(self, queryset, serializer_class, **serializer_kwargs):
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(serializer_class(queryset, many=True, **serializer_kwargs).data)
+        serializer = serializer_class(page, many=True, **serializer_kwargs)
+        return self.get_paginated_response(serializer.data)
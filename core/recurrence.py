@@ -0,0 +1,263 @@
+# core/recurrence.py
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Appointment, AppointmentSeries
+from .scheduling import WEEKDAYS, IntervalSet, busy_intervals
+
+# Cuánto se materializa al crear la serie
+SERIES_HORIZON = timedelta(days=getattr(settings, "APPOINTMENT_SERIES_HORIZON_DAYS", 60))
+# Límite de la expansión perezosa (un rango muy lejano no genera años de citas)
+SERIES_MAX_LOOKAHEAD = timedelta(days=getattr(settings, "APPOINTMENT_SERIES_MAX_LOOKAHEAD_DAYS", 730))
+
+# Citas de la serie que aún se pueden mover / cancelar en bloque
+PENDING_STATUSES = [Appointment.STATUS_SCHEDULED, Appointment.STATUS_CONFIRMED]
+
+
+def _iter_dates(freq, interval, byweekday, first):
+    """Fechas (locales) de la regla a partir de `first`, sin fin."""
+    if freq == AppointmentSeries.FREQ_DAILY:
+        day = first
+        while True:
+            yield day
+            day += timedelta(days=interval)
+
+    elif freq == AppointmentSeries.FREQ_WEEKLY:
+        weekdays = sorted({WEEKDAYS.index(d) for d in byweekday}) or [first.weekday()]
+        week = first - timedelta(days=first.weekday())
+        while True:
+            for weekday in weekdays:
+                day = week + timedelta(days=weekday)
+                if day >= first:
+                    yield day
+            week += timedelta(weeks=interval)
+
+    elif freq == AppointmentSeries.FREQ_MONTHLY:
+        # Como RRULE: los meses sin ese día (31, 30, 29-feb) se saltan
+        year, month = first.year, first.month
+        while True:
+            try:
+                yield date(year, month, first.day)
+            except ValueError:
+                pass
+            month += interval
+            year, month = year + (month - 1) // 12, (month - 1) % 12 + 1
+
+    else:
+        raise ValueError(f"Frecuencia inválida: {freq}")
+
+
+def iter_occurrences(series):
+    """
+    (índice, inicio) de cada ocurrencia de la serie, en orden.
+    Se calcula en la hora local del workspace: una cita semanal a las 10:00
+    sigue a las 10:00 aunque cambie el horario de verano.
+    """
+    tz = series.workspace.get_timezone()
+    first = timezone.localtime(series.start, tz)
+    at = first.time()
+
+    for index, day in enumerate(_iter_dates(series.freq, series.interval, series.byweekday, first.date())):
+        if series.count is not None and index >= series.count:
+            return
+        start = datetime.combine(day, at, tzinfo=tz)
+        if series.until and start >= series.until:
+            return
+        yield index, start
+
+
+def materialize_series(series_id, until):
+    """
+    Crea (con un solo bulk_create) las citas de la serie que inician antes de
+    `until` y que aún no existen. Las ocurrencias que chocan con la agenda del
+    profesional se omiten. Regresa (número de citas creadas, inicios omitidos).
+    """
+    with transaction.atomic():
+        series = AppointmentSeries.objects.select_related("workspace").select_for_update(of=("self",)).get(pk=series_id)
+        since = series.materialized_until
+        if series.is_complete or (since and since >= until):
+            return 0, []
+
+        duration = timedelta(minutes=series.duration_minutes)
+        pending = []
+        complete = True
+        for index, start in iter_occurrences(series):
+            if start >= until:
+                complete = False
+                break
+            if since and start < since:
+                continue
+            pending.append((index, start, start + duration))
+
+        created, skipped = 0, []
+        if pending:
+            busy = IntervalSet()
+            if series.professional_id:
+                busy = busy_intervals(series.professional_id, pending[0][1], pending[-1][2])
+
+            last_end = None
+            rows = []
+            for index, start, end in pending:
+                if busy.overlaps(start, end) or (last_end and start < last_end):
+                    skipped.append(start)
+                    continue
+                last_end = end
+                rows.append(Appointment(
+                    workspace_id=series.workspace_id,
+                    client_id=series.client_id,
+                    service_id=series.service_id,
+                    professional_id=series.professional_id,
+                    series=series,
+                    series_index=index,
+                    start=start,
+                    end=end,
+                    modality=series.modality,
+                    notes_internal=series.notes_internal,
+                    notes_for_client=series.notes_for_client,
+                ))
+            # ignore_conflicts: la unique (series, series_index) y, en Postgres,
+            # la exclusion constraint descartan duplicados / carreras. Las
+            # filas descartadas no se reportan, así que se cuenta por diferencia
+            # sobre la unique (series, series_index)
+            existing = Appointment.objects.filter(series=series, series_index__gte=pending[0][0])
+            before = existing.count()
+            Appointment.objects.bulk_create(rows, ignore_conflicts=True)
+            created = existing.count() - before
+
+        AppointmentSeries.objects.filter(pk=series.pk).update(
+            materialized_until=until,
+            is_complete=complete,
+            updated_at=timezone.now(),
+        )
+    return created, skipped
+
+
+def expand_series(series_qs, until):
+    """
+    Expansión perezosa: materializa hasta `until` las series del queryset
+    que todavía no llegan ahí. Sin series pendientes cuesta un solo query
+    (índice parcial core_series_pending).
+    """
+    until = min(until, timezone.now() + SERIES_MAX_LOOKAHEAD)
+    pending = (
+        series_qs
+        .filter(is_complete=False, materialized_until__lt=until)
+        .values_list("id", flat=True)
+    )
+    for series_id in list(pending):
+        materialize_series(series_id, until)
+
+
+def first_occurrence_from(series, since):
+    """(índice, inicio) de la primera ocurrencia que inicia en/después de `since`."""
+    for index, start in iter_occurrences(series):
+        if start >= since:
+            return index, start
+    return None
+
+
+def cancel_following(series, since):
+    """
+    Cancela la serie desde `since`: un UPDATE sobre las citas pendientes y
+    se corta la regla para que no genere más. Regresa cuántas citas cambió.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        cancelled = (
+            Appointment.objects
+            .filter(series=series, start__gte=since, status__in=PENDING_STATUSES)
+            .update(status=Appointment.STATUS_CANCELLED, updated_at=now)
+        )
+        until = min(series.until, since) if series.until else since
+        AppointmentSeries.objects.filter(pk=series.pk).update(until=until, updated_at=now)
+    series.until = until
+    return cancelled
+
+
+def update_following(series, since, changes):
+    """
+    Edita "esta y las siguientes": la serie se parte en `since`. Las citas
+    pendientes desde ahí pasan a una serie nueva con los cambios aplicados,
+    en un solo UPDATE (los horarios se recorren con expresiones F()).
+
+    `changes` acepta: start_time (time local), duration_minutes, professional,
+    service, modality, notes_internal, notes_for_client.
+    Regresa (serie nueva, citas actualizadas, conflictos).
+    """
+    with transaction.atomic():
+        series = AppointmentSeries.objects.select_related("workspace").select_for_update(of=("self",)).get(pk=series.pk)
+        first = first_occurrence_from(series, since)
+        if first is None:
+            return None, 0, []
+        split_index, split_start = first
+
+        delta = timedelta(0)
+        if changes.get("start_time") is not None:
+            local = timezone.localtime(split_start, series.workspace.get_timezone())
+            moved = datetime.combine(local.date(), changes["start_time"], tzinfo=local.tzinfo)
+            delta = moved - split_start
+        duration_minutes = changes.get("duration_minutes") or series.duration_minutes
+        duration = timedelta(minutes=duration_minutes)
+        professional = changes.get("professional", series.professional)
+
+        following = Appointment.objects.filter(
+            series=series,
+            series_index__gte=split_index,
+            status__in=PENDING_STATUSES,
+        )
+
+        # Traslapes con el resto de la agenda del profesional (dos queries)
+        conflicts = []
+        if professional is not None:
+            rows = list(following.values_list("id", "start"))
+            if rows:
+                ranges = sorted((start + delta, start + delta + duration) for _, start in rows)
+                busy = busy_intervals(
+                    professional.pk, ranges[0][0], ranges[-1][1], exclude=[pk for pk, _ in rows]
+                )
+                conflicts = [start for start, end in ranges if busy.overlaps(start, end)]
+        if conflicts:
+            return None, 0, conflicts
+
+        new_series = AppointmentSeries.objects.create(
+            workspace_id=series.workspace_id,
+            client_id=series.client_id,
+            service=changes.get("service", series.service),
+            professional=professional,
+            start=split_start + delta,
+            duration_minutes=duration_minutes,
+            freq=series.freq,
+            interval=series.interval,
+            byweekday=series.byweekday,
+            count=series.count - split_index if series.count is not None else None,
+            until=series.until + delta if series.until else None,
+            modality=changes.get("modality", series.modality),
+            notes_internal=changes.get("notes_internal", series.notes_internal),
+            notes_for_client=changes.get("notes_for_client", series.notes_for_client),
+            materialized_until=series.materialized_until + delta if series.materialized_until else None,
+            is_complete=series.is_complete,
+        )
+
+        updated = following.update(
+            series=new_series,
+            series_index=F("series_index") - split_index,
+            start=F("start") + delta,
+            end=F("start") + delta + duration,
+            professional=new_series.professional,
+            service=new_series.service,
+            modality=new_series.modality,
+            notes_internal=new_series.notes_internal,
+            notes_for_client=new_series.notes_for_client,
+            updated_at=timezone.now(),
+            **({"reminder_sent_at": None} if delta else {}),
+        )
+
+        AppointmentSeries.objects.filter(pk=series.pk).update(
+            until=split_start,
+            updated_at=timezone.now(),
+        )
+    return new_series, updated, []
@@ -0,0 +1,192 @@
+# core/reminders.py
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Appointment
+
+logger = logging.getLogger(__name__)
+
+# Con cuánta anticipación se manda el recordatorio
+LEAD_TIME = timedelta(hours=getattr(settings, "APPOINTMENT_REMINDER_LEAD_HOURS", 24))
+BATCH_SIZE = getattr(settings, "APPOINTMENT_REMINDER_BATCH_SIZE", 500)
+BACKEND = getattr(settings, "APPOINTMENT_REMINDER_BACKEND", "core.reminders.EmailReminderBackend")
+# Un lote tomado y sin confirmar después de esto se da por perdido (proceso
+# caído) y se vuelve a tomar
+CLAIM_TIMEOUT = timedelta(minutes=getattr(settings, "APPOINTMENT_REMINDER_CLAIM_TIMEOUT_MINUTES", 15))
+
+REMIND_STATUSES = [Appointment.STATUS_SCHEDULED, Appointment.STATUS_CONFIRMED]
+
+
+class ReminderMessage:
+    def __init__(self, appointment_id, to, subject, body):
+        self.appointment_id = appointment_id
+        self.to = to
+        self.subject = subject
+        self.body = body
+
+
+class BaseReminderBackend:
+    """
+    Canal de envío. `send(messages)` recibe el lote completo y regresa los
+    appointment_id que NO se pudieron enviar (se reintentan en la siguiente
+    corrida).
+    """
+
+    def send(self, messages):
+        raise NotImplementedError
+
+
+class EmailReminderBackend(BaseReminderBackend):
+    """
+    Correo con el backend de Django (una sola conexión por lote). Para
+    desarrollo o pruebas basta APPOINTMENT_REMINDER_EMAIL_BACKEND con
+    "django.core.mail.backends.console.EmailBackend" o ".filebased.EmailBackend".
+    """
+
+    def __init__(self, email_backend=None):
+        self.email_backend = email_backend or getattr(settings, "APPOINTMENT_REMINDER_EMAIL_BACKEND", None)
+
+    def send(self, messages):
+        if not messages:
+            return []
+        mail_connection = get_connection(self.email_backend, fail_silently=False)
+        try:
+            mail_connection.open()
+        except OSError:
+            logger.warning("Sin conexión de correo para recordatorios", exc_info=True)
+            return [message.appointment_id for message in messages]
+
+        failed = []
+        try:
+            for message in messages:
+                email = EmailMessage(message.subject, message.body, to=[message.to], connection=mail_connection)
+                try:
+                    email.send()
+                except OSError:
+                    logger.warning("No se pudo enviar el recordatorio de la cita %s", message.appointment_id, exc_info=True)
+                    failed.append(message.appointment_id)
+        finally:
+            mail_connection.close()
+        return failed
+
+
+def get_backend():
+    return import_string(BACKEND)()
+
+
+def _workspace_header(workspace):
+    # Lo que no cambia entre citas del mismo workspace se arma una vez
+    return {
+        "name": workspace.name,
+        "subject": f"Recordatorio de tu cita en {workspace.name}",
+        "video": workspace.enable_video_calls,
+        "tz": workspace.get_timezone(),
+    }
+
+
+def render_message(appointment, header):
+    start = timezone.localtime(appointment.start, header["tz"])
+    lines = [
+        f"Hola {appointment.client.full_name},",
+        "",
+        f"Te recordamos tu cita en {header['name']} el {start:%d/%m/%Y} a las {start:%H:%M}.",
+    ]
+    if appointment.service_id:
+        lines.append(f"Servicio: {appointment.service.name}")
+    if appointment.professional_id:
+        lines.append(f"Con: {appointment.professional}")
+    if appointment.modality == Appointment.MODALITY_ONLINE and header["video"]:
+        lines.append(f"Enlace de la videollamada: {appointment.video_url}")
+    if appointment.notes_for_client:
+        lines += ["", appointment.notes_for_client]
+    return ReminderMessage(appointment.pk, appointment.client.email, header["subject"], "\n".join(lines))
+
+
+def due_reminders(now=None):
+    now = now or timezone.now()
+    return Appointment.objects.filter(
+        Q(reminder_claimed_at__isnull=True) | Q(reminder_claimed_at__lt=now - CLAIM_TIMEOUT),
+        status__in=REMIND_STATUSES,
+        start__gt=now,
+        start__lte=now + LEAD_TIME,
+        reminder_sent_at__isnull=True,
+    )
+
+
+def claim_batch(now, limit):
+    """
+    Toma hasta `limit` citas con recordatorio pendiente (reminder_claimed_at
+    = now) y regresa sus ids. En Postgres con SKIP LOCKED: varios procesos a
+    la vez no toman las mismas citas.
+    """
+    with transaction.atomic():
+        due = due_reminders(now).order_by("start")
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        ids = list(due.values_list("id", flat=True)[:limit])
+        if ids:
+            due_reminders(now).filter(pk__in=ids).update(reminder_claimed_at=now)
+    return ids
+
+
+def dispatch_reminders(now=None, batch_size=BATCH_SIZE, backend=None):
+    """
+    Envía los recordatorios de las citas que empiezan dentro de LEAD_TIME.
+    Por lote: un UPDATE para tomarlas, un SELECT con sus relaciones, un
+    envío al backend y un UPDATE para marcar las enviadas. Idempotente: una
+    cita con reminder_sent_at no se vuelve a recordar (salvo que se
+    reprograme); si el proceso muere a medio lote, el claim vence
+    (CLAIM_TIMEOUT) y la siguiente corrida las retoma.
+    Regresa {"sent", "skipped", "failed"}.
+    """
+    now = now or timezone.now()
+    backend = backend or get_backend()
+    report = {"sent": 0, "skipped": 0, "failed": 0}
+    failed_ids = []
+
+    while True:
+        ids = claim_batch(now, batch_size)
+        if not ids:
+            break
+        appointments = (
+            Appointment.objects
+            .filter(pk__in=ids, reminder_claimed_at=now)
+            .select_related("workspace", "client", "service", "professional")
+            .order_by("workspace_id", "start")
+        )
+        headers = {}
+        messages = []
+        done = []
+        for appointment in appointments:
+            if not appointment.client.email:
+                # Sin canal: queda marcada para no revisarla en cada corrida
+                report["skipped"] += 1
+                done.append(appointment.pk)
+                continue
+            header = headers.get(appointment.workspace_id)
+            if header is None:
+                header = headers[appointment.workspace_id] = _workspace_header(appointment.workspace)
+            messages.append(render_message(appointment, header))
+
+        failed = set(backend.send(messages))
+        done += [message.appointment_id for message in messages if message.appointment_id not in failed]
+        Appointment.objects.filter(pk__in=done, reminder_claimed_at=now).update(
+            reminder_sent_at=now, reminder_claimed_at=None,
+        )
+        report["sent"] += len(messages) - len(failed)
+        report["failed"] += len(failed)
+        failed_ids += failed
+        if len(ids) < batch_size:
+            break
+
+    if failed_ids:
+        # Se liberan al final: en esta corrida no se vuelven a tomar
+        Appointment.objects.filter(pk__in=failed_ids, reminder_claimed_at=now).update(reminder_claimed_at=None)
+    return report
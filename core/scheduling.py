@@ -0,0 +1,282 @@
+# core/scheduling.py
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from .managers import AppointmentQuerySet
+from .models import Appointment, WorkspaceMember
+
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+# Horario por defecto si ni el workspace ni el profesional configuran uno
+DEFAULT_WORKING_HOURS = {day: [["09:00", "18:00"]] for day in WEEKDAYS[:5]}
+
+# Citas que NO ocupan agenda
+FREE_STATUSES = [Appointment.STATUS_CANCELLED, Appointment.STATUS_NO_SHOW]
+
+# Duración máxima de una cita: las búsquedas por ventana (in_window,
+# find_conflict) acotan el índice con esta cota
+MAX_DURATION = AppointmentQuerySet.MAX_SPAN
+
+
+class IntervalSet:
+    """
+    Conjunto de intervalos [start, end) ordenados y sin traslapes.
+    Las operaciones son barridos lineales / bisect sobre listas ordenadas,
+    nunca comparaciones de todos contra todos.
+    """
+
+    def __init__(self, intervals=()):
+        self.starts = []
+        self.ends = []
+        for start, end in sorted(i for i in intervals if i[0] < i[1]):
+            if self.ends and start <= self.ends[-1]:
+                if end > self.ends[-1]:
+                    self.ends[-1] = end
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    def __iter__(self):
+        return iter(zip(self.starts, self.ends))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __bool__(self):
+        return bool(self.starts)
+
+    def overlaps(self, start, end):
+        """¿[start, end) se traslapa con algún intervalo? O(log n)."""
+        i = bisect_right(self.starts, start) - 1
+        if i >= 0 and self.ends[i] > start:
+            return True
+        j = bisect_left(self.starts, end)
+        return j > i + 1
+
+    def add(self, start, end):
+        """Agrega [start, end) en su lugar, fusionando con los que toca."""
+        i = bisect_left(self.ends, start)
+        j = bisect_right(self.starts, end)
+        if i < j:
+            start = min(start, self.starts[i])
+            end = max(end, self.ends[j - 1])
+        self.starts[i:j] = [start]
+        self.ends[i:j] = [end]
+
+    def subtract(self, other):
+        result = IntervalSet()
+        j = 0
+        other_starts, other_ends = other.starts, other.ends
+        for start, end in self:
+            # Saltar lo que termina antes de este intervalo
+            while j < len(other_starts) and other_ends[j] <= start:
+                j += 1
+            cursor = start
+            k = j
+            while k < len(other_starts) and other_starts[k] < end:
+                if other_starts[k] > cursor:
+                    result.starts.append(cursor)
+                    result.ends.append(other_starts[k])
+                cursor = max(cursor, other_ends[k])
+                k += 1
+            if cursor < end:
+                result.starts.append(cursor)
+                result.ends.append(end)
+        return result
+
+
+def _parse_time(value):
+    return time.fromisoformat(value)
+
+
+def validate_working_hours(hours):
+    """
+    {"mon": [["09:00", "14:00"], ["16:00", "19:00"]], ...}
+    Regresa un mensaje de error o None.
+    """
+    if not isinstance(hours, dict):
+        return "Debe ser un objeto {día: [[inicio, fin], ...]}."
+    for day, blocks in hours.items():
+        if day not in WEEKDAYS:
+            return f"Día inválido '{day}'. Usa: {', '.join(WEEKDAYS)}."
+        if not isinstance(blocks, list):
+            return f"'{day}' debe ser una lista de bloques [inicio, fin]."
+        for block in blocks:
+            if not isinstance(block, (list, tuple)) or len(block) != 2:
+                return f"Bloque inválido en '{day}': {block!r}."
+            try:
+                start, end = _parse_time(block[0]), _parse_time(block[1])
+            except (TypeError, ValueError):
+                return f"Horas inválidas en '{day}': {block!r} (usa HH:MM)."
+            if start >= end:
+                return f"En '{day}' el inicio debe ser antes del fin: {block!r}."
+    return None
+
+
+def get_working_hours(workspace, professional_id):
+    """Horario del profesional en el workspace > horario del workspace > default."""
+    member_hours = (
+        WorkspaceMember.objects
+        .filter(workspace=workspace, user_id=professional_id)
+        .values_list("working_hours", flat=True)
+        .first()
+    )
+    return member_hours or workspace.working_hours or DEFAULT_WORKING_HOURS
+
+
+def working_intervals(hours, date_from, date_to, tz=None):
+    """Bloques laborales como datetimes aware entre date_from y date_to (inclusive)."""
+    tz = tz or timezone.get_current_timezone()
+    intervals = []
+    day = date_from
+    while day <= date_to:
+        for start, end in hours.get(WEEKDAYS[day.weekday()], []):
+            intervals.append((
+                datetime.combine(day, _parse_time(start), tzinfo=tz),
+                datetime.combine(day, _parse_time(end), tzinfo=tz),
+            ))
+        day += timedelta(days=1)
+    return IntervalSet(intervals)
+
+
+def busy_intervals(professional_id, start, end, exclude=None):
+    """
+    Agenda ocupada del profesional (citas no canceladas) que toca [start, end),
+    en cualquier workspace: igual que find_conflict. Solo regresa intervalos,
+    nada de la cita.
+    """
+    qs = (
+        Appointment.objects
+        .filter(professional_id=professional_id, start__lt=end, end__gt=start)
+        .exclude(status__in=FREE_STATUSES)
+    )
+    if exclude is not None:
+        qs = qs.exclude(pk__in=exclude)
+    return IntervalSet(qs.values_list("start", "end"))
+
+
+def available_slots(workspace, professional_id, date_from, date_to, duration_minutes, step_minutes=15):
+    """
+    Horarios reservables de `duration_minutes` para el profesional,
+    cada `step_minutes` dentro de los huecos libres de su horario laboral.
+    """
+    hours = get_working_hours(workspace, professional_id)
+    working = working_intervals(hours, date_from, date_to, workspace.get_timezone())
+    if not working:
+        return []
+
+    busy = busy_intervals(professional_id, working.starts[0], working.ends[-1])
+    free = working.subtract(busy)
+
+    duration = timedelta(minutes=duration_minutes)
+    step = timedelta(minutes=step_minutes)
+    now = timezone.now()
+
+    slots = []
+    for start, end in free:
+        slot = start
+        if slot < now:
+            # alinear al siguiente múltiplo de `step` desde el inicio del bloque
+            missed = (now - start) // step + 1
+            slot = start + missed * step
+        while slot + duration <= end:
+            slots.append((slot, slot + duration))
+            slot += step
+    return slots
+
+
+def default_end(start, service=None):
+    """Fin de una cita sin 'end': duración del servicio o 30 minutos."""
+    minutes = 30
+    if service and service.default_duration_minutes:
+        minutes = service.default_duration_minutes
+    return start + timedelta(minutes=minutes)
+
+
+class BatchOverlapChecker:
+    """
+    Validación de traslapes para muchas citas a la vez: carga en UN query la
+    agenda activa de los profesionales involucrados y luego revisa cada cita
+    (y las ya aceptadas del mismo lote) con IntervalSet.
+    """
+
+    def __init__(self, ranges, exclude_ids=()):
+        """`ranges`: [(professional_id, start, end), ...] del lote."""
+        self.busy = {}
+        ranges = [r for r in ranges if r[0]]
+        if not ranges:
+            return
+        rows = (
+            Appointment.objects
+            .filter(
+                professional_id__in={r[0] for r in ranges},
+                start__lt=max(r[2] for r in ranges),
+                end__gt=min(r[1] for r in ranges),
+            )
+            .exclude(status__in=FREE_STATUSES)
+            .exclude(pk__in=list(exclude_ids))
+            .values_list("professional_id", "start", "end")
+        )
+        grouped = {}
+        for professional_id, start, end in rows:
+            grouped.setdefault(professional_id, []).append((start, end))
+        self.busy = {pid: IntervalSet(intervals) for pid, intervals in grouped.items()}
+
+    def occupy(self, professional_id, start, end):
+        """Marca el horario como ocupado sin revisarlo (p. ej. una cita que se queda donde estaba)."""
+        if professional_id:
+            self.busy.setdefault(professional_id, IntervalSet()).add(start, end)
+
+    def reserve(self, professional_id, start, end):
+        """True y aparta el horario si está libre; False si se traslapa."""
+        if not professional_id:
+            return True
+        busy = self.busy.setdefault(professional_id, IntervalSet())
+        if busy.overlaps(start, end):
+            return False
+        busy.add(start, end)
+        return True
+
+
+def span_error(start, end):
+    """Mensaje de error si [start, end) no es una duración válida de cita; si lo es, None."""
+    if end <= start:
+        return "El fin debe ser posterior al inicio."
+    if end - start > MAX_DURATION:
+        return f"La cita no puede durar más de {int(MAX_DURATION.total_seconds() // 3600)} horas."
+    return None
+
+
+def find_conflict(professional_id, start, end, exclude_id=None):
+    """
+    Primera cita activa del profesional que se traslapa con [start, end).
+    Como ninguna cita dura más de MAX_DURATION, las que se traslapan
+    terminan en (start, end + MAX_DURATION): un rango acotado sobre el
+    índice parcial (professional, end).
+    """
+    if not professional_id:
+        return None
+    qs = (
+        Appointment.objects
+        .filter(
+            professional_id=professional_id,
+            end__gt=start,
+            end__lt=end + MAX_DURATION,
+            start__lt=end,
+        )
+        .exclude(status__in=FREE_STATUSES)
+    )
+    if exclude_id:
+        qs = qs.exclude(pk=exclude_id)
+    return qs.select_related("client", "service").order_by("end").first()
+
+
+def is_overlap_violation(exc):
+    """¿El IntegrityError viene de la exclusion constraint de Postgres?"""
+    cause = getattr(exc, "__cause__", None)
+    return (
+        getattr(cause, "pgcode", None) == "23P01"
+        or "core_appointment_no_overlap" in str(exc)
+    )
@@ -0,0 +1,195 @@
+# core/search.py
+import base64
+import json
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from rest_framework.exceptions import NotFound
+
+# Tipo de resultado -> código (también es rowid % 4 en la tabla FTS5 de SQLite)
+KINDS = {"client": 1, "consultation": 2, "caseevent": 3}
+KIND_NAMES = {code: name for name, code in KINDS.items()}
+
+# Marcas del fragmento resaltado (texto plano, no HTML)
+HIGHLIGHT = ("«", "»")
+MAX_TERMS = 10
+
+# Postgres: tabla, parent_id, título, texto del fragmento
+POSTGRES_SOURCES = {
+    KINDS["client"]: ("core_client", "NULL::integer", "full_name", "concat_ws(' ', email, phone, document_id)"),
+    KINDS["consultation"]: ("core_consultation", "client_id", "title", "notes"),
+    KINDS["caseevent"]: ("core_caseevent", "casefile_id", "title", "body"),
+}
+
+# SQLite: tabla FTS5 core_search_fts (migración 0015), rowid = id * 4 + tipo.
+# tipo, tabla, parent_id, título, cuerpo
+SQLITE_SOURCES = [
+    (KINDS["client"], "core_client", "NULL", "{row}.full_name",
+     "trim(coalesce({row}.email, '') || ' ' || coalesce({row}.phone, '') || ' ' || coalesce({row}.document_id, ''))"),
+    (KINDS["consultation"], "core_consultation", "{row}.client_id", "{row}.title", "{row}.notes"),
+    (KINDS["caseevent"], "core_caseevent", "{row}.casefile_id", "{row}.title", "{row}.body"),
+]
+
+INVALID_CURSOR = "Cursor inválido."
+
+
+def sqlite_trigger_statements():
+    statements = []
+    insert = "INSERT INTO core_search_fts (rowid, workspace_id, parent_id, title, body)"
+    for kind, table, parent, title, body in SQLITE_SOURCES:
+        values = (
+            f"new.id * 4 + {kind}, new.workspace_id, {parent.format(row='new')}, "
+            f"{title.format(row='new')}, {body.format(row='new')}"
+        )
+        delete = f"DELETE FROM core_search_fts WHERE rowid = old.id * 4 + {kind};"
+        statements += [
+            f"CREATE TRIGGER IF NOT EXISTS {table}_fts_ai AFTER INSERT ON {table} "
+            f"BEGIN {insert} VALUES ({values}); END",
+            f"CREATE TRIGGER IF NOT EXISTS {table}_fts_au AFTER UPDATE ON {table} "
+            f"BEGIN {delete} {insert} VALUES ({values}); END",
+            f"CREATE TRIGGER IF NOT EXISTS {table}_fts_ad AFTER DELETE ON {table} "
+            f"BEGIN {delete} END",
+        ]
+    return statements
+
+
+def ensure_sqlite_search_triggers(sender=None, using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    post_migrate: SQLite rehace la tabla completa en varios ALTER (p. ej. al
+    agregar columnas con default) y con ella pierde sus triggers; aquí se
+    vuelven a crear los que falten.
+    """
+    db = connections[using]
+    if db.vendor != "sqlite":
+        return
+    with db.cursor() as cursor:
+        if "core_search_fts" not in db.introspection.table_names(cursor):
+            return
+        for sql in sqlite_trigger_statements():
+            cursor.execute(sql)
+
+
+def encode_cursor(row):
+    payload = {"p": [row["rank"], KINDS[row["type"]], row["id"]]}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(encoded):
+    """(rank, kind, id) de la última fila de la página anterior."""
+    try:
+        padded = encoded + "=" * (-len(encoded) % 4)
+        rank, kind, pk = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())["p"]
+        return float(rank), int(kind), int(pk)
+    except (TypeError, ValueError, KeyError):
+        raise NotFound(INVALID_CURSOR)
+
+
+def _terms(query):
+    return re.findall(r"\w+", query)[:MAX_TERMS]
+
+
+def _keyset(after, placeholders):
+    """Filas "después" de `after` en el orden (rank DESC, kind, id)."""
+    if after is None:
+        return "1 = 1", []
+    rank, kind, pk = after
+    return (
+        "(rank < {p} OR (rank = {p} AND (kind > {p} OR (kind = {p} AND id > {p}))))".format(p=placeholders),
+        [rank, rank, kind, kind, pk],
+    )
+
+
+def _postgres_sql(query, workspace_ids, kinds, after, limit):
+    # Prefijos ('rodil' encuentra 'rodilla'), todos los términos obligatorios
+    tsquery = " & ".join(f"{term}:*" for term in _terms(query))
+    parts, params = [], []
+    for kind in kinds:
+        table, parent, title, body = POSTGRES_SOURCES[kind]
+        parts.append(f"""
+            SELECT {kind} AS kind, t.id, {parent} AS parent_id, t.{title} AS title, {body} AS body,
+                   ts_rank_cd(t.search_vector, q.query) AS rank
+            FROM {table} t, q
+            WHERE t.workspace_id = ANY(%s) AND t.search_vector @@ q.query
+        """)
+        params.append(list(workspace_ids))
+    keyset, keyset_params = _keyset(after, "%s")
+    start, stop = HIGHLIGHT
+    # ts_headline es caro: solo se calcula para las filas de la página
+    sql = f"""
+        WITH q AS (SELECT to_tsquery('spanish', %s) AS query)
+        SELECT page.kind, page.id, page.parent_id, page.title, page.rank,
+               ts_headline('spanish', coalesce(page.body, ''), q.query,
+                           'StartSel={start}, StopSel={stop}, MaxWords=25, MinWords=10') AS snippet
+        FROM (
+            SELECT * FROM ({" UNION ALL ".join(parts)}) hits
+            WHERE {keyset}
+            ORDER BY rank DESC, kind, id
+            LIMIT %s
+        ) page, q
+        ORDER BY page.rank DESC, page.kind, page.id
+    """
+    return sql, [tsquery, *params, *keyset_params, limit]
+
+
+def _sqlite_sql(query, workspace_ids, kinds, after, limit):
+    match = " ".join(f'"{term}"*' for term in _terms(query))
+    workspaces = ", ".join(["%s"] * len(workspace_ids))
+    kind_list = ", ".join(str(int(kind)) for kind in kinds)
+    keyset, keyset_params = _keyset(after, "%s")
+    start, stop = HIGHLIGHT
+    # bm25: menor = mejor; se invierte para ordenar igual que en Postgres.
+    # Pesos por columna: workspace_id, parent_id, title, body
+    sql = f"""
+        SELECT kind, id, parent_id, title, rank, snippet FROM (
+            SELECT f.rowid %% 4 AS kind, f.rowid / 4 AS id, f.parent_id, f.title,
+                   -bm25(core_search_fts, 0.0, 0.0, 10.0, 1.0) AS rank,
+                   snippet(core_search_fts, -1, '{start}', '{stop}', '…', 16) AS snippet
+            FROM core_search_fts f
+            WHERE core_search_fts MATCH %s
+              AND f.workspace_id IN ({workspaces})
+              AND f.rowid %% 4 IN ({kind_list})
+        ) hits
+        WHERE {keyset}
+        ORDER BY rank DESC, kind, id
+        LIMIT %s
+    """
+    return sql, [match, *workspace_ids, *keyset_params, limit]
+
+
+BACKENDS = {
+    "postgresql": _postgres_sql,
+    "sqlite": _sqlite_sql,
+}
+
+
+def search(query, workspace_ids, kinds=None, after=None, limit=50):
+    """
+    Búsqueda de texto completo sobre clientes, consultas y eventos de
+    expediente de `workspace_ids`, ordenada por relevancia.
+    `after` es la posición (rank, kind, id) que regresa decode_cursor.
+    """
+    workspace_ids = sorted(workspace_ids)
+    kinds = sorted(KINDS[name] for name in (kinds or KINDS))
+    if not workspace_ids or not kinds or not _terms(query):
+        return []
+
+    build = BACKENDS.get(connection.vendor)
+    if build is None:
+        raise NotImplementedError(f"Búsqueda no disponible para '{connection.vendor}'.")
+
+    sql, params = build(query, workspace_ids, kinds, after, limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    return [
+        {
+            "type": KIND_NAMES[kind],
+            "id": pk,
+            "parent_id": parent_id,
+            "title": title,
+            "snippet": snippet,
+            "rank": rank,
+        }
+        for kind, pk, parent_id, title, rank, snippet in rows
+    ]
@@ -1,10 +1,21 @@
 # core/serializers.py
+import zoneinfo
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.utils.functional import cached_property
+from django.urls import reverse
+from django.utils.http import urlencode
 from rest_framework import serializers
-from .models import (Workspace, Client, Service, Appointment, Consultation, ClientInvitation, CaseFile, CaseEvent, CaseAttachment)
+from .models import (Workspace, Client, Service, Appointment, AppointmentSeries, Consultation, ClientInvitation, CaseFile, CaseEvent, CaseAttachment, AttachmentUpload)
+from .downloads import make_download_token
+from .scheduling import WEEKDAYS, validate_working_hours
+from .tenancy import staff_users
 
 
 class WorkspaceSerializer(serializers.ModelSerializer):
     logo_url = serializers.SerializerMethodField()
+    logo_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Workspace
@@ -20,15 +31,47 @@ class WorkspaceSerializer(serializers.ModelSerializer):
             "theme_name",
             "logo",
             "logo_url",
+            "logo_variants",
             "enable_video_calls",
+            "time_zone",
+            "working_hours",
         ]
         read_only_fields = ["id"]
 
+    def validate_time_zone(self, value):
+        if value:
+            try:
+                zoneinfo.ZoneInfo(value)
+            except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+                raise serializers.ValidationError("Zona horaria desconocida.")
+        return value
+
+    def validate_working_hours(self, value):
+        error = validate_working_hours(value or {})
+        if error:
+            raise serializers.ValidationError(error)
+        return value or {}
+
     def get_logo_url(self, obj):
+        # Variante PNG más grande (ligera); el original solo si aún no hay variantes
         request = self.context.get("request")
-        if obj.logo and request:
-            return request.build_absolute_uri(obj.logo.url)
-        return None
+        if not obj.logo or not request:
+            return None
+        variants = obj.logo_variants or {}
+        if variants:
+            largest = max(variants, key=int)
+            return request.build_absolute_uri(default_storage.url(variants[largest]["png"]))
+        return request.build_absolute_uri(obj.logo.url)
+
+    def get_logo_variants(self, obj):
+        """{"64": {"webp": url, "png": url}, "128": ..., "256": ...}"""
+        request = self.context.get("request")
+        if not obj.logo or not request:
+            return {}
+        return {
+            size: {ext: request.build_absolute_uri(default_storage.url(name)) for ext, name in formats.items()}
+            for size, formats in (obj.logo_variants or {}).items()
+        }
 
 
 # core/serializers.py
@@ -51,6 +94,14 @@ class ClientSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "workspace", "created_at"]
 
 
+class ClientImportRowSerializer(serializers.ModelSerializer):
+    """Una fila del import de clientes (/api/clients/import/)."""
+
+    class Meta:
+        model = Client
+        fields = ["full_name", "email", "phone", "document_id", "birth_date", "notes"]
+
+
 class ClientInvitationSerializer(serializers.ModelSerializer):
     class Meta:
         model = ClientInvitation
@@ -111,27 +162,184 @@ class AppointmentSerializer(serializers.ModelSerializer):
             "modality",
             "notes_internal",
             "notes_for_client",
+            "series",
             "created_at",
             "video_room",
             "video_url",
         ]
-        read_only_fields = ["id", "workspace", "created_at",  "video_room", "video_url"]
+        read_only_fields = ["id", "workspace", "series", "created_at",  "video_room", "video_url"]
+        # Si no viene se calcula con la duración del servicio (ver perform_create)
+        extra_kwargs = {"end": {"required": False}}
+
+
+class AppointmentBulkItemSerializer(serializers.Serializer):
+    """
+    Una cita dentro de /appointments/bulk/. Las FKs llegan como ids y se
+    resuelven contra mapas precargados (sin un query por cita).
+    """
+    id = serializers.IntegerField(required=False)
+    client = serializers.IntegerField()
+    service = serializers.IntegerField(required=False, allow_null=True)
+    professional = serializers.IntegerField(required=False, allow_null=True)
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField(required=False)
+    status = serializers.ChoiceField(choices=Appointment.STATUS_CHOICES, required=False)
+    modality = serializers.ChoiceField(choices=Appointment.MODALITY_CHOICES, required=False)
+    notes_internal = serializers.CharField(required=False, allow_blank=True)
+    notes_for_client = serializers.CharField(required=False, allow_blank=True)
+
+
+class AppointmentBulkSerializer(serializers.Serializer):
+    MAX_ITEMS = 500
+
+    items = serializers.ListField(child=serializers.DictField(), allow_empty=False, max_length=MAX_ITEMS)
+
+
+class AppointmentBulkStatusSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=AppointmentBulkSerializer.MAX_ITEMS
+    )
+    status = serializers.ChoiceField(choices=Appointment.STATUS_CHOICES)
+
+
+class WorkspaceRelatedFieldsMixin:
+    """
+    Limita las FKs client / service / professional al workspace del
+    contexto (`context["workspace_id"]`); un id de otro workspace se
+    rechaza igual que uno inexistente.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        workspace_id = self.context.get("workspace_id")
+        if workspace_id is None:
+            return fields
+        scoped = {
+            "client": Client.objects.filter(workspace_id=workspace_id),
+            "service": Service.objects.filter(workspace_id=workspace_id),
+            "professional": staff_users(workspace_id),
+        }
+        for name, queryset in scoped.items():
+            field = fields.get(name)
+            if field is not None and not field.read_only:
+                field.queryset = queryset
+        return fields
+
+
+class AppointmentSeriesSerializer(WorkspaceRelatedFieldsMixin, serializers.ModelSerializer):
+    client_name = serializers.CharField(source="client.full_name", read_only=True)
+    service_name = serializers.CharField(source="service.name", read_only=True)
+    duration_minutes = serializers.IntegerField(required=False, min_value=5, max_value=24 * 60)
+    interval = serializers.IntegerField(required=False, default=1, min_value=1, max_value=52)
+
+    class Meta:
+        model = AppointmentSeries
+        fields = [
+            "id",
+            "workspace",
+            "client",
+            "client_name",
+            "service",
+            "service_name",
+            "professional",
+            "start",
+            "duration_minutes",
+            "freq",
+            "interval",
+            "byweekday",
+            "count",
+            "until",
+            "modality",
+            "notes_internal",
+            "notes_for_client",
+            "materialized_until",
+            "is_complete",
+            "created_at",
+        ]
+        read_only_fields = ["id", "workspace", "materialized_until", "is_complete", "created_at"]
+
+    def validate_byweekday(self, value):
+        if not isinstance(value, list) or any(day not in WEEKDAYS for day in value):
+            raise serializers.ValidationError(f"Debe ser una lista de días: {', '.join(WEEKDAYS)}.")
+        return value
+
+    def validate(self, attrs):
+        if attrs.get("byweekday") and attrs.get("freq") != AppointmentSeries.FREQ_WEEKLY:
+            raise serializers.ValidationError({"byweekday": "Solo aplica a series semanales."})
+        if attrs.get("until") and attrs["until"] <= attrs["start"]:
+            raise serializers.ValidationError({"until": "Debe ser posterior al inicio."})
+        if attrs.get("count") == 0:
+            raise serializers.ValidationError({"count": "Debe ser mayor a 0."})
+        return attrs
+
+
+class AppointmentSeriesFollowingSerializer(WorkspaceRelatedFieldsMixin, serializers.Serializer):
+    """
+    Body de /appointment-series/<id>/following/ ("esta y las siguientes").
+    Requiere `workspace_id` (el de la serie) en el contexto.
+    """
+    start_from = serializers.DateTimeField()
+    start_time = serializers.TimeField(required=False)
+    duration_minutes = serializers.IntegerField(required=False, min_value=5, max_value=24 * 60)
+    professional = serializers.PrimaryKeyRelatedField(
+        queryset=get_user_model().objects.all(),
+        required=False,
+        allow_null=True,
+    )
+    service = serializers.PrimaryKeyRelatedField(queryset=Service.objects.all(), required=False, allow_null=True)
+    modality = serializers.ChoiceField(choices=Appointment.MODALITY_CHOICES, required=False)
+    notes_internal = serializers.CharField(required=False, allow_blank=True)
+    notes_for_client = serializers.CharField(required=False, allow_blank=True)
 
 
 class ClientPortalAppointmentSerializer(serializers.ModelSerializer):
+    """
+    Espera que `obj.workspace` ya esté cargado (select_related o adjuntado
+    por la vista); no hace queries por cita.
+    """
     service_name = serializers.CharField(source="service.name", read_only=True)
+    professional_name = serializers.CharField(source="professional.full_name", read_only=True, default=None)
     can_video = serializers.SerializerMethodField()
+    video_url = serializers.SerializerMethodField()
 
     class Meta:
         model = Appointment
         fields = [
-            "id","start","end","status","modality","service_name","notes_for_client",
+            "id","start","end","status","modality","service_name","professional_name","notes_for_client",
             "can_video","video_room", "video_url"
         ]
 
+    @cached_property
+    def video_base_url(self):
+        return Appointment.video_base_url()
+
     def get_can_video(self, obj):
         return obj.modality == Appointment.MODALITY_ONLINE and getattr(obj.workspace, "enable_video_calls", False)
 
+    def get_video_url(self, obj):
+        return f"{self.video_base_url}/{obj.video_room}"
+
+
+class AvailabilityQuerySerializer(serializers.Serializer):
+    """
+    Query params de /appointments/availability/
+    """
+    MAX_RANGE_DAYS = 62
+
+    professional = serializers.IntegerField(required=False)
+    service = serializers.IntegerField(required=False)
+    duration = serializers.IntegerField(required=False, min_value=5, max_value=24 * 60)
+    date_from = serializers.DateField()
+    date_to = serializers.DateField()
+    step = serializers.IntegerField(required=False, default=15, min_value=5, max_value=240)
+
+    def validate(self, attrs):
+        if attrs["date_to"] < attrs["date_from"]:
+            raise serializers.ValidationError({"date_to": "Debe ser igual o posterior a date_from."})
+        if (attrs["date_to"] - attrs["date_from"]).days >= self.MAX_RANGE_DAYS:
+            raise serializers.ValidationError({"date_to": f"El rango máximo es de {self.MAX_RANGE_DAYS} días."})
+        return attrs
+
 
 class ConsultationSerializer(serializers.ModelSerializer):
     client_name = serializers.CharField(source="client.full_name", read_only=True)
@@ -156,8 +364,64 @@ class ConsultationSerializer(serializers.ModelSerializer):
 # -----------------------------------------
 # CASE ATTACHMENTS
 # -----------------------------------------
+def attachment_download_url(request, attachment, variant=None):
+    """
+    URL de descarga con permisos (con token firmado para usarla en <a>/<img>).
+    `variant`: "thumbnail" / "preview" para los derivados.
+    """
+    fieldfile = getattr(attachment, variant) if variant else attachment.file
+    if not fieldfile or request is None:
+        return None
+    params = {}
+    if variant:
+        params["variant"] = variant
+    if request.user.is_authenticated:
+        params["token"] = make_download_token(attachment.pk, request.user.pk)
+    url = reverse("caseattachment-download", args=[attachment.pk])
+    if params:
+        url += "?" + urlencode(params)
+    return request.build_absolute_uri(url)
+
+
+class AttachmentUploadStartSerializer(serializers.Serializer):
+    filename = serializers.CharField(max_length=255)
+    size_bytes = serializers.IntegerField(min_value=1)
+    part_size = serializers.IntegerField(required=False, min_value=1)
+    is_private = serializers.BooleanField(required=False, default=False)
+
+
+class AttachmentUploadSerializer(serializers.ModelSerializer):
+    parts_count = serializers.IntegerField(read_only=True)
+    received_parts = serializers.SerializerMethodField()
+
+    class Meta:
+        model = AttachmentUpload
+        fields = [
+            "id",
+            "workspace",
+            "casefile",
+            "event",
+            "original_name",
+            "size_bytes",
+            "part_size",
+            "parts_count",
+            "received_parts",
+            "is_private",
+            "status",
+            "attachment",
+            "created_at",
+            "expires_at",
+        ]
+        read_only_fields = fields
+
+    def get_received_parts(self, obj):
+        return [part.index for part in obj.parts.all()]
+
+
 class CaseAttachmentSerializer(serializers.ModelSerializer):
     file_url = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
+    preview_url = serializers.SerializerMethodField()
 
     class Meta:
         model = CaseAttachment
@@ -168,6 +432,9 @@ class CaseAttachmentSerializer(serializers.ModelSerializer):
             "event",
             "file",
             "file_url",
+            "thumbnail_url",
+            "preview_url",
+            "derivatives_status",
             "original_name",
             "mime_type",
             "size_bytes",
@@ -183,13 +450,19 @@ class CaseAttachmentSerializer(serializers.ModelSerializer):
             "size_bytes",
             "uploaded_by",
             "uploaded_at",
+            "derivatives_status",
         ]
+        # El archivo solo se entrega por file_url (descarga con permisos)
+        extra_kwargs = {"file": {"write_only": True}}
 
     def get_file_url(self, obj):
-        request = self.context.get("request")
-        if obj.file and request:
-            return request.build_absolute_uri(obj.file.url)
-        return None
+        return attachment_download_url(self.context.get("request"), obj)
+
+    def get_thumbnail_url(self, obj):
+        return attachment_download_url(self.context.get("request"), obj, "thumbnail")
+
+    def get_preview_url(self, obj):
+        return attachment_download_url(self.context.get("request"), obj, "preview")
 
 
 # -----------------------------------------
@@ -224,7 +497,6 @@ class CaseEventSerializer(serializers.ModelSerializer):
 # -----------------------------------------
 class CaseFileSerializer(serializers.ModelSerializer):
     client_name = serializers.CharField(source="client.full_name", read_only=True)
-    events_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = CaseFile
@@ -241,8 +513,17 @@ class CaseFileSerializer(serializers.ModelSerializer):
             "opened_at",
             "closed_at",
             "events_count",
+            "attachments_count",
+            "last_event_at",
+            "last_event_title",
+            "last_event_preview",
+            "last_activity_at",
+        ]
+        read_only_fields = [
+            "id", "workspace", "opened_at",
+            "events_count", "attachments_count",
+            "last_event_at", "last_event_title", "last_event_preview", "last_activity_at",
         ]
-        read_only_fields = ["id", "workspace", "opened_at", "events_count"]
 
     def validate_status(self, value):
         if value in (None, ""):
@@ -290,16 +571,24 @@ class ClientPortalCaseFileSerializer(serializers.ModelSerializer):
 
 class ClientPortalCaseAttachmentSerializer(serializers.ModelSerializer):
     file_url = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
+    preview_url = serializers.SerializerMethodField()
 
     class Meta:
         model = CaseAttachment
-        fields = ["id", "original_name", "mime_type", "size_bytes", "uploaded_at", "file_url"]
+        fields = [
+            "id", "original_name", "mime_type", "size_bytes", "uploaded_at",
+            "file_url", "thumbnail_url", "preview_url",
+        ]
 
     def get_file_url(self, obj):
-        request = self.context.get("request")
-        if obj.file and request:
-            return request.build_absolute_uri(obj.file.url)
-        return None
+        return attachment_download_url(self.context.get("request"), obj)
+
+    def get_thumbnail_url(self, obj):
+        return attachment_download_url(self.context.get("request"), obj, "thumbnail")
+
+    def get_preview_url(self, obj):
+        return attachment_download_url(self.context.get("request"), obj, "preview")
 
 
 class ClientPortalCaseEventSerializer(serializers.ModelSerializer):
@@ -318,6 +607,8 @@ class ClientPortalCaseEventSerializer(serializers.ModelSerializer):
         ]
 
     def get_attachments(self, obj):
-        # Solo attachments NO privados en el portal
-        qs = obj.attachments.filter(is_private=False).order_by("-uploaded_at")
-        return ClientPortalCaseAttachmentSerializer(qs, many=True, context=self.context).data
\ No newline at end of file
+        # Solo attachments NO privados en el portal, ya prefetcheados por
+        # CaseEvent.objects.portal_timeline() (no hace queries por evento)
+        return ClientPortalCaseAttachmentSerializer(
+            obj.public_attachments, many=True, context=self.context
+        ).data
\ No newline at end of file
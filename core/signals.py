@@ -0,0 +1,68 @@
+# core/signals.py
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import casefile_stats, derivatives
+from .blobs import release_blob
+from .jobs import enqueue
+from .models import CaseEvent, CaseAttachment, Workspace
+
+
+# -------------------------
+# Resumen de expedientes (CaseFile.events_count, last_event_*, ...)
+# Valores previos: TrackedFieldsMixin (core.tracking)
+# -------------------------
+@receiver(post_save, sender=CaseEvent)
+def caseevent_saved(sender, instance, created, **kwargs):
+    if created:
+        casefile_stats.event_added(instance)
+        return
+
+    previous = instance.previous_values().get("casefile_id")
+    if previous and previous != instance.casefile_id:
+        casefile_stats.adjust_events(previous, -1)
+        casefile_stats.adjust_events(instance.casefile_id, 1)
+    # Pudo cambiar la fecha / texto del último evento
+    casefile_stats.refresh_last_event([instance.casefile_id, previous])
+
+
+@receiver(post_delete, sender=CaseEvent)
+def caseevent_deleted(sender, instance, **kwargs):
+    casefile_stats.event_removed(instance.casefile_id)
+
+
+@receiver(post_save, sender=CaseAttachment)
+def caseattachment_saved(sender, instance, created, **kwargs):
+    previous = instance.previous_values().get("casefile_id")
+    if created:
+        casefile_stats.adjust_attachments(instance.casefile_id, 1)
+    elif previous and previous != instance.casefile_id:
+        casefile_stats.adjust_attachments(previous, -1)
+        casefile_stats.adjust_attachments(instance.casefile_id, 1)
+
+    # Miniatura / vista previa (en segundo plano, después del commit)
+    if created or "file" in instance.tracked_changes():
+        derivatives.schedule_derivatives(instance)
+
+
+@receiver(post_delete, sender=CaseAttachment)
+def caseattachment_deleted(sender, instance, **kwargs):
+    casefile_stats.adjust_attachments(instance.casefile_id, -1)
+    release_blob(instance.blob_id)
+    names = [instance.thumbnail.name, instance.preview.name]
+    if any(names):
+        transaction.on_commit(lambda: derivatives.delete_files(names))
+
+
+# -------------------------
+# Variantes del logo del workspace (core.logos)
+# -------------------------
+@receiver(post_save, sender=Workspace)
+def workspace_saved(sender, instance, created, **kwargs):
+    if not created and "logo" not in instance.tracked_changes():
+        return
+    if created and not instance.logo:
+        return
+    # Redimensionar y codificar es lento: va a la cola (core.tasks)
+    enqueue("core.build_logo_variants", workspace_id=instance.pk)
@@ -0,0 +1,53 @@
+# core/tasks.py
+# Tareas de la cola (core.jobs). Se registran al cargar la app (CoreConfig.ready).
+import logging
+
+from django.core.mail import send_mail
+from PIL import Image
+
+from . import derivatives, logos
+from .jobs import PRIORITY_HIGH, PRIORITY_LOW, task
+from .models import ClientInvitation, Workspace
+
+logger = logging.getLogger(__name__)
+
+
+@task("core.generate_derivatives", priority=PRIORITY_LOW)
+def generate_attachment_derivatives(attachment_id):
+    derivatives.generate_derivatives(attachment_id)
+
+
+@task("core.build_logo_variants")
+def build_workspace_logo_variants(workspace_id):
+    workspace = Workspace.objects.filter(pk=workspace_id).first()
+    if workspace is None:
+        return
+    try:
+        logos.build_logo_variants(workspace)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        # Imagen inválida: reintentar no sirve
+        logger.warning("No se pudieron generar variantes del logo del workspace %s", workspace_id, exc_info=True)
+
+
+@task("core.send_client_invitation", priority=PRIORITY_HIGH)
+def send_client_invitation(invitation_id, invite_url):
+    invitation = (
+        ClientInvitation.objects
+        .select_related("workspace", "client")
+        .filter(pk=invitation_id)
+        .first()
+    )
+    if invitation is None or not invitation.email or not invitation.is_valid:
+        return
+    workspace = invitation.workspace
+    send_mail(
+        subject=f"Invitación al portal de {workspace.name}",
+        message=(
+            f"Hola {invitation.client.full_name},\n\n"
+            f"{workspace.name} te invitó a su portal de clientes. Para crear tu acceso entra a:\n\n"
+            f"{invite_url}\n\n"
+            f"El enlace vence el {invitation.expires_at:%d/%m/%Y}."
+        ),
+        from_email=None,
+        recipient_list=[invitation.email],
+    )
@@ -0,0 +1,128 @@
+# core/tenancy.py
+from django.contrib.auth import get_user_model
+from django.db.models import CharField, Q, Value
+from django.utils.functional import cached_property
+
+from .models import Workspace, WorkspaceMember
+
+
+class TenantContext:
+    """
+    Workspaces (y rol en cada uno) a los que tiene acceso un usuario.
+
+    Se resuelve con una sola consulta (UNION de workspaces propios y
+    membresías) y se memoiza por request, para que los querysets filtren con
+    un simple `workspace_id IN (...)` en vez de repetir el subquery
+    Q(owner) | Q(memberships__user) + DISTINCT.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.user_id = getattr(user, "pk", None) if getattr(user, "is_authenticated", False) else None
+
+    @cached_property
+    def roles(self):
+        """{workspace_id: rol}; el rol owner gana sobre cualquier membresía."""
+        if self.user_id is None:
+            return {}
+
+        # Usuario "stateless" de TenantJWTAuthentication: roles vienen del token
+        token_roles = getattr(self.user, "tenant_roles", None)
+        if token_roles is not None:
+            return token_roles
+
+        owned = (
+            Workspace.objects
+            .filter(owner_id=self.user_id)
+            .annotate(member_role=Value(WorkspaceMember.ROLE_OWNER, output_field=CharField()))
+            .values_list("id", "member_role")
+        )
+        memberships = (
+            WorkspaceMember.objects
+            .filter(user_id=self.user_id)
+            .values_list("workspace_id", "role")
+        )
+
+        roles = {}
+        for workspace_id, role in owned.union(memberships, all=True):
+            if role == WorkspaceMember.ROLE_OWNER or workspace_id not in roles:
+                roles[workspace_id] = role
+        return roles
+
+    @cached_property
+    def workspace_ids(self):
+        return sorted(self.roles)
+
+    @property
+    def current_workspace_id(self):
+        # Igual que antes: el primer workspace (por id) del usuario
+        return self.workspace_ids[0] if self.workspace_ids else None
+
+    @cached_property
+    def current_workspace(self):
+        if self.current_workspace_id is None:
+            return None
+        return Workspace.objects.filter(pk=self.current_workspace_id).first()
+
+    def role_for(self, workspace_id):
+        return self.roles.get(workspace_id)
+
+    def has_access(self, workspace_id):
+        return workspace_id in self.roles
+
+
+def workspace_staff(workspace_ids, user_ids):
+    """
+    {(workspace_id, user_id)} de quienes pueden atender citas en esos
+    workspaces: el dueño y los miembros activos que no son clientes.
+    Un solo query (UNION), como TenantContext.roles.
+    """
+    workspace_ids, user_ids = set(workspace_ids), {user_id for user_id in user_ids if user_id}
+    if not workspace_ids or not user_ids:
+        return set()
+    owners = (
+        Workspace.objects
+        .filter(pk__in=workspace_ids, owner_id__in=user_ids)
+        .values_list("id", "owner_id")
+    )
+    members = (
+        WorkspaceMember.objects
+        .filter(workspace_id__in=workspace_ids, user_id__in=user_ids, is_active=True)
+        .exclude(role=WorkspaceMember.ROLE_CLIENT)
+        .values_list("workspace_id", "user_id")
+    )
+    return set(owners.union(members))
+
+
+def staff_users(workspace_id):
+    """Queryset de usuarios que atienden en el workspace (ver workspace_staff)."""
+    members = (
+        WorkspaceMember.objects
+        .filter(workspace_id=workspace_id, is_active=True)
+        .exclude(role=WorkspaceMember.ROLE_CLIENT)
+        .values("user_id")
+    )
+    return get_user_model().objects.filter(
+        Q(pk__in=Workspace.objects.filter(pk=workspace_id).values("owner_id")) | Q(pk__in=members)
+    )
+
+
+def is_workspace_staff(workspace_id, user_id):
+    return (workspace_id, user_id) in workspace_staff([workspace_id], [user_id])
+
+
+def get_tenant_context(request):
+    """
+    Regresa el TenantContext memoizado en el request.
+    Acepta tanto el HttpRequest de Django como el Request de DRF (la
+    autenticación JWT de DRF ocurre después del middleware).
+    """
+    http_request = getattr(request, "_request", request)
+    user = getattr(request, "user", None)
+    user_id = getattr(user, "pk", None) if getattr(user, "is_authenticated", False) else None
+
+    tenant = getattr(http_request, "_tenant_context", None)
+    if tenant is None or tenant.user_id != user_id:
+        tenant = TenantContext(user)
+        http_request._tenant_context = tenant
+    return tenant
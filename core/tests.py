@@ -1,3 +1,1296 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+import zoneinfo
+from datetime import datetime, time, timedelta
+from importlib import import_module
+from unittest import mock
+from urllib.parse import urlparse
 
-# Create your tests here.
+from django.apps import apps
+from django.core import mail
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+
+from users.models import User
+from .models import Workspace, WorkspaceMember, Client, Service, Appointment, AppointmentSeries, Consultation, CaseFile, CaseEvent, CaseAttachment, AttachmentBlob, AttachmentUpload, Job
+from .casefile_stats import recompute_casefile_stats
+from . import blobs, derivatives, downloads, jobs, logos, reminders
+from .middleware import LogoVariantCacheMiddleware
+from .pagination import KeysetPagination
+from .uploads import save_part
+from .recurrence import materialize_series
+from .scheduling import MAX_DURATION, IntervalSet
+from .tenancy import TenantContext
+
+
+class WorkspaceTestCase(TestCase):
+    """Profesional dueño de un workspace y un cliente con acceso al portal."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(email="pro@example.com", password="pass12345", full_name="Pro")
+        self.workspace = Workspace.objects.create(owner=self.owner, name="Clínica", slug="clinica")
+        WorkspaceMember.objects.create(workspace=self.workspace, user=self.owner, role=WorkspaceMember.ROLE_OWNER)
+        self.portal_user = User.objects.create_user(
+            email="cliente@example.com", password="pass12345", role=User.ROLE_CLIENT
+        )
+        self.client_obj = Client.objects.create(
+            workspace=self.workspace, full_name="Juan Pérez", email="juan@example.com", portal_user=self.portal_user
+        )
+        self.service = Service.objects.create(workspace=self.workspace, name="Consulta", default_duration_minutes=45)
+        self.api = APIClient()
+        self.api.force_authenticate(self.owner)
+
+
+@override_settings(MEDIA_ROOT="/tmp/test-media")
+class ClientPortalCaseFileEventsQueriesTests(TestCase):
+    """
+    El timeline del portal debe costar un número constante de queries,
+    sin importar cuántos eventos/adjuntos tenga el expediente.
+    """
+
+    def setUp(self):
+        owner = User.objects.create_user(email="pro@example.com", password="pass12345")
+        self.workspace = Workspace.objects.create(owner=owner, name="Clínica", slug="clinica")
+        self.portal_user = User.objects.create_user(
+            email="cliente@example.com", password="pass12345", role=User.ROLE_CLIENT
+        )
+        client = Client.objects.create(
+            workspace=self.workspace, full_name="Cliente", portal_user=self.portal_user
+        )
+        self.casefile = CaseFile.objects.create(workspace=self.workspace, client=client)
+
+        self.api = APIClient()
+        self.api.force_authenticate(self.portal_user)
+        self.url = f"/api/client-portal/casefiles/{self.casefile.id}/events/"
+
+    def add_events(self, count):
+        now = timezone.now()
+        for i in range(count):
+            event = CaseEvent.objects.create(
+                workspace=self.workspace,
+                casefile=self.casefile,
+                title=f"Evento {i}",
+                happened_at=now - timedelta(minutes=i),
+            )
+            for is_private in (False, True):
+                CaseAttachment.objects.create(
+                    workspace=self.workspace,
+                    casefile=self.casefile,
+                    event=event,
+                    file=ContentFile(b"x", name="nota.txt"),
+                    is_private=is_private,
+                )
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.api.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_constant_number_of_queries(self):
+        self.add_events(2)
+        few, _ = self.count_queries()
+
+        self.add_events(10)
+        many, response = self.count_queries()
+
+        self.assertEqual(few, many)
+        self.assertEqual(len(response.data["results"]), 12)
+
+    def test_only_public_attachments(self):
+        self.add_events(3)
+        _, response = self.count_queries()
+
+        for event in response.data["results"]:
+            self.assertEqual(len(event["attachments"]), 1)
+
+
+class KeysetPaginationTests(WorkspaceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.casefile = CaseFile.objects.create(workspace=self.workspace, client=self.client_obj)
+        now = timezone.now()
+        # happened_at repetidos: el desempate por id debe mantener el orden estable
+        for i in range(7):
+            CaseEvent.objects.create(
+                workspace=self.workspace, casefile=self.casefile, title=f"Evento {i}",
+                happened_at=now - timedelta(hours=i % 3),
+            )
+
+    def test_walks_all_pages_without_duplicates(self):
+        seen = []
+        url = "/api/caseevents/?page_size=3"
+        while url:
+            response = self.api.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen += [event["id"] for event in response.data["results"]]
+            url = response.data["next"]
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(len(set(seen)), 7)
+
+    def test_previous_link_returns_same_page(self):
+        first = self.api.get("/api/caseevents/?page_size=3")
+        second = self.api.get(first.data["next"])
+        back = self.api.get(second.data["previous"])
+        self.assertEqual(
+            [event["id"] for event in back.data["results"]],
+            [event["id"] for event in first.data["results"]],
+        )
+        self.assertIsNone(first.data["previous"])
+
+    def test_invalid_or_null_cursor_is_404(self):
+        self.assertEqual(self.api.get("/api/caseevents/?cursor=nope").status_code, 404)
+        # {"p": [null, null]}
+        self.assertEqual(self.api.get("/api/caseevents/?cursor=eyJwIjpbbnVsbCxudWxsXX0").status_code, 404)
+
+    def test_rejects_nullable_ordering(self):
+        class View:
+            ordering = ("-closed_at", "-id")
+
+        request = Request(RequestFactory().get("/"))
+        with self.assertRaises(ImproperlyConfigured):
+            KeysetPagination().paginate_queryset(CaseFile.objects.all(), request, view=View())
+
+
+class TenantContextTests(WorkspaceTestCase):
+    def setUp(self):
+        super().setUp()
+        other = User.objects.create_user(email="otro@example.com", password="pass12345")
+        self.other_workspace = Workspace.objects.create(owner=other, name="Despacho", slug="despacho")
+        Client.objects.create(workspace=self.other_workspace, full_name="Cliente ajeno")
+        self.assistant = User.objects.create_user(email="asistente@example.com", password="pass12345")
+        WorkspaceMember.objects.create(workspace=self.other_workspace, user=self.assistant, role="assistant")
+
+    def test_roles_resolved_in_one_query(self):
+        tenant = TenantContext(self.owner)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(tenant.roles, {self.workspace.id: WorkspaceMember.ROLE_OWNER})
+            tenant.workspace_ids, tenant.has_access(self.workspace.id)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_lists_are_scoped_without_distinct(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.api.get("/api/clients/")
+        self.assertEqual([c["full_name"] for c in response.data["results"]], ["Juan Pérez"])
+        self.assertFalse(any("DISTINCT" in q["sql"] for q in ctx.captured_queries))
+
+    def test_member_works_in_its_workspace(self):
+        self.api.force_authenticate(self.assistant)
+        response = self.api.get("/api/clients/")
+        self.assertEqual([c["full_name"] for c in response.data["results"]], ["Cliente ajeno"])
+        response = self.api.post("/api/services/", {"name": "Asesoría"})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["workspace"], self.other_workspace.id)
+
+
+class ClientPortalAppointmentsQueriesTests(WorkspaceTestCase):
+    """Las citas del portal (con can_video) cuestan las mismas queries con 3 o 30 citas."""
+
+    def add_appointments(self, count):
+        start = timezone.now() + timedelta(days=1)
+        Appointment.objects.bulk_create([
+            Appointment(
+                workspace=self.workspace, client=self.client_obj, service=self.service,
+                start=start + timedelta(hours=i), end=start + timedelta(hours=i, minutes=30),
+                modality=Appointment.MODALITY_ONLINE,
+            )
+            for i in range(count)
+        ])
+
+    def count_queries(self):
+        self.api.force_authenticate(self.portal_user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.api.get("/api/client-portal/appointments/")
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_constant_number_of_queries(self):
+        Workspace.objects.filter(pk=self.workspace.pk).update(enable_video_calls=True)
+        self.add_appointments(3)
+        few, _ = self.count_queries()
+        self.add_appointments(27)
+        many, response = self.count_queries()
+        self.assertEqual(few, many)
+        self.assertTrue(response.data["results"][0]["can_video"])
+
+    def test_not_modified_until_professional_changes(self):
+        self.add_appointments(2)
+        Appointment.objects.update(professional=self.owner)
+        _, response = self.count_queries()
+        etag = response["ETag"]
+        self.assertEqual(response.data["results"][0]["professional_name"], "Pro")
+
+        cached = self.api.get("/api/client-portal/appointments/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached["ETag"], etag)
+
+        self.owner.full_name = "Dra. Pro"
+        self.owner.save()
+        response = self.api.get("/api/client-portal/appointments/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"][0]["professional_name"], "Dra. Pro")
+        self.assertTrue(response.data["results"][0]["video_url"])
+
+
+class AvailabilityTests(WorkspaceTestCase):
+    def setUp(self):
+        super().setUp()
+        day = timezone.localdate() + timedelta(days=7)
+        self.day = day - timedelta(days=day.weekday())  # lunes
+
+    def at(self, hour):
+        return datetime.combine(self.day, datetime.min.time(), tzinfo=timezone.get_current_timezone()).replace(hour=hour)
+
+    def slots(self):
+        response = self.api.get(
+            f"/api/appointments/availability/?service={self.service.id}&date_from={self.day}&date_to={self.day}&step=30"
+        )
+        self.assertEqual(response.status_code, 200)
+        return [timezone.localtime(slot["start"]).strftime("%H:%M") for slot in response.data["slots"]]
+
+    def test_booked_time_is_not_offered(self):
+        Appointment.objects.create(
+            workspace=self.workspace, client=self.client_obj, professional=self.owner,
+            start=self.at(10), end=self.at(11),
+        )
+        Appointment.objects.create(
+            workspace=self.workspace, client=self.client_obj, professional=self.owner,
+            start=self.at(12), end=self.at(13), status=Appointment.STATUS_CANCELLED,
+        )
+        starts = self.slots()
+        # Servicio de 45 min: 09:30 ya choca con la cita de las 10
+        self.assertIn("09:00", starts)
+        self.assertNotIn("09:30", starts)
+        self.assertNotIn("10:30", starts)
+        self.assertIn("11:00", starts)
+        self.assertIn("12:00", starts)
+        self.assertEqual(starts[-1], "17:00")
+
+    def test_bookings_in_other_workspaces_are_busy(self):
+        other_owner = User.objects.create_user(email="otra@example.com", password="pass12345")
+        other = Workspace.objects.create(owner=other_owner, name="Otra", slug="otra")
+        WorkspaceMember.objects.create(workspace=other, user=self.owner, role=WorkspaceMember.ROLE_PROFESSIONAL)
+        other_client = Client.objects.create(workspace=other, full_name="Ana")
+        Appointment.objects.create(
+            workspace=other, client=other_client, professional=self.owner, start=self.at(9), end=self.at(10),
+        )
+        starts = self.slots()
+        self.assertNotIn("09:00", starts)
+        self.assertIn("10:00", starts)
+
+        response = self.api.post("/api/appointments/", {
+            "client": self.client_obj.id, "service": self.service.id, "start": self.at(9).isoformat(),
+        }, format="json")
+        self.assertEqual(response.status_code, 409)
+
+    def test_range_is_limited(self):
+        response = self.api.get(
+            f"/api/appointments/availability/?date_from={self.day}&date_to={self.day + timedelta(days=100)}"
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_interval_set(self):
+        busy = IntervalSet([(0, 10), (5, 12), (20, 30)])
+        self.assertEqual(list(busy), [(0, 12), (20, 30)])
+        self.assertEqual(
+            list(busy.subtract(IntervalSet([(2, 3), (11, 21), (25, 26)]))),
+            [(0, 2), (3, 11), (21, 25), (26, 30)],
+        )
+        self.assertTrue(busy.overlaps(11, 13))
+        self.assertFalse(busy.overlaps(12, 20))
+
+
+class AppointmentConflictTenancyTests(WorkspaceTestCase):
+    """Un 409 no debe exponer citas de otro workspace."""
+
+    def setUp(self):
+        super().setUp()
+        self.start = timezone.now().replace(microsecond=0) + timedelta(days=2)
+        # Profesional que atiende en otro workspace y también en este
+        self.shared = User.objects.create_user(email="compartido@example.com", password="pass12345")
+        self.other_workspace = Workspace.objects.create(owner=self.shared, name="Despacho", slug="despacho")
+        other_client = Client.objects.create(workspace=self.other_workspace, full_name="Paciente ajeno")
+        Appointment.objects.create(
+            workspace=self.other_workspace, client=other_client, professional=self.shared,
+            start=self.start, end=self.start + timedelta(hours=1), notes_internal="privado",
+        )
+        self.outsider = User.objects.create_user(email="externo@example.com", password="pass12345")
+
+    def book(self, professional, path="/api/appointments/"):
+        return self.api.post(path, {
+            "client": self.client_obj.id,
+            "professional": professional.id,
+            "start": self.start.isoformat(),
+            "end": (self.start + timedelta(minutes=30)).isoformat(),
+        }, format="json")
+
+    def test_professional_must_belong_to_workspace(self):
+        response = self.book(self.outsider)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("professional", response.data)
+
+        response = self.api.post("/api/appointments/bulk/", {"items": [{
+            "client": self.client_obj.id,
+            "professional": self.shared.id,
+            "start": self.start.isoformat(),
+        }]}, format="json")
+        self.assertEqual(response.data["results"][0]["errors"], {"professional": ["Profesional no encontrado en el workspace."]})
+
+    def test_conflict_in_foreign_workspace_is_not_disclosed(self):
+        WorkspaceMember.objects.create(workspace=self.workspace, user=self.shared, role=WorkspaceMember.ROLE_PROFESSIONAL)
+        response = self.book(self.shared)
+        self.assertEqual(response.status_code, 409)
+        self.assertIsNone(response.data["conflict"])
+
+    def test_conflict_in_own_workspace_is_returned(self):
+        Appointment.objects.create(
+            workspace=self.workspace, client=self.client_obj, professional=self.owner,
+            start=self.start, end=self.start + timedelta(hours=1),
+        )
+        response = self.book(self.owner)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data["conflict"]["client_name"], "Juan Pérez")
+
+
+class AppointmentWindowTests(WorkspaceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.start = timezone.now().replace(microsecond=0) + timedelta(days=3)
+
+    def test_window_filters_overlapping(self):
+        for hours in (0, 24, 48):
+            start = self.start + timedelta(hours=hours)
+            Appointment.objects.create(
+                workspace=self.workspace, client=self.client_obj, start=start, end=start + timedelta(hours=1),
+            )
+        window = Appointment.objects.in_window(self.start + timedelta(minutes=30), self.start + timedelta(hours=25))
+        self.assertEqual(window.count(), 2)
+
+    def test_longer_than_max_span_is_rejected(self):
+        too_long = {
+            "client": self.client_obj.id,
+            "start": self.start.isoformat(),
+            "end": (self.start + MAX_DURATION + timedelta(minutes=1)).isoformat(),
+        }
+        response = self.api.post("/api/appointments/", too_long, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("end", response.data)
+
+        response = self.api.post("/api/appointments/bulk/", {"items": [too_long]}, format="json")
+        self.assertFalse(response.data["results"][0]["ok"])
+        self.assertIn("end", response.data["results"][0]["errors"])
+
+
+class CalendarFeedTests(WorkspaceTestCase):
+    def setUp(self):
+        super().setUp()
+        start = timezone.now() + timedelta(days=1)
+        Appointment.objects.create(
+            workspace=self.workspace, client=self.client_obj, service=self.service, professional=self.owner,
+            start=start, end=start + timedelta(hours=1),
+        )
+
+    def feed_url(self):
+        response = self.api.get("/api/calendar/feeds/")
+        self.assertEqual(response.status_code, 200)
+        return response.data["professional"][0]["url"]
+
+    def fetch(self, url, **headers):
+        response = APIClient().get(url, **headers)
+        body = b"".join(response.streaming_content).decode() if response.status_code == 200 else ""
+        return response, body
+
+    def test_etag_covers_client_and_service_names(self):
+        url = self.feed_url()
+        response, body = self.fetch(url)
+        self.assertIn("Juan Pérez - Consulta", body)
+        etag = response["ETag"]
+        self.assertEqual(self.fetch(url, HTTP_IF_NONE_MATCH=etag)[0].status_code, 304)
+
+        self.client_obj.full_name = "Juan P. Gómez"
+        self.client_obj.save()
+        response, body = self.fetch(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Juan P. Gómez - Consulta", body)
+
+        self.service.name = "Valoración"
+        self.service.save()
+        response, body = self.fetch(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertIn("Juan P. Gómez - Valoración", body)
+
+    def test_rotation_revokes_old_urls(self):
+        old_url = self.feed_url()
+        self.assertEqual(self.feed_url(), old_url)
+        response = self.api.post("/api/calendar/feeds/")
+        new_url = response.data["professional"][0]["url"]
+        self.assertNotEqual(new_url, old_url)
+        self.assertEqual(self.fetch(old_url)[0].status_code, 404)
+        self.assertEqual(self.fetch(new_url)[0].status_code, 200)
+
+
+class AppointmentSeriesTests(WorkspaceTestCase):
+    def setUp(self):
+        super().setUp()
+        day = timezone.localdate() + timedelta(days=1)
+        self.first = datetime.combine(day, time(10, 0), tzinfo=timezone.get_current_timezone())
+        other = User.objects.create_user(email="otro@example.com", password="pass12345")
+        self.other_workspace = Workspace.objects.create(owner=other, name="Despacho", slug="despacho")
+        self.other_service = Service.objects.create(workspace=self.other_workspace, name="Ajeno")
+        self.other_client = Client.objects.create(workspace=self.other_workspace, full_name="Cliente ajeno")
+
+    def create_series(self, **data):
+        payload = {"client": self.client_obj.id, "start": self.first.isoformat(), "freq": "weekly", **data}
+        return self.api.post("/api/appointment-series/", payload, format="json")
+
+    def test_materialized_count_matches_rows(self):
+        # Choca con la segunda ocurrencia
+        Appointment.objects.create(
+            workspace=self.workspace, client=self.client_obj, professional=self.owner,
+            start=self.first + timedelta(days=7, minutes=15), end=self.first + timedelta(days=7, minutes=45),
+        )
+        response = self.create_series(service=self.service.id)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data["skipped"]), 1)
+        self.assertEqual(
+            response.data["materialized"],
+            Appointment.objects.filter(series_id=response.data["id"]).count(),
+        )
+
+    def test_rematerializing_existing_rows_counts_zero(self):
+        response = self.create_series(count=3)
+        # Sin profesional no hay revisión de agenda: las 3 filas chocan con la unique
+        AppointmentSeries.objects.filter(pk=response.data["id"]).update(
+            professional=None, materialized_until=None, is_complete=False,
+        )
+        created, _ = materialize_series(response.data["id"], self.first + timedelta(days=30))
+        self.assertEqual(created, 0)
+        self.assertEqual(Appointment.objects.filter(series_id=response.data["id"]).count(), 3)
+
+    def test_related_objects_must_belong_to_workspace(self):
+        outsider = User.objects.create_user(email="externo@example.com", password="pass12345")
+        for field, value in (
+            ("client", self.other_client.id),
+            ("service", self.other_service.id),
+            ("professional", outsider.id),
+        ):
+            response = self.create_series(**{field: value})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(field, response.data)
+
+        series_id = self.create_series(count=3).data["id"]
+        for field, value in (("service", self.other_service.id), ("professional", outsider.id)):
+            response = self.api.post(f"/api/appointment-series/{series_id}/following/", {
+                "start_from": self.first.isoformat(), field: value,
+            }, format="json")
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(field, response.data)
+
+
+class BulkAppointmentsTests(WorkspaceTestCase):
+    def setUp(self):
+        super().setUp()
+        day = timezone.localdate() + timedelta(days=1)
+        self.t0 = datetime.combine(day, time(9, 0), tzinfo=timezone.get_current_timezone())
+
+    def bulk_create(self, count):
+        items = [
+            {"client": self.client_obj.id, "service": self.service.id, "start": (self.t0 + timedelta(hours=i)).isoformat()}
+            for i in range(count)
+        ]
+        response = self.api.post("/api/appointments/bulk/", {"items": items}, format="json")
+        self.assertEqual(response.status_code, 200)
+        return [result["id"] for result in response.data["results"]]
+
+    def test_create_reports_each_item(self):
+        items = [
+            {"client": self.client_obj.id, "service": self.service.id, "start": self.t0.isoformat()},
+            # Choca con la anterior (servicio de 45 min)
+            {"client": self.client_obj.id, "start": (self.t0 + timedelta(minutes=30)).isoformat()},
+            {"client": 999999, "start": (self.t0 + timedelta(hours=2)).isoformat()},
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.api.post("/api/appointments/bulk/", {"items": items}, format="json")
+        self.assertEqual((response.data["ok"], response.data["failed"]), (1, 2))
+        results = response.data["results"]
+        self.assertIn("start", results[1]["errors"])
+        self.assertIn("client", results[2]["errors"])
+        appointment = Appointment.objects.get(pk=results[0]["id"])
+        self.assertEqual(appointment.end - appointment.start, timedelta(minutes=45))
+
+        # El costo no depende del tamaño del lote
+        few = len(ctx.captured_queries)
+        with CaptureQueriesContext(connection) as ctx:
+            self.bulk_create(20)
+        self.assertLessEqual(len(ctx.captured_queries), few + 2)
+
+    def test_update_keeps_duration_and_allows_swaps(self):
+        first, second = self.bulk_create(2)
+        response = self.api.patch("/api/appointments/bulk/", {"items": [
+            {"id": first, "start": (self.t0 + timedelta(hours=1)).isoformat()},
+            {"id": second, "start": self.t0.isoformat()},
+        ]}, format="json")
+        self.assertEqual(response.data["ok"], 2)
+        moved = Appointment.objects.get(pk=first)
+        self.assertEqual(moved.start, self.t0 + timedelta(hours=1))
+        self.assertEqual(moved.end - moved.start, timedelta(minutes=45))
+
+    def test_rejected_item_keeps_its_slot(self):
+        first, second = self.bulk_create(2)
+        Appointment.objects.filter(pk=second).update(start=self.t0 + timedelta(hours=2), end=self.t0 + timedelta(hours=2, minutes=45))
+        Appointment.objects.create(
+            workspace=self.workspace, client=self.client_obj, professional=self.owner,
+            start=self.t0 + timedelta(hours=4), end=self.t0 + timedelta(hours=5),
+        )
+        # La primera no puede ir a las 13:00; la segunda no puede quedarse con su horario de las 9:00
+        response = self.api.patch("/api/appointments/bulk/", {"items": [
+            {"id": first, "start": (self.t0 + timedelta(hours=4)).isoformat()},
+            {"id": second, "start": self.t0.isoformat()},
+        ]}, format="json")
+        self.assertEqual([result["ok"] for result in response.data["results"]], [False, False])
+        self.assertEqual(Appointment.objects.get(pk=first).start, self.t0)
+        self.assertEqual(Appointment.objects.get(pk=second).start, self.t0 + timedelta(hours=2))
+
+    def test_update_respects_status_transitions(self):
+        first, second = self.bulk_create(2)
+        Appointment.objects.filter(pk=first).update(status=Appointment.STATUS_COMPLETED)
+        response = self.api.patch("/api/appointments/bulk/", {"items": [
+            {"id": first, "status": "scheduled"},
+            {"id": second, "status": "confirmed"},
+        ]}, format="json")
+        self.assertEqual([result["ok"] for result in response.data["results"]], [False, True])
+        self.assertIn("status", response.data["results"][0]["errors"])
+        self.assertEqual(Appointment.objects.get(pk=first).status, Appointment.STATUS_COMPLETED)
+
+    def test_status_change_checks_overlaps_when_reactivating(self):
+        ids = self.bulk_create(3)
+        response = self.api.post("/api/appointments/bulk-status/", {"ids": ids + [999999], "status": "cancelled"}, format="json")
+        self.assertEqual((response.data["ok"], response.data["failed"]), (3, 1))
+
+        Appointment.objects.create(
+            workspace=self.workspace, client=self.client_obj, professional=self.owner,
+            start=self.t0 + timedelta(hours=1), end=self.t0 + timedelta(hours=1, minutes=30),
+        )
+        response = self.api.post("/api/appointments/bulk-status/", {"ids": ids, "status": "scheduled"}, format="json")
+        self.assertEqual([result["ok"] for result in response.data["results"]], [True, False, True])
+
+
+class SearchTests(WorkspaceTestCase):
+    def setUp(self):
+        super().setUp()
+        casefile = CaseFile.objects.create(workspace=self.workspace, client=self.client_obj)
+        Consultation.objects.create(
+            workspace=self.workspace, client=self.client_obj, title="Dolor de rodilla",
+            notes="Molestia en la rodilla izquierda",
+        )
+        self.event = CaseEvent.objects.create(
+            workspace=self.workspace, casefile=casefile, title="Nota",
+            body="Se recomienda fisioterapia para la rodilla", happened_at=timezone.now(),
+        )
+        for i in range(3):
+            Client.objects.create(workspace=self.workspace, full_name=f"Rodilla Persona {i}")
+        other = User.objects.create_user(email="otro@example.com", password="pass12345")
+        other_workspace = Workspace.objects.create(owner=other, name="Despacho", slug="despacho")
+        Client.objects.create(workspace=other_workspace, full_name="Rodilla Ajena")
+
+    def search(self, query):
+        response = self.api.get(f"/api/search/?{query}")
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_ranked_and_scoped(self):
+        results = self.search("q=rodilla")["results"]
+        self.assertEqual(len(results), 5)
+        self.assertNotIn("Rodilla Ajena", [result["title"] for result in results])
+        # Coincidencia en el título antes que en el cuerpo
+        self.assertEqual(results[0]["type"], "client")
+        self.assertEqual(results[-1]["type"], "caseevent")
+
+    def test_cursor_pagination(self):
+        seen = []
+        url = "/api/search/?q=rodil&page_size=2"
+        while url:
+            response = self.api.get(url)
+            seen += [(result["type"], result["id"]) for result in response.data["results"]]
+            url = response.data["next"]
+        self.assertEqual(len(set(seen)), 5)
+        self.assertEqual(self.api.get("/api/search/?q=rodilla&cursor=zz").status_code, 404)
+
+    def test_index_follows_updates_and_deletes(self):
+        results = self.search("q=rodilla&type=caseevent")["results"]
+        self.assertEqual([result["id"] for result in results], [self.event.id])
+        self.assertIn("«", results[0]["snippet"])
+
+        self.event.body = "Ahora habla del hombro"
+        self.event.save()
+        self.assertEqual(self.search("q=rodilla&type=caseevent")["results"], [])
+
+        # Sin acento también encuentra "Pérez"
+        self.assertEqual([result["id"] for result in self.search("q=perez&type=client")["results"]], [self.client_obj.id])
+        self.client_obj.delete()
+        self.assertEqual(self.search("q=perez&type=client")["results"], [])
+
+    def test_invalid_params(self):
+        self.assertEqual(self.api.get("/api/search/?q=a").status_code, 400)
+        self.assertEqual(self.api.get("/api/search/?q=ab&type=x").status_code, 400)
+
+
+class ClientAutocompleteTests(WorkspaceTestCase):
+    def setUp(self):
+        super().setUp()
+        names = ["José Álvarez", "Josefina Ruiz", "María López", "Mario Juárez"]
+        for i, name in enumerate(names):
+            Client.objects.create(
+                workspace=self.workspace, full_name=name, email=f"c{i}@Mail.com", phone=f"+52 (55) 1234-56{i}{i}",
+            )
+
+    def names(self, query):
+        response = self.api.get(f"/api/clients/autocomplete/?{query}")
+        self.assertEqual(response.status_code, 200)
+        return [row["full_name"] for row in response.data["results"]]
+
+    def test_prefix_matches_first(self):
+        self.assertEqual(self.names("q=jose")[:2], ["José Álvarez", "Josefina Ruiz"])
+        response = self.api.get("/api/clients/autocomplete/?q=jose")
+        self.assertEqual(set(response.data["results"][0]), {"id", "full_name", "email", "phone"})
+        self.assertEqual(self.names("q=ma&limit=1"), ["María López"])
+
+    def test_email_phone_and_middle_word(self):
+        self.assertEqual(self.names("q=C2@mail"), ["María López"])
+        self.assertEqual(len(self.names("q=5255123456")), 4)
+        self.assertIn("Juan Pérez", self.names("q=perez"))
+
+    def test_typo_tolerance(self):
+        self.assertIn("Mario Juárez", self.names("q=mrio"))
+
+    def test_keys_follow_update_fields(self):
+        client = Client.objects.get(full_name="María López")
+        client.full_name = "Marta Núñez"
+        client.save(update_fields=["full_name"])
+        client.refresh_from_db()
+        self.assertEqual(client.search_name, "marta nunez")
+        self.assertEqual(self.names("q=nunez"), ["Marta Núñez"])
+
+
+@override_settings(MEDIA_ROOT="/tmp/test-media")
+class CaseFileStatsTests(WorkspaceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.casefile = CaseFile.objects.create(workspace=self.workspace, client=self.client_obj)
+        now = timezone.now()
+        self.first = self.add_event("Uno", now - timedelta(days=2))
+        self.latest = self.add_event("Dos", now - timedelta(days=1), body="x" * 300)
+        CaseAttachment.objects.create(
+            workspace=self.workspace, casefile=self.casefile, event=self.latest, file=ContentFile(b"x", name="a.txt"),
+        )
+
+    def add_event(self, title, happened_at, body=""):
+        return CaseEvent.objects.create(
+            workspace=self.workspace, casefile=self.casefile, title=title, body=body, happened_at=happened_at,
+        )
+
+    def summary(self):
+        casefile = CaseFile.objects.get(pk=self.casefile.pk)
+        return casefile.events_count, casefile.attachments_count, casefile.last_event_title
+
+    def test_counters_follow_changes(self):
+        self.assertEqual(self.summary(), (2, 1, "Dos"))
+        self.assertEqual(len(CaseFile.objects.get(pk=self.casefile.pk).last_event_preview), 200)
+        self.latest.delete()
+        self.assertEqual(self.summary(), (1, 0, "Uno"))
+        self.first.title = "Uno editado"
+        self.first.save()
+        self.assertEqual(self.summary(), (1, 0, "Uno editado"))
+
+    def test_move_to_other_casefile_without_reloading(self):
+        other = CaseFile.objects.create(workspace=self.workspace, client=self.client_obj)
+        event = CaseEvent.objects.get(pk=self.latest.pk)
+        attachment = CaseAttachment.objects.get()
+        event.casefile = other
+        attachment.casefile = other
+        # Sin SELECT previo: el casefile_id anterior viene de from_db
+        with self.assertNumQueries(4):
+            event.save()
+        with self.assertNumQueries(3):
+            attachment.save()
+        self.assertEqual(self.summary(), (1, 0, "Uno"))
+
+        # Sin casefile_id cargado: se consulta una vez antes de guardar
+        event = CaseEvent.objects.only("title").get(pk=self.first.pk)
+        event.casefile = other
+        event.save()
+        self.assertEqual(self.summary(), (0, 0, ""))
+
+    def test_migration_backfill_matches_recompute(self):
+        expected = self.summary()
+        CaseFile.objects.update(events_count=0, attachments_count=0, last_event_title="")
+        import_module("core.migrations.0017_casefile_stats").fill_casefile_stats(apps, None)
+        self.assertEqual(self.summary(), expected)
+
+        CaseFile.objects.update(events_count=0, attachments_count=0, last_event_title="")
+        recompute_casefile_stats(CaseFile.objects.all())
+        self.assertEqual(self.summary(), expected)
+
+
+class WorkspaceExportTests(WorkspaceTestCase):
+    def setUp(self):
+        super().setUp()
+        casefile = CaseFile.objects.create(workspace=self.workspace, client=self.client_obj)
+        CaseEvent.objects.bulk_create([
+            CaseEvent(
+                workspace=self.workspace, casefile=casefile, title=f"E{i}", body='línea, con "comillas"\nsalto',
+                happened_at=timezone.now(), extra_data={"k": i},
+            )
+            for i in range(1200)
+        ])
+
+    def test_streams_csv(self):
+        response = self.api.get("/api/exports/caseevents.csv")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        rows = list(csv.DictReader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual(len(rows), 1200)
+        self.assertEqual(rows[0]["body"], 'línea, con "comillas"\nsalto')
+        self.assertEqual(json.loads(rows[3]["extra_data"]), {"k": 3})
+
+    def test_gzip_ndjson(self):
+        response = self.api.get("/api/exports/clients.ndjson?gzip=1")
+        self.assertIn(".ndjson.gz", response["Content-Disposition"])
+        lines = gzip.decompress(b"".join(response.streaming_content)).decode().splitlines()
+        self.assertEqual([json.loads(line)["full_name"] for line in lines], ["Juan Pérez"])
+
+    def test_owner_only_and_known_datasets(self):
+        self.assertEqual(self.api.get("/api/exports/nope.csv").status_code, 404)
+        self.assertEqual(self.api.get("/api/exports/clients.xml").status_code, 404)
+        assistant = User.objects.create_user(email="asistente@example.com", password="pass12345")
+        WorkspaceMember.objects.create(workspace=self.workspace, user=assistant, role="assistant")
+        self.api.force_authenticate(assistant)
+        self.assertEqual(self.api.get(f"/api/exports/clients.csv?workspace={self.workspace.id}").status_code, 403)
+
+
+class ClientImportTests(WorkspaceTestCase):
+    def post(self, content, **data):
+        response = self.api.post(
+            "/api/clients/import/", {"file": SimpleUploadedFile("clientes.csv", content), **data}, format="multipart",
+        )
+        return response
+
+    def test_imports_and_reports_rows(self):
+        lines = ["\ufeffNombre;Correo;Teléfono;Fecha de nacimiento"]
+        lines += [f"Cliente {i};c{i}@example.com;55{i:08d};1990-01-01" for i in range(1500)]
+        lines += [
+            "Repetido;JUAN@example.com;;",
+            ";sin@nombre.com;;",
+            "Fecha mala;;;1990-13-40",
+        ]
+        response = self.post("\n".join(lines).encode())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["created"], response.data["duplicates"]), (1500, 1))
+        # El duplicado también aparece con su fila (1502)
+        self.assertEqual([error["row"] for error in response.data["errors"]], [1502, 1503, 1504])
+        self.assertEqual(response.data["failed"], 2)
+        self.assertEqual(Client.objects.get(email="c7@example.com").search_name, "cliente 7")
+
+    def test_dry_run_writes_nothing(self):
+        content = b"full_name,email\nNuevo,nuevo@example.com\n"
+        response = self.post(content, dry_run="1")
+        self.assertEqual(response.data["created"], 1)
+        self.assertFalse(Client.objects.filter(email="nuevo@example.com").exists())
+        self.post(content)
+        self.assertTrue(Client.objects.filter(email="nuevo@example.com").exists())
+
+    def test_unknown_columns(self):
+        self.assertEqual(self.post(b"foo,bar\n1,2\n").status_code, 400)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ChunkedUploadTests(WorkspaceTestCase):
+    PART = 256 * 1024
+
+    def setUp(self):
+        super().setUp()
+        casefile = CaseFile.objects.create(workspace=self.workspace, client=self.client_obj)
+        self.event = CaseEvent.objects.create(
+            workspace=self.workspace, casefile=casefile, title="Estudios", happened_at=timezone.now(),
+        )
+        self.data = b"%PDF-1.4\n" + os.urandom(2 * self.PART + 1000)
+        response = self.api.post(f"/api/caseevents/{self.event.id}/uploads/", {
+            "filename": "estudio.bin", "size_bytes": len(self.data), "part_size": self.PART,
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["parts_count"], 3)
+        self.url = f"/api/attachment-uploads/{response.data['id']}/"
+
+    def put(self, index, body):
+        return self.api.generic("PUT", f"{self.url}parts/{index}/", body, content_type="application/octet-stream")
+
+    def chunk(self, index):
+        return self.data[index * self.PART:(index + 1) * self.PART]
+
+    def part_files(self):
+        upload = AttachmentUpload.objects.get()
+        folder = f"uploads/{upload.workspace_id}/{upload.id}"
+        return default_storage.listdir(folder)[1] if default_storage.exists(folder) else []
+
+    def test_resume_and_complete(self):
+        self.assertEqual(self.put(0, self.chunk(0)).status_code, 200)
+        self.assertEqual(self.put(2, self.chunk(2)).status_code, 200)
+        response = self.api.post(self.url + "complete/")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["missing_parts"], ["1"])
+
+        # Reenviar una parte la reemplaza y borra el archivo anterior
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.put(0, self.chunk(0)).status_code, 200)
+        self.assertEqual(len(self.part_files()), 2)
+        self.assertEqual(self.put(1, self.chunk(1)).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.api.post(self.url + "complete/")
+        self.assertEqual(response.status_code, 201)
+        attachment = CaseAttachment.objects.get(pk=response.data["id"])
+        self.assertEqual((attachment.size_bytes, attachment.mime_type), (len(self.data), "application/pdf"))
+        with attachment.file.open("rb") as stored:
+            self.assertEqual(stored.read(), self.data)
+        self.assertEqual(self.part_files(), [])
+        self.assertEqual(self.api.post(self.url + "complete/").data["id"], attachment.id)
+        self.assertEqual(self.put(0, self.chunk(0)).status_code, 400)
+
+    def test_size_mismatch_keeps_previous_part(self):
+        self.assertEqual(self.put(1, self.chunk(1)).status_code, 200)
+        self.assertEqual(self.put(1, self.chunk(1) + b"x").status_code, 400)
+        self.assertEqual(self.put(1, self.chunk(1)[:-1]).status_code, 400)
+        self.assertEqual(self.api.get(self.url).data["received_parts"], [1])
+        self.assertEqual(len(self.part_files()), 1)
+
+    def test_repeated_part_replaces_row(self):
+        upload = AttachmentUpload.objects.get()
+        first = save_part(upload, 0, io.BytesIO(self.chunk(0)))
+        second = save_part(upload, 0, io.BytesIO(self.chunk(0)))
+        self.assertEqual(first.pk, second.pk)
+        self.assertNotEqual(first.storage_name, second.storage_name)
+        self.assertEqual(upload.parts.count(), 1)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class AttachmentDownloadTests(WorkspaceTestCase):
+    def setUp(self):
+        super().setUp()
+        casefile = CaseFile.objects.create(workspace=self.workspace, client=self.client_obj)
+        event = CaseEvent.objects.create(
+            workspace=self.workspace, casefile=casefile, title="Informe", happened_at=timezone.now(),
+            visible_to_client=True,
+        )
+        self.data = bytes(range(256)) * 40
+        self.attachment = self.add_attachment(event, "informe.pdf", self.data)
+        self.private = self.add_attachment(event, "privado.pdf", b"abc", is_private=True)
+        self.url = f"/api/caseattachments/{self.attachment.id}/download/"
+
+    def add_attachment(self, event, name, data, **fields):
+        attachment = CaseAttachment(
+            workspace=self.workspace, casefile=event.casefile, event=event, original_name=name,
+            mime_type="application/pdf", size_bytes=len(data), **fields,
+        )
+        attachment.file.save(name, ContentFile(data), save=True)
+        return attachment
+
+    def body(self, response):
+        return b"".join(response.streaming_content)
+
+    def test_ranges(self):
+        response = self.api.get(self.url)
+        self.assertEqual((response.status_code, response["Accept-Ranges"]), (200, "bytes"))
+        self.assertEqual(self.body(response), self.data)
+
+        response = self.api.get(self.url, HTTP_RANGE="bytes=10-19")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 10-19/{len(self.data)}")
+        self.assertEqual(self.body(response), self.data[10:20])
+        self.assertEqual(self.body(self.api.get(self.url, HTTP_RANGE="bytes=-5")), self.data[-5:])
+
+        response = self.api.get(self.url, HTTP_RANGE="bytes=100000-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], f"bytes */{len(self.data)}")
+        # If-Range con otra versión: se manda completo
+        self.assertEqual(self.api.get(self.url, HTTP_RANGE="bytes=0-1", HTTP_IF_RANGE='"otro"').status_code, 200)
+
+    def test_etag_uses_blob_sha256(self):
+        etag = self.api.get(self.url)["ETag"]
+        self.assertEqual(self.api.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        blob = AttachmentBlob.objects.create(
+            workspace=self.workspace, sha256="ab" * 32, file=self.attachment.file.name, ref_count=1,
+        )
+        CaseAttachment.objects.filter(pk=self.attachment.pk).update(blob=blob)
+        self.assertEqual(self.api.get(self.url)["ETag"], f'"{"ab" * 32}"')
+
+    def test_access(self):
+        self.api.force_authenticate(self.portal_user)
+        self.assertEqual(self.api.get(self.url).status_code, 200)
+        self.assertEqual(self.api.get(f"/api/caseattachments/{self.private.id}/download/").status_code, 404)
+
+        outsider = User.objects.create_user(email="externo@example.com", password="pass12345")
+        self.api.force_authenticate(outsider)
+        self.assertEqual(self.api.get(self.url).status_code, 404)
+        self.api.force_authenticate(None)
+        self.assertEqual(self.api.get(self.url).status_code, 401)
+
+    def test_token_is_stable_within_epoch(self):
+        file_url = self.api.get(f"/api/caseattachments/{self.attachment.id}/").data["file_url"]
+        self.assertEqual(self.api.get(f"/api/caseattachments/{self.attachment.id}/").data["file_url"], file_url)
+
+        url = urlparse(file_url)
+        anonymous = APIClient()
+        self.assertEqual(anonymous.get(f"{url.path}?{url.query}").status_code, 200)
+        # El token es de este adjunto
+        private = f"/api/caseattachments/{self.private.id}/download/?{url.query}"
+        self.assertEqual(anonymous.get(private).status_code, 401)
+
+        # Dos épocas después ya no vale
+        later = downloads.time.time() + downloads.DOWNLOAD_TOKEN_MAX_AGE + 1
+        with mock.patch.object(downloads.time, "time", return_value=later):
+            self.assertEqual(anonymous.get(f"{url.path}?{url.query}").status_code, 401)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class AttachmentBlobTests(WorkspaceTestCase):
+    PDF = b"%PDF-1.4 laboratorio" * 100
+
+    def setUp(self):
+        super().setUp()
+        self.casefile = CaseFile.objects.create(workspace=self.workspace, client=self.client_obj)
+        self.event = CaseEvent.objects.create(
+            workspace=self.workspace, casefile=self.casefile, title="Estudios", happened_at=timezone.now(),
+        )
+        patcher = mock.patch.object(blobs, "CONTENT_ADDRESSED", True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def upload(self, name, data, content_type="application/pdf"):
+        response = self.api.post(
+            f"/api/caseevents/{self.event.id}/attachments/",
+            {"file": SimpleUploadedFile(name, data, content_type=content_type)},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, 201)
+        return CaseAttachment.objects.get(pk=response.data[0]["id"])
+
+    def legacy(self, name, data):
+        attachment = CaseAttachment(workspace=self.workspace, casefile=self.casefile, event=self.event, original_name=name)
+        attachment.file.save(name, ContentFile(data), save=True)
+        return attachment
+
+    def test_same_content_shares_blob(self):
+        first = self.upload("a.pdf", self.PDF)
+        blob = AttachmentBlob.objects.get()
+        self.assertEqual((blob.ref_count, blob.size_bytes), (1, len(self.PDF)))
+        second = self.upload("b.pdf", self.PDF)
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(second.file.name, first.file.name)
+
+    def test_replace_and_delete_release_references(self):
+        kept = self.upload("a.pdf", self.PDF)
+        replaced = self.upload("b.pdf", self.PDF)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.api.patch(
+                f"/api/caseattachments/{replaced.id}/", {"file": SimpleUploadedFile("c.pdf", b"otro")}, format="multipart",
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(dict(AttachmentBlob.objects.values_list("size_bytes", "ref_count")), {len(self.PDF): 1, 4: 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.api.delete(f"/api/caseattachments/{kept.id}/")
+        self.assertEqual(list(AttachmentBlob.objects.values_list("size_bytes", flat=True)), [4])
+        self.assertFalse(default_storage.exists(kept.file.name))
+
+    def test_replacing_legacy_file_deletes_it(self):
+        attachment = self.legacy("x.pdf", b"viejo")
+        old_name = attachment.file.name
+        with self.captureOnCommitCallbacks(execute=True):
+            self.api.patch(
+                f"/api/caseattachments/{attachment.id}/", {"file": SimpleUploadedFile("n.pdf", b"nuevo")}, format="multipart",
+            )
+        self.assertFalse(default_storage.exists(old_name))
+        attachment.refresh_from_db()
+        self.assertIsNotNone(attachment.blob_id)
+
+    def test_dedupe_command(self):
+        first = self.legacy("x.pdf", b"mismo")
+        second = self.legacy("y.pdf", b"mismo")
+        self.legacy("z.pdf", b"otro")
+        out = io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("dedupe_attachments", stdout=out)
+        self.assertIn("Bytes liberados: 5", out.getvalue())
+        self.assertEqual(sorted(AttachmentBlob.objects.values_list("ref_count", flat=True)), [1, 2])
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.file.name, second.file.name)
+
+    def png(self):
+        output = io.BytesIO()
+        Image.new("RGB", (600, 400), "teal").save(output, "PNG")
+        return output.getvalue()
+
+    def test_derivatives_generated_once_per_blob(self):
+        data = self.png()
+        first = self.upload("a.png", data, "image/png")
+        second = self.upload("b.png", data, "image/png")
+        self.assertEqual(second.derivatives_status, CaseAttachment.DERIVATIVES_PENDING)
+
+        self.assertEqual(derivatives.generate_derivatives(first.id), CaseAttachment.DERIVATIVES_READY)
+        blob = AttachmentBlob.objects.get()
+        self.assertTrue(default_storage.exists(blob.thumbnail.name))
+        with mock.patch.object(derivatives, "_open_image") as open_image:
+            derivatives.generate_derivatives(second.id)
+            third = self.upload("c.png", data, "image/png")
+        open_image.assert_not_called()
+
+        for attachment in (first, second, third):
+            attachment.refresh_from_db()
+            self.assertEqual(attachment.derivatives_status, CaseAttachment.DERIVATIVES_READY)
+            self.assertEqual((attachment.thumbnail.name, attachment.preview.name), (blob.thumbnail.name, blob.preview.name))
+
+        # Borrar un adjunto no toca los derivados compartidos; el último sí
+        with self.captureOnCommitCallbacks(execute=True):
+            self.api.delete(f"/api/caseattachments/{first.id}/")
+            self.api.delete(f"/api/caseattachments/{second.id}/")
+        self.assertTrue(default_storage.exists(blob.preview.name))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.api.delete(f"/api/caseattachments/{third.id}/")
+        self.assertFalse(default_storage.exists(blob.thumbnail.name))
+        self.assertFalse(default_storage.exists(blob.preview.name))
+
+    @mock.patch.object(blobs, "CONTENT_ADDRESSED", False)
+    def test_disabled_by_default(self):
+        attachment = self.upload("a.pdf", self.PDF)
+        self.assertIsNone(attachment.blob_id)
+        self.assertFalse(AttachmentBlob.objects.exists())
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class WorkspaceLogoTests(WorkspaceTestCase):
+    def logo_jobs(self):
+        return Job.objects.filter(name="core.build_logo_variants").count()
+
+    def test_variants_rebuilt_only_when_logo_changes(self):
+        output = io.BytesIO()
+        Image.new("RGBA", (400, 200), (0, 128, 128, 255)).save(output, "PNG")
+        workspace = Workspace.objects.get(pk=self.workspace.pk)
+        workspace.logo = SimpleUploadedFile("logo.png", output.getvalue(), content_type="image/png")
+        workspace.save()
+        self.assertEqual(self.logo_jobs(), 1)
+
+        workspace = Workspace.objects.get(pk=self.workspace.pk)
+        variants = logos.build_logo_variants(workspace)
+        self.assertEqual(set(variants), {"64", "128", "256"})
+        self.assertTrue(variants["64"]["webp"].startswith(logos.VARIANTS_PREFIX))
+
+        workspace.primary_color = "#000000"
+        with self.assertNumQueries(1):
+            workspace.save()
+        self.assertEqual(self.logo_jobs(), 1)
+
+    def test_variant_cache_headers(self):
+        middleware = LogoVariantCacheMiddleware(lambda request: HttpResponse())
+        factory = RequestFactory()
+        response = middleware(factory.get(f"/media/{logos.VARIANTS_PREFIX}1/logo-64.0123456789abcdef.webp"))
+        self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+        self.assertFalse(middleware(factory.get("/media/workspaces/logos/logo.png")).has_header("Cache-Control"))
+
+
+@jobs.task("tests.record")
+def record_job(value):
+    JobQueueTests.ran.append(value)
+
+
+@jobs.task("tests.explode", max_attempts=2)
+def explode_job():
+    raise RuntimeError("falla")
+
+
+class JobQueueTests(TestCase):
+    ran = []
+
+    def setUp(self):
+        JobQueueTests.ran = []
+
+    def test_claim_by_priority_once(self):
+        low = jobs.enqueue("tests.record", priority=jobs.PRIORITY_LOW, value="baja")
+        high = jobs.enqueue("tests.record", priority=jobs.PRIORITY_HIGH, value="alta")
+        normal = jobs.enqueue("tests.record", value="normal")
+        later = jobs.enqueue("tests.record", run_at=timezone.now() + timedelta(hours=1), value="después")
+
+        self.assertEqual(jobs.claim_jobs(2), [high.pk, normal.pk])
+        self.assertEqual(jobs.claim_jobs(10), [low.pk])
+        self.assertEqual(jobs.claim_jobs(10), [])
+        for job_id in (high.pk, normal.pk, low.pk):
+            self.assertEqual(jobs.run_job(job_id), Job.STATUS_DONE)
+        self.assertEqual(self.ran, ["alta", "normal", "baja"])
+        self.assertEqual(Job.objects.get(pk=later.pk).status, Job.STATUS_QUEUED)
+
+    def test_backoff_then_failed(self):
+        job = jobs.enqueue("tests.explode")
+        jobs.claim_jobs(1)
+        before = timezone.now()
+        self.assertEqual(jobs.run_job(job.pk), Job.STATUS_QUEUED)
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 1)
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=jobs.BACKOFF_BASE * 0.8))
+        self.assertIn("RuntimeError", job.last_error)
+        # Todavía no le toca
+        self.assertEqual(jobs.claim_jobs(1), [])
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        self.assertEqual(jobs.claim_jobs(1), [job.pk])
+        self.assertEqual(jobs.run_job(job.pk), Job.STATUS_FAILED)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.STATUS_FAILED, 2))
+
+    def test_stale_jobs_back_off_then_fail(self):
+        job = jobs.enqueue("tests.explode")
+        # El worker muere en cada intento (nunca llega a registrar el error)
+        for attempt in (1, 2):
+            self.assertEqual(jobs.claim_jobs(1), [job.pk])
+            Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - jobs.LOCK_TIMEOUT * 2)
+            before = timezone.now()
+            jobs.requeue_stale()
+            job.refresh_from_db()
+            if attempt == 1:
+                self.assertEqual(job.status, Job.STATUS_QUEUED)
+                self.assertGreaterEqual(job.run_at, before + timedelta(seconds=jobs.BACKOFF_BASE * 0.8))
+                Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        self.assertEqual((job.status, job.attempts), (Job.STATUS_FAILED, 2))
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(jobs.claim_jobs(1), [])
+
+    def test_requeued_job_does_not_overwrite_result(self):
+        job = jobs.enqueue("tests.record", value="x")
+        jobs.claim_jobs(1)
+
+        def slow(value):
+            # Mientras corre, se da por perdido y otro worker lo toma
+            Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - jobs.LOCK_TIMEOUT * 2)
+            jobs.requeue_stale()
+            Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+            jobs.claim_jobs(1)
+
+        with mock.patch.dict(jobs.TASKS, {"tests.record": (slow, jobs.PRIORITY_NORMAL, 5)}):
+            self.assertIsNone(jobs.run_job(job.pk))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.STATUS_RUNNING, 2))
+        self.assertEqual(jobs.run_job(job.pk), Job.STATUS_DONE)
+        self.assertEqual(self.ran, ["x"])
+
+
+class ClientInvitationTests(WorkspaceTestCase):
+    def invite(self):
+        Client.objects.filter(pk=self.client_obj.pk).update(email="juan@example.com")
+        response = self.api.post(f"/api/clients/{self.client_obj.id}/invite/")
+        self.assertEqual(response.status_code, 201)
+        return response.data
+
+    def test_email_is_opt_in(self):
+        self.assertFalse(self.invite()["email_queued"])
+        self.assertFalse(Job.objects.filter(name="core.send_client_invitation").exists())
+
+    @override_settings(CLIENT_INVITATION_EMAIL=True)
+    def test_email_queued_when_enabled(self):
+        self.assertTrue(self.invite()["email_queued"])
+        self.assertTrue(Job.objects.filter(name="core.send_client_invitation").exists())
+
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+class AppointmentReminderTests(WorkspaceTestCase):
+    def setUp(self):
+        super().setUp()
+        Workspace.objects.filter(pk=self.workspace.pk).update(time_zone="America/Bogota")
+        self.now = timezone.now().replace(microsecond=0)
+        start = self.now + timedelta(hours=3)
+        self.appointment = Appointment.objects.create(
+            workspace=self.workspace, client=self.client_obj, service=self.service,
+            start=start, end=start + timedelta(minutes=45),
+        )
+
+    def test_sends_in_workspace_time_zone_once(self):
+        self.assertEqual(reminders.dispatch_reminders(now=self.now), {"sent": 1, "skipped": 0, "failed": 0})
+        self.assertEqual(len(mail.outbox), 1)
+        local = timezone.localtime(self.appointment.start, timezone.get_fixed_timezone(-5 * 60))
+        self.assertIn(f"a las {local:%H:%M}", mail.outbox[0].body)
+        self.assertEqual(mail.outbox[0].to, ["juan@example.com"])
+
+        self.appointment.refresh_from_db()
+        self.assertEqual((self.appointment.reminder_sent_at, self.appointment.reminder_claimed_at), (self.now, None))
+        self.assertEqual(reminders.dispatch_reminders(now=self.now + timedelta(minutes=5))["sent"], 0)
+
+    def test_abandoned_claim_is_retaken_after_timeout(self):
+        # Un proceso tomó la cita y murió antes de enviar
+        self.assertEqual(reminders.claim_batch(self.now, 10), [self.appointment.pk])
+        self.appointment.refresh_from_db()
+        self.assertIsNone(self.appointment.reminder_sent_at)
+
+        self.assertEqual(reminders.dispatch_reminders(now=self.now + timedelta(minutes=1))["sent"], 0)
+        later = self.now + reminders.CLAIM_TIMEOUT + timedelta(minutes=1)
+        self.assertEqual(reminders.dispatch_reminders(now=later)["sent"], 1)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_failed_send_is_released(self):
+        backend = mock.Mock()
+        backend.send.side_effect = lambda messages: [message.appointment_id for message in messages]
+        self.assertEqual(reminders.dispatch_reminders(now=self.now, backend=backend)["failed"], 1)
+        self.appointment.refresh_from_db()
+        self.assertEqual((self.appointment.reminder_sent_at, self.appointment.reminder_claimed_at), (None, None))
+
+
+class WorkspaceTimeZoneTests(WorkspaceTestCase):
+    """Horario laboral, series y agenda en la zona horaria del workspace, no la del servidor."""
+
+    def use_zone(self, name):
+        Workspace.objects.filter(pk=self.workspace.pk).update(time_zone=name)
+        return zoneinfo.ZoneInfo(name)
+
+    def test_availability_uses_workspace_hours(self):
+        tz = self.use_zone("Asia/Tokyo")
+        day = timezone.localdate() + timedelta(days=7)
+        day -= timedelta(days=day.weekday())  # lunes
+        response = self.api.get(f"/api/appointments/availability/?date_from={day}&date_to={day}&step=60")
+        first = response.data["slots"][0]["start"]
+        self.assertEqual(first, datetime.combine(day, time(9, 0), tzinfo=tz))
+
+    def test_series_keep_local_time_across_dst(self):
+        tz = self.use_zone("America/New_York")
+        # El horario de verano de Nueva York termina el 3 de noviembre de 2030
+        first = datetime(2030, 10, 28, 10, 0, tzinfo=tz)
+        series = AppointmentSeries.objects.create(
+            workspace=self.workspace, client=self.client_obj, professional=self.owner,
+            start=first, freq="weekly", count=2, duration_minutes=30,
+        )
+        materialize_series(series.pk, first + timedelta(days=30))
+        starts = [timezone.localtime(start, tz) for start in Appointment.objects.filter(series=series).order_by("start").values_list("start", flat=True)]
+        self.assertEqual([(start.day, start.hour) for start in starts], [(28, 10), (4, 10)])
+
+    def test_agenda_groups_by_workspace_day(self):
+        tz = self.use_zone("Asia/Tokyo")
+        day = timezone.localdate() + timedelta(days=3)
+        start = datetime.combine(day, time(1, 0), tzinfo=tz)
+        Appointment.objects.create(
+            workspace=self.workspace, client=self.client_obj, professional=self.owner,
+            start=start, end=start + timedelta(minutes=30),
+        )
+        response = self.api.get(f"/api/appointments/agenda/?start={day - timedelta(days=1)}&end={day + timedelta(days=1)}")
+        self.assertEqual([entry["date"] for entry in response.data["days"]], [day])
@@ -0,0 +1,61 @@
+# core/tracking.py
+from django.db import models
+
+
+class TrackedFieldsMixin:
+    """
+    Recuerda los valores de TRACKED_FIELDS tal como están en la base: los
+    toma de from_db y los actualiza después de cada save. Así las señales
+    (post_save) saben qué cambió sin volver a consultar; solo una instancia
+    que no se cargó de la base (o con esos campos diferidos) hace un query.
+    """
+    TRACKED_FIELDS = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if all(name in instance.__dict__ for name in cls.TRACKED_FIELDS):
+            instance._loaded_values = {
+                name: instance._tracked_value(name, instance.__dict__[name]) for name in cls.TRACKED_FIELDS
+            }
+        return instance
+
+    def _tracked_value(self, name, value):
+        # FileField: se compara el nombre ("" si no hay archivo)
+        if isinstance(self._meta.get_field(name), models.FileField):
+            return getattr(value, "name", value) or ""
+        return value
+
+    def previous_values(self):
+        """{campo: valor en la base} antes del save en curso; {} si es nueva."""
+        loaded = getattr(self, "_loaded_values", None)
+        if loaded is None:
+            loaded = {}
+            if not self._state.adding and self.pk is not None:
+                row = type(self)._base_manager.filter(pk=self.pk).values(*self.TRACKED_FIELDS).first()
+                if row is not None:
+                    loaded = {name: self._tracked_value(name, value) for name, value in row.items()}
+            self._loaded_values = loaded
+        return loaded
+
+    def tracked_changes(self):
+        """Campos de TRACKED_FIELDS que cambian con este save (todos si es nueva)."""
+        previous = self.previous_values()
+        return {
+            name for name in self.TRACKED_FIELDS
+            if name not in previous or previous[name] != self._tracked_value(name, getattr(self, name))
+        }
+
+    def save(self, *args, **kwargs):
+        # Se fijan antes de escribir: las señales comparan contra la base previa
+        self.previous_values()
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get("update_fields")
+        self._loaded_values = {
+            **self._loaded_values,
+            **{
+                name: self._tracked_value(name, getattr(self, name))
+                for name in self.TRACKED_FIELDS
+                if update_fields is None or self._meta.get_field(name).name in update_fields or name in update_fields
+            },
+        }
@@ -0,0 +1,228 @@
+# core/uploads.py
+import mimetypes
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .blobs import discard_attachment_content, store_attachment_content
+from .models import AttachmentUpload, AttachmentUploadPart, CaseAttachment, attachment_upload_part_to
+
+PART_SIZE = getattr(settings, "ATTACHMENT_UPLOAD_PART_SIZE", 8 * 1024 * 1024)
+MIN_PART_SIZE = 256 * 1024
+MAX_SIZE = getattr(settings, "ATTACHMENT_UPLOAD_MAX_SIZE", 2 * 1024 ** 3)
+UPLOAD_TTL = timedelta(hours=getattr(settings, "ATTACHMENT_UPLOAD_TTL_HOURS", 24))
+
+COPY_CHUNK = 1024 * 1024
+
+# Firmas (primeros bytes) -> mime
+MAGIC = [
+    (b"%PDF-", "application/pdf"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+    (b"PK\x03\x04", "application/zip"),
+    (b"\x1a\x45\xdf\xa3", "video/webm"),
+    (b"OggS", "audio/ogg"),
+    (b"ID3", "audio/mpeg"),
+]
+
+
+def sniff_mime(head, filename):
+    """Mime a partir del contenido; la extensión solo desempata o suple."""
+    guessed, _ = mimetypes.guess_type(filename)
+    sniffed = next((mime for signature, mime in MAGIC if head.startswith(signature)), None)
+    if sniffed is None and head[:4] == b"RIFF":
+        sniffed = {b"WEBP": "image/webp", b"WAVE": "audio/wav", b"AVI ": "video/x-msvideo"}.get(head[8:12])
+    if sniffed is None and head[4:8] == b"ftyp":
+        sniffed = "video/quicktime" if head[8:12] == b"qt  " else "video/mp4"
+    if sniffed == "application/zip" and guessed:
+        # docx, xlsx, etc. también son zip
+        return guessed
+    return sniffed or guessed or "application/octet-stream"
+
+
+class _BodyReader:
+    """Lee el cuerpo de la petición por bloques, con tope de bytes."""
+
+    def __init__(self, stream, limit):
+        self.stream = stream
+        self.limit = limit
+        self.size = 0
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = COPY_CHUNK
+        # Se pide un byte de más para detectar partes más grandes de lo esperado
+        data = self.stream.read(min(size, self.limit + 1 - self.size)) if self.stream else b""
+        self.size += len(data)
+        if self.size > self.limit:
+            raise ValidationError({"part": f"La parte excede {self.limit} bytes."})
+        return data
+
+
+class _PartsReader:
+    """Concatena las partes guardadas, una a la vez (nunca el archivo completo en memoria)."""
+
+    def __init__(self, names):
+        self.names = iter(names)
+        self.current = None
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = COPY_CHUNK
+        while True:
+            if self.current is None:
+                name = next(self.names, None)
+                if name is None:
+                    return b""
+                self.current = default_storage.open(name, "rb")
+            data = self.current.read(size)
+            if data:
+                return data
+            self.current.close()
+            self.current = None
+
+
+def start_upload(event, user, original_name, size_bytes, part_size=None, is_private=False):
+    if size_bytes > MAX_SIZE:
+        raise ValidationError({"size_bytes": f"El archivo excede el máximo de {MAX_SIZE} bytes."})
+    part_size = min(max(part_size or PART_SIZE, MIN_PART_SIZE), PART_SIZE)
+    return AttachmentUpload.objects.create(
+        workspace_id=event.workspace_id,
+        casefile_id=event.casefile_id,
+        event=event,
+        uploaded_by=user,
+        original_name=original_name,
+        size_bytes=size_bytes,
+        part_size=part_size,
+        is_private=is_private,
+        expires_at=timezone.now() + UPLOAD_TTL,
+    )
+
+
+def _check_pending(upload):
+    if upload.status != AttachmentUpload.STATUS_PENDING:
+        raise ValidationError(f"La subida está {upload.get_status_display().lower()}.")
+    if upload.expires_at <= timezone.now():
+        raise ValidationError("La subida expiró; iníciala de nuevo.")
+
+
+def save_part(upload, index, stream):
+    """
+    Escribe la parte `index` directo al storage desde el stream de la
+    petición. Reenviar una parte la reemplaza (reanudar tras un corte).
+
+    El archivo se escribe fuera de la transacción con un nombre propio de
+    este intento; después, con la subida bloqueada, la fila de la parte se
+    apunta al archivo nuevo y el anterior se borra. Dos PUT simultáneos de
+    la misma parte no chocan: gana el último.
+    """
+    _check_pending(upload)
+    if not 0 <= index < upload.parts_count:
+        raise ValidationError({"part": f"La parte debe estar entre 0 y {upload.parts_count - 1}."})
+
+    expected = upload.expected_part_size(index)
+    name = f"{attachment_upload_part_to(upload, index)}.{secrets.token_hex(4)}"
+    reader = _BodyReader(stream, expected)
+    stored = name
+    try:
+        stored = default_storage.save(name, File(reader, name=name))
+        if reader.size != expected:
+            raise ValidationError({"part": f"Se esperaban {expected} bytes y llegaron {reader.size}."})
+
+        with transaction.atomic():
+            # Mismo candado que complete_upload: no se cambian partes mientras se unen
+            locked = AttachmentUpload.objects.select_for_update().get(pk=upload.pk)
+            _check_pending(locked)
+            previous = (
+                AttachmentUploadPart.objects
+                .filter(upload=locked, index=index)
+                .values_list("storage_name", flat=True)
+                .first()
+            )
+            part, _ = AttachmentUploadPart.objects.update_or_create(
+                upload=locked, index=index, defaults={"size_bytes": reader.size, "storage_name": stored},
+            )
+            if previous and previous != stored:
+                transaction.on_commit(lambda: default_storage.delete(previous))
+    except Exception:
+        default_storage.delete(stored)
+        raise
+    return part
+
+
+def _delete_part_files(names):
+    for name in names:
+        default_storage.delete(name)
+
+
+def complete_upload(upload):
+    """
+    Une las partes en el archivo final y crea el CaseAttachment. Tamaño y
+    mime se calculan aquí (no se confía en lo que mande el cliente).
+    Idempotente: si ya estaba completa regresa el mismo adjunto.
+    """
+    with transaction.atomic():
+        upload = AttachmentUpload.objects.select_for_update().get(pk=upload.pk)
+        if upload.status == AttachmentUpload.STATUS_COMPLETE and upload.attachment_id:
+            return upload.attachment
+        _check_pending(upload)
+
+        parts = list(upload.parts.order_by("index"))
+        missing = sorted(set(range(upload.parts_count)) - {part.index for part in parts})
+        if missing:
+            raise ValidationError({"missing_parts": missing})
+
+        attachment = CaseAttachment(
+            workspace_id=upload.workspace_id,
+            casefile_id=upload.casefile_id,
+            event_id=upload.event_id,
+            original_name=upload.original_name,
+            uploaded_by_id=upload.uploaded_by_id,
+            is_private=upload.is_private,
+        )
+        names = [part.storage_name for part in parts]
+        content = store_attachment_content(attachment, lambda: _PartsReader(names), upload.original_name)
+        if content.size != upload.size_bytes:
+            discard_attachment_content(attachment, content)
+            raise ValidationError(f"Se esperaban {upload.size_bytes} bytes y se unieron {content.size}.")
+
+        attachment.size_bytes = content.size
+        attachment.mime_type = sniff_mime(content.head, upload.original_name)
+        attachment.save()
+
+        upload.status = AttachmentUpload.STATUS_COMPLETE
+        upload.attachment = attachment
+        upload.save(update_fields=["status", "attachment"])
+        upload.parts.all().delete()
+        transaction.on_commit(lambda: _delete_part_files(names))
+    return attachment
+
+
+def abort_upload(upload):
+    names = list(upload.parts.values_list("storage_name", flat=True))
+    upload.parts.all().delete()
+    upload.status = AttachmentUpload.STATUS_ABORTED
+    upload.save(update_fields=["status"])
+    transaction.on_commit(lambda: _delete_part_files(names))
+
+
+def purge_expired_uploads(now=None):
+    """Cancela las subidas pendientes que ya expiraron y borra sus partes."""
+    expired = AttachmentUpload.objects.filter(
+        status=AttachmentUpload.STATUS_PENDING, expires_at__lte=now or timezone.now(),
+    )
+    count = 0
+    for upload in expired.iterator():
+        abort_upload(upload)
+        count += 1
+    return count
@@ -7,6 +7,7 @@ from .views import (
     ClientViewSet,
     ServiceViewSet,
     AppointmentViewSet,
+    AppointmentSeriesViewSet,
     ConsultationViewSet,
     MyWorkspaceView,
     ClientInvitationVerifyView,
@@ -17,9 +18,15 @@ from .views import (
     CaseFileViewSet,
     CaseEventViewSet,
     CaseAttachmentViewSet,
+    AttachmentUploadViewSet,
+    CaseAttachmentDownloadView,
     ClientPortalCaseFilesView,
     ClientPortalCaseFileEventsView,
     ClientPortalAppointmentVideoJoinView,
+    CalendarFeedLinksView,
+    SearchView,
+    WorkspaceExportView,
+    AppointmentCalendarFeedView,
 )
 
 router = DefaultRouter()
@@ -27,10 +34,12 @@ router.register(r"workspaces", WorkspaceViewSet, basename="workspace")
 router.register(r"clients", ClientViewSet, basename="client")
 router.register(r"services", ServiceViewSet, basename="service")
 router.register(r"appointments", AppointmentViewSet, basename="appointment")
+router.register(r"appointment-series", AppointmentSeriesViewSet, basename="appointment-series")
 router.register(r"consultations", ConsultationViewSet, basename="consultation")
 router.register(r"casefiles", CaseFileViewSet, basename="casefile")
 router.register(r"caseevents", CaseEventViewSet, basename="caseevent")
 router.register(r"caseattachments", CaseAttachmentViewSet, basename="caseattachment")
+router.register(r"attachment-uploads", AttachmentUploadViewSet, basename="attachment-upload")
 
 
 urlpatterns = [
@@ -45,5 +54,10 @@ urlpatterns = [
     path("client-portal/casefiles/", ClientPortalCaseFilesView.as_view(), name="client-portal-casefiles"),
     path("client-portal/casefiles/<int:casefile_id>/events/", ClientPortalCaseFileEventsView.as_view(), name="client-portal-casefile-events"), 
     path("client-portal/appointments/<int:appointment_id>/video/join/", ClientPortalAppointmentVideoJoinView.as_view()),
+    path("caseattachments/<int:pk>/download/", CaseAttachmentDownloadView.as_view(), name="caseattachment-download"),
+    path("search/", SearchView.as_view(), name="search"),
+    path("exports/<slug:dataset>.<slug:fmt>", WorkspaceExportView.as_view(), name="workspace-export"),
+    path("calendar/feeds/", CalendarFeedLinksView.as_view(), name="calendar-feed-links"),
+    path("calendar/<str:token>.ics", AppointmentCalendarFeedView.as_view(), name="calendar-feed"),
   
 ]
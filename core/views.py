@@ -1,19 +1,21 @@
 # core/views.py
 from django.conf import settings
 from rest_framework import status
-from datetime import timedelta
-from django.db.models import Count
+from datetime import datetime, time, timedelta
+from django.http import Http404, StreamingHttpResponse
+from django.urls import reverse
+from django.views import View
 from rest_framework.decorators import action
-from django.db.models import Q
 from rest_framework import viewsets, permissions
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.exceptions import NotFound, PermissionDenied
+from rest_framework.exceptions import NotAuthenticated, NotFound, PermissionDenied
 from rest_framework.parsers import JSONParser, FormParser, MultiPartParser
+from rest_framework.utils.urls import replace_query_param
 from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView
 from rest_framework.exceptions import NotFound, ValidationError
-from .models import Workspace, Client, Service, Appointment, Consultation, ClientInvitation, CaseFile, CaseEvent, CaseAttachment, AppointmentVideo
+from .models import Workspace, WorkspaceMember, Client, Service, Appointment, AppointmentSeries, Consultation, ClientInvitation, CaseFile, CaseEvent, CaseAttachment, AppointmentVideo, AttachmentUpload, get_time_zone
 from .serializers import (
     WorkspaceSerializer,
     ClientSerializer,
@@ -23,14 +25,42 @@ from .serializers import (
     ClientInvitationSerializer,
     ClientPortalAppointmentSerializer,
     ClientPortalConsultationSerializer,
-    CaseFileSerializer, CaseEventSerializer, CaseAttachmentSerializer, ClientPortalCaseFileSerializer, ClientPortalCaseEventSerializer
+    CaseFileSerializer, CaseEventSerializer, CaseAttachmentSerializer, ClientPortalCaseFileSerializer, ClientPortalCaseEventSerializer,
+    AvailabilityQuerySerializer,
+    AppointmentSeriesSerializer,
+    AppointmentSeriesFollowingSerializer,
+    AppointmentBulkSerializer,
+    AppointmentBulkStatusSerializer,
+    AttachmentUploadSerializer,
+    AttachmentUploadStartSerializer,
 )
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.db import IntegrityError, transaction
 from django.contrib.auth import get_user_model
-from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.tokens import RefreshToken
+from .pagination import KeysetPagination, PaginatedAPIViewMixin
+from .search import KINDS as SEARCH_KINDS, decode_cursor as decode_search_cursor, encode_cursor as encode_search_cursor, search
+from .scheduling import FREE_STATUSES, available_slots, default_end, find_conflict, is_overlap_violation, span_error
+from .exceptions import AppointmentConflict
+from .autocomplete import autocomplete_clients, normalize_email
+from .client_import import import_clients, open_csv
+from .blobs import release_blob, store_attachment_content
+from . import conditional
+from .downloads import can_download, load_download_token, serve_attachment, token_epoch
+from .uploads import abort_upload, complete_upload, save_part, start_upload
+from .jobs import enqueue
+from .export import EXPORTS, FORMATS as EXPORT_FORMATS, iter_export
+from .bulk import bulk_change_status, bulk_create_appointments, bulk_update_appointments
+from .recurrence import SERIES_HORIZON, cancel_following, expand_series, materialize_series, update_following
+from .ics import FEED_CLIENT, FEED_PROFESSIONAL, FEED_WORKSPACE, feed_secret, is_current_feed, iter_calendar, load_feed_token, make_feed_token
+from .tenancy import TenantContext, get_tenant_context, is_workspace_staff
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from users.tokens import TenantRefreshToken
 
 JITSI_DOMAIN = getattr(settings, "JITSI_DOMAIN", "meet.digitark.cloud")
+AGENDA_MAX_DAYS = 62
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 25
 
 User = get_user_model()
 
@@ -39,25 +69,39 @@ def get_current_workspace_for_user(user):
     """
     Regresa el primer workspace asociado al usuario (owner o miembro).
     Para MVP está bien así; luego podemos manejar selección explícita.
+    Dentro de una vista usa get_tenant_context(request).current_workspace.
     """
-    qs = Workspace.objects.filter(
-        Q(owner=user) | Q(memberships__user=user)
-    ).distinct()
-
-    return qs.first()
+    return TenantContext(user).current_workspace
 
 
 def get_portal_clients_for_user(user, workspace_slug=None):
     qs = Client.objects.select_related("workspace").filter(
-        portal_user=user,
+        portal_user_id=user.pk,
         is_active=True,
     )
     if workspace_slug:
         qs = qs.filter(workspace__slug=workspace_slug)
     return qs
 
+def parse_range_param(value, field):
+    """
+    Fecha (YYYY-MM-DD, inicio del día local) o datetime ISO -> datetime aware.
+    """
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValidationError({field: "Usa una fecha (YYYY-MM-DD) o fecha/hora ISO 8601."})
+        parsed = datetime.combine(day, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
 def get_allowed_workspaces_for_user(user):
-    return Workspace.objects.filter(Q(owner=user) | Q(memberships__user=user)).distinct()
+    return Workspace.objects.for_tenant(TenantContext(user))
 
 
 class WorkspaceViewSet(viewsets.ModelViewSet):
@@ -67,7 +111,9 @@ class WorkspaceViewSet(viewsets.ModelViewSet):
     """
     serializer_class = WorkspaceSerializer
     permission_classes = [permissions.IsAuthenticated]
+    allow_stateless_auth = True
     parser_classes = [JSONParser, FormParser, MultiPartParser] 
+    ordering = ("id",)
 
     def get_queryset(self):
         user = self.request.user
@@ -75,9 +121,7 @@ class WorkspaceViewSet(viewsets.ModelViewSet):
         if user.is_superuser or getattr(user, "role", None) == User.ROLE_SYSTEM_ADMIN:
             return Workspace.objects.all()
 
-        return Workspace.objects.filter(
-            Q(owner=user) | Q(memberships__user=user)
-        ).distinct()
+        return Workspace.objects.for_tenant(get_tenant_context(self.request))
 
     def perform_create(self, serializer):
         user = self.request.user
@@ -96,28 +140,80 @@ class WorkspaceViewSet(viewsets.ModelViewSet):
 class ClientViewSet(viewsets.ModelViewSet):
     serializer_class = ClientSerializer
     permission_classes = [permissions.IsAuthenticated]
+    allow_stateless_auth = True
+    ordering = ("-created_at", "-id")
 
     def get_queryset(self):
-        user = self.request.user
-        return Client.objects.filter(
-            workspace__in=Workspace.objects.filter(
-                Q(owner=user) | Q(memberships__user=user)
-            )
-        ).distinct()
+        return Client.objects.for_tenant(get_tenant_context(self.request))
 
     def perform_create(self, serializer):
-        workspace = get_current_workspace_for_user(self.request.user)
+        workspace = get_tenant_context(self.request).current_workspace
         if not workspace:
             raise NotFound("No hay workspace asociado al usuario.")
 
-        email = (serializer.validated_data.get("email") or "").strip()
+        email = normalize_email(serializer.validated_data.get("email"))
         if email:
-            exists = Client.objects.filter(workspace=workspace, email__iexact=email).exists()
+            exists = Client.objects.filter(workspace=workspace, search_email=email).exists()
             if exists:
                 raise ValidationError({"email": "Ya existe un cliente con este correo en este workspace."})
 
         serializer.save(workspace=workspace)
-    
+
+    @action(detail=False, methods=["get"], url_path="autocomplete")
+    def autocomplete(self, request):
+        """
+        GET /api/clients/autocomplete/?q=jua&limit=10  (opcional: workspace=<id>)
+        Selector de clientes: coincidencias por prefijo de nombre, correo o
+        teléfono y, si faltan, aproximadas (errores de dedo) por nombre.
+        """
+        query = (request.query_params.get("q") or "").strip()
+        if not query:
+            return Response({"results": []})
+
+        try:
+            limit = int(request.query_params.get("limit") or AUTOCOMPLETE_LIMIT)
+        except ValueError:
+            raise ValidationError({"limit": "Debe ser un número."})
+        limit = max(1, min(limit, AUTOCOMPLETE_MAX_LIMIT))
+
+        queryset = self.get_queryset().filter(is_active=True)
+        workspace_id = request.query_params.get("workspace")
+        if workspace_id:
+            if not workspace_id.isdigit():
+                raise ValidationError({"workspace": "Debe ser un id numérico."})
+            queryset = queryset.filter(workspace_id=int(workspace_id))
+
+        return Response({"results": autocomplete_clients(queryset, query, limit)})
+
+    @action(detail=False, methods=["post"], url_path="import", parser_classes=[MultiPartParser])
+    def import_csv(self, request):
+        """
+        POST /api/clients/import/  (multipart: file=<csv>, opcional workspace=<id>, dry_run=1)
+        Alta masiva de clientes desde CSV. Omite correos/teléfonos que ya
+        existen y regresa el reporte por fila.
+        """
+        tenant = get_tenant_context(request)
+        workspace_id = request.data.get("workspace") or tenant.current_workspace_id
+        try:
+            workspace_id = int(workspace_id)
+        except (TypeError, ValueError):
+            raise NotFound("No hay workspace asociado al usuario.")
+        if tenant.role_for(workspace_id) in (None, WorkspaceMember.ROLE_CLIENT):
+            raise PermissionDenied("No tienes permiso para importar clientes en este workspace.")
+
+        upload = request.FILES.get("file")
+        if upload is None:
+            raise ValidationError({"file": "Adjunta el archivo CSV."})
+
+        dry_run = request.data.get("dry_run") in ("1", "true")
+        try:
+            _, rows = open_csv(upload)
+        except ValueError as exc:
+            raise ValidationError({"file": str(exc)})
+
+        report = import_clients(workspace_id, rows, dry_run=dry_run)
+        return Response({"dry_run": dry_run, **report})
+
     @action(detail=True, methods=["post"], url_path="invite")
     def invite(self, request, pk=None):
         client = self.get_object()
@@ -135,6 +231,11 @@ class ClientViewSet(viewsets.ModelViewSet):
         serializer = ClientInvitationSerializer(invitation)
         data = serializer.data
         data["invite_url"] = invite_url
+        # Opcional (CLIENT_INVITATION_EMAIL): el correo sale desde el worker
+        # (core.tasks); la respuesta no lo espera
+        data["email_queued"] = bool(invitation.email) and getattr(settings, "CLIENT_INVITATION_EMAIL", False)
+        if data["email_queued"]:
+            enqueue("core.send_client_invitation", invitation_id=invitation.pk, invite_url=invite_url)
 
         return Response(data, status=status.HTTP_201_CREATED)
 
@@ -258,7 +359,7 @@ class ClientInvitationAcceptView(APIView):
         inv.save(update_fields=["accepted_at", "is_active"])
 
         # Generar tokens JWT para el cliente
-        refresh = RefreshToken.for_user(user)
+        refresh = TenantRefreshToken.for_user(user)
         access = refresh.access_token
 
         workspace_serializer = WorkspaceSerializer(
@@ -285,6 +386,7 @@ class ClientPortalMeView(APIView):
     Devuelve client + workspace para el usuario autenticado (cliente).
     """
     permission_classes = [IsAuthenticated]
+    allow_stateless_auth = True
 
     def get(self, request):
         user = request.user
@@ -292,6 +394,16 @@ class ClientPortalMeView(APIView):
         if not clients:
             raise NotFound("No se encontró un cliente asociado a este usuario.")
 
+        # Clientes y workspaces ya están cargados: validar no cuesta queries
+        validators = conditional.validators(
+            request,
+            conditional.objects_snapshot(clients),
+            conditional.objects_snapshot(c.workspace for c in clients),
+        )
+        not_modified = conditional.not_modified(request, validators)
+        if not_modified is not None:
+            return not_modified
+
         entries = []
         for c in clients:
             entries.append({
@@ -299,24 +411,21 @@ class ClientPortalMeView(APIView):
                 "client": ClientSerializer(c).data,
             })
 
-        return Response({"entries": entries})
+        return validators.apply(Response({"entries": entries}))
 
 
 
 class ServiceViewSet(viewsets.ModelViewSet):
     serializer_class = ServiceSerializer
     permission_classes = [permissions.IsAuthenticated]
+    allow_stateless_auth = True
+    ordering = ("name", "id")
 
     def get_queryset(self):
-        user = self.request.user
-        return Service.objects.filter(
-            workspace__in=Workspace.objects.filter(
-                Q(owner=user) | Q(memberships__user=user)
-            )
-        ).distinct()
+        return Service.objects.for_tenant(get_tenant_context(self.request))
 
     def perform_create(self, serializer):
-        workspace = get_current_workspace_for_user(self.request.user)
+        workspace = get_tenant_context(self.request).current_workspace
         if not workspace:
             raise NotFound("No hay workspace asociado al usuario.")
         serializer.save(workspace=workspace)
@@ -325,21 +434,98 @@ class ServiceViewSet(viewsets.ModelViewSet):
 class AppointmentViewSet(viewsets.ModelViewSet):
     serializer_class = AppointmentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    allow_stateless_auth = True
+    ordering = ("start", "id")
 
     def get_queryset(self):
-        user = self.request.user
-        return Appointment.objects.filter(
-            workspace__in=Workspace.objects.filter(
-                Q(owner=user) | Q(memberships__user=user)
+        return (
+            Appointment.objects
+            .for_tenant(get_tenant_context(self.request))
+            .select_related("client", "service")
+        )
+
+    def filter_queryset(self, queryset):
+        """
+        Filtros de calendario (query params):
+          - start / end: ventana (fecha o datetime ISO); citas que la tocan
+          - professional, client: ids
+          - status: uno o varios separados por coma
+        """
+        params = self.request.query_params
+        end = parse_range_param(params.get("end"), "end")
+        if end is not None:
+            # Citas recurrentes que aún no se generan para esta ventana
+            expand_series(AppointmentSeries.objects.for_tenant(get_tenant_context(self.request)), end)
+        queryset = queryset.in_window(parse_range_param(params.get("start"), "start"), end)
+
+        for field in ("professional", "client"):
+            value = params.get(field)
+            if value:
+                if not value.isdigit():
+                    raise ValidationError({field: "Debe ser un id numérico."})
+                queryset = queryset.filter(**{f"{field}_id": int(value)})
+
+        statuses = [v for v in (params.get("status") or "").split(",") if v]
+        if statuses:
+            valid = {choice for choice, _ in Appointment.STATUS_CHOICES}
+            invalid = [v for v in statuses if v not in valid]
+            if invalid:
+                raise ValidationError({"status": f"Estado inválido: {', '.join(invalid)}."})
+            queryset = queryset.filter(status__in=statuses)
+
+        return queryset
+
+    @action(detail=False, methods=["get"], url_path="agenda")
+    def agenda(self, request):
+        """
+        GET /api/appointments/agenda/?start=YYYY-MM-DD&end=YYYY-MM-DD
+        Respuesta compacta agrupada por día (acepta los mismos filtros que el listado).
+        """
+        start = parse_range_param(request.query_params.get("start"), "start")
+        end = parse_range_param(request.query_params.get("end"), "end")
+        if not start or not end:
+            raise ValidationError("Los parámetros 'start' y 'end' son obligatorios.")
+        if end <= start or end - start > timedelta(days=AGENDA_MAX_DAYS):
+            raise ValidationError({"end": f"El rango debe ser positivo y de máximo {AGENDA_MAX_DAYS} días."})
+
+        rows = (
+            self.filter_queryset(Appointment.objects.for_tenant(get_tenant_context(request)))
+            .order_by("start", "id")
+            .values(
+                "id", "start", "end", "status", "modality",
+                "client_id", "client__full_name",
+                "service_id", "service__name",
+                "professional_id", "workspace__time_zone",
             )
-        ).select_related("client", "service").distinct()
+        )
+
+        by_day = {}
+        for row in rows:
+            # El día según la hora local del workspace de la cita
+            day = timezone.localtime(row["start"], get_time_zone(row["workspace__time_zone"])).date()
+            by_day.setdefault(day, []).append({
+                "id": row["id"],
+                "start": row["start"],
+                "end": row["end"],
+                "status": row["status"],
+                "modality": row["modality"],
+                "client": row["client_id"],
+                "client_name": row["client__full_name"],
+                "service": row["service_id"],
+                "service_name": row["service__name"],
+                "professional": row["professional_id"],
+            })
+
+        days = [{"date": day, "appointments": appointments} for day, appointments in sorted(by_day.items())]
+        return Response({"start": start, "end": end, "days": days})
 
     def perform_create(self, serializer):
-        workspace = get_current_workspace_for_user(self.request.user)
+        workspace = get_tenant_context(self.request).current_workspace
         if not workspace:
             raise NotFound("No hay workspace asociado al usuario.")
 
         validated = serializer.validated_data
+        self.check_professional(workspace.pk, validated.get("professional"))
         professional = validated.get("professional") or self.request.user
         service = validated.get("service")
         start = validated["start"]
@@ -347,17 +533,167 @@ class AppointmentViewSet(viewsets.ModelViewSet):
 
         # Si no mandan 'end', lo calculamos
         if end is None:
-            minutes = 30
-            if service and service.default_duration_minutes:
-                minutes = service.default_duration_minutes
-            end = start + timedelta(minutes=minutes)
+            end = default_end(start, service)
 
-        serializer.save(
-            workspace=workspace,
-            professional=professional,
+        self.save_without_overlap(
+            serializer,
+            professional_id=professional.pk,
+            start=start,
             end=end,
+            status=validated.get("status", Appointment.STATUS_SCHEDULED),
+            save_kwargs={"workspace": workspace, "professional": professional, "end": end},
+        )
+
+    def perform_update(self, serializer):
+        instance = serializer.instance
+        validated = serializer.validated_data
+        professional = validated.get("professional", instance.professional)
+        if "professional" in validated:
+            self.check_professional(instance.workspace_id, professional)
+
+        self.save_without_overlap(
+            serializer,
+            professional_id=professional.pk if professional else None,
+            start=validated.get("start", instance.start),
+            end=validated.get("end", instance.end),
+            status=validated.get("status", instance.status),
+            exclude_id=instance.pk,
+        )
+
+    def check_professional(self, workspace_id, professional):
+        """El profesional asignado debe atender en el workspace de la cita."""
+        if professional and not is_workspace_staff(workspace_id, professional.pk):
+            raise ValidationError({"professional": "Profesional no encontrado en el workspace."})
+
+    def conflict_data(self, conflict):
+        # Un profesional puede atender en varios workspaces: la cita en
+        # conflicto solo se muestra si el usuario tiene acceso a la suya
+        if conflict is None or not get_tenant_context(self.request).has_access(conflict.workspace_id):
+            return None
+        return AppointmentSerializer(conflict).data
+
+    def save_without_overlap(self, serializer, professional_id, start, end, status, exclude_id=None, save_kwargs=None):
+        """
+        Guarda la cita solo si el profesional no tiene otra cita activa
+        traslapada; si la tiene responde 409 (con la cita en conflicto si es
+        de un workspace del usuario).
+        En Postgres la exclusion constraint cubre además las carreras entre
+        requests concurrentes.
+        """
+        error = span_error(start, end)
+        if error:
+            raise ValidationError({"end": error})
+
+        try:
+            with transaction.atomic():
+                if status not in FREE_STATUSES:
+                    conflict = find_conflict(professional_id, start, end, exclude_id=exclude_id)
+                    if conflict:
+                        raise AppointmentConflict(self.conflict_data(conflict))
+                return serializer.save(**(save_kwargs or {}))
+        except IntegrityError as exc:
+            if not is_overlap_violation(exc):
+                raise
+            conflict = find_conflict(professional_id, start, end, exclude_id=exclude_id)
+            raise AppointmentConflict(self.conflict_data(conflict))
+
+    @action(detail=False, methods=["post", "patch"], url_path="bulk")
+    def bulk(self, request):
+        """
+        POST  /api/appointments/bulk/  {"items": [{...}, ...]}          crea varias citas
+        PATCH /api/appointments/bulk/  {"items": [{"id": 1, ...}, ...]} edición parcial
+        Cada item se valida por separado; los válidos se guardan juntos en una
+        transacción (bulk_create / bulk_update). Responde el resultado por item.
+        """
+        payload = AppointmentBulkSerializer(data=request.data)
+        payload.is_valid(raise_exception=True)
+        items = payload.validated_data["items"]
+
+        if request.method == "POST":
+            workspace = get_tenant_context(request).current_workspace
+            if not workspace:
+                raise NotFound("No hay workspace asociado al usuario.")
+            results, saved = bulk_create_appointments(workspace, request.user, items)
+        else:
+            results, saved = bulk_update_appointments(self.get_queryset(), items)
+
+        return self.bulk_response(results, saved)
+
+    @action(detail=False, methods=["post"], url_path="bulk-status")
+    def bulk_status(self, request):
+        """
+        POST /api/appointments/bulk-status/  {"ids": [1, 2, 3], "status": "cancelled"}
+        Cambio de estado masivo en un solo UPDATE (ver Appointment.STATUS_TRANSITIONS).
+        """
+        payload = AppointmentBulkStatusSerializer(data=request.data)
+        payload.is_valid(raise_exception=True)
+        results = bulk_change_status(
+            self.get_queryset(), payload.validated_data["ids"], payload.validated_data["status"]
+        )
+        return self.bulk_response(results)
+
+    @staticmethod
+    def bulk_response(results, saved=()):
+        data = {appt.pk: item for appt, item in zip(saved, AppointmentSerializer(saved, many=True).data)}
+        for result in results:
+            if result["ok"] and result["id"] in data:
+                result["appointment"] = data[result["id"]]
+        failed = sum(1 for result in results if not result["ok"])
+        return Response({
+            "ok": len(results) - failed,
+            "failed": failed,
+            "results": results,
+        })
+
+    @action(detail=False, methods=["get"], url_path="availability")
+    def availability(self, request):
+        """
+        GET /api/appointments/availability/?service=<id>&date_from=YYYY-MM-DD&date_to=YYYY-MM-DD
+        Opcionales: professional (default: usuario actual), workspace, duration, step (minutos).
+        Regresa los horarios libres del profesional según su horario laboral
+        y sus citas no canceladas.
+        """
+        params = AvailabilityQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+
+        tenant = get_tenant_context(request)
+        workspace_id = request.query_params.get("workspace") or tenant.current_workspace_id
+        try:
+            workspace_id = int(workspace_id)
+        except (TypeError, ValueError):
+            raise NotFound("No hay workspace asociado al usuario.")
+        if not tenant.has_access(workspace_id):
+            raise NotFound("No hay workspace asociado al usuario.")
+        workspace = get_object_or_404(Workspace, pk=workspace_id)
+
+        duration = data.get("duration")
+        service = None
+        if data.get("service"):
+            service = get_object_or_404(Service, pk=data["service"], workspace=workspace)
+            duration = duration or service.default_duration_minutes
+        duration = duration or 30
+
+        professional_id = data.get("professional") or request.user.pk
+        if data.get("professional") and not is_workspace_staff(workspace.pk, professional_id):
+            raise NotFound("Profesional no encontrado en el workspace.")
+        slots = available_slots(
+            workspace,
+            professional_id,
+            data["date_from"],
+            data["date_to"],
+            duration_minutes=duration,
+            step_minutes=data["step"],
         )
 
+        return Response({
+            "workspace": workspace.id,
+            "professional": professional_id,
+            "service": service.id if service else None,
+            "duration_minutes": duration,
+            "slots": [{"start": start, "end": end} for start, end in slots],
+        })
+
     @action(detail=True, methods=["post"], url_path="video/join")
     def video_join(self, request, pk=None):
         appt = self.get_object()
@@ -386,12 +722,14 @@ class AppointmentViewSet(viewsets.ModelViewSet):
             "is_moderator": bool(is_moderator),
         })
 
-class ClientPortalAppointmentsView(APIView):
+class ClientPortalAppointmentsView(PaginatedAPIViewMixin, APIView):
     """
     GET /api/client-portal/appointments/
     Devuelve las citas del cliente autenticado (portal_user).
     """
     permission_classes = [IsAuthenticated]
+    allow_stateless_auth = True
+    ordering = ("start", "id")
 
     def get(self, request):
         user = request.user
@@ -403,20 +741,38 @@ class ClientPortalAppointmentsView(APIView):
         qs = (
             Appointment.objects
             .filter(client__in=clients)
-            .select_related("service")
+            .select_related("service", "professional")
             .order_by("start")
         )
 
-        serializer = ClientPortalAppointmentSerializer(qs, many=True)
-        return Response(serializer.data)
+        validators = conditional.validators(
+            request,
+            conditional.snapshot(qs, "service", "professional"),
+            conditional.objects_snapshot(c.workspace for c in clients),
+        )
+        not_modified = conditional.not_modified(request, validators)
+        if not_modified is not None:
+            return not_modified
+
+        # Los workspaces ya vienen cargados con los clientes (select_related):
+        # se adjuntan en memoria en vez de hacer un query por cita.
+        workspaces = {c.workspace_id: c.workspace for c in clients}
+        page = self.paginate_queryset(qs)
+        for appointment in page:
+            appointment.workspace = workspaces[appointment.workspace_id]
+
+        serializer = ClientPortalAppointmentSerializer(page, many=True)
+        return validators.apply(self.get_paginated_response(serializer.data))
 
 
-class ClientPortalConsultationsView(APIView):
+class ClientPortalConsultationsView(PaginatedAPIViewMixin, APIView):
     """
     GET /api/client-portal/consultations/
     Devuelve las consultas visibles para el cliente autenticado.
     """
     permission_classes = [IsAuthenticated]
+    allow_stateless_auth = True
+    ordering = ("-created_at", "-id")
 
     def get(self, request):
         user = request.user
@@ -431,23 +787,124 @@ class ClientPortalConsultationsView(APIView):
             .order_by("-created_at")
         )
 
-        serializer = ClientPortalConsultationSerializer(qs, many=True)
-        return Response(serializer.data)
+        validators = conditional.validators(request, qs)
+        not_modified = conditional.not_modified(request, validators)
+        if not_modified is not None:
+            return not_modified
+        return validators.apply(self.paginated_response(qs, ClientPortalConsultationSerializer))
+
+class AppointmentSeriesViewSet(viewsets.ModelViewSet):
+    """
+    /api/appointment-series/
+    Citas recurrentes. Se crean y consultan como cualquier recurso; editar o
+    cancelar es siempre "esta y las siguientes" (acciones following / cancel).
+    """
+    serializer_class = AppointmentSeriesSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    allow_stateless_auth = True
+    ordering = ("-created_at", "-id")
+    http_method_names = ["get", "post", "head", "options"]
+
+    def get_queryset(self):
+        return (
+            AppointmentSeries.objects
+            .for_tenant(get_tenant_context(self.request))
+            .select_related("client", "service")
+        )
+
+    def get_serializer_context(self):
+        # Las series nuevas van al workspace actual: sus FKs se validan contra él
+        context = super().get_serializer_context()
+        context["workspace_id"] = get_tenant_context(self.request).current_workspace_id
+        return context
+
+    def create(self, request, *args, **kwargs):
+        """
+        Crea la serie y materializa sus citas del horizonte inicial
+        (un bulk_create). Las ocurrencias con traslape se omiten y se
+        regresan en `skipped`.
+        """
+        workspace = get_tenant_context(request).current_workspace
+        if not workspace:
+            raise NotFound("No hay workspace asociado al usuario.")
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        validated = serializer.validated_data
+        service = validated.get("service")
+
+        # Si no mandan duración, la del servicio (o 30 min)
+        duration = validated.get("duration_minutes")
+        if not duration:
+            duration = service.default_duration_minutes if service and service.default_duration_minutes else 30
+
+        series = serializer.save(
+            workspace=workspace,
+            professional=validated.get("professional") or request.user,
+            duration_minutes=duration,
+        )
+        created, skipped = materialize_series(series.pk, max(series.start, timezone.now()) + SERIES_HORIZON)
+        series.refresh_from_db()
+
+        data = self.get_serializer(series).data
+        data.update({"materialized": created, "skipped": skipped})
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=["post"], url_path="following")
+    def following(self, request, pk=None):
+        """
+        POST /api/appointment-series/<id>/following/
+        {"start_from": "...", "start_time": "HH:MM", "duration_minutes": 50, ...}
+        Edita las citas pendientes desde `start_from` (un solo UPDATE); la
+        serie se parte y los cambios quedan en la serie nueva.
+        """
+        series = self.get_object()
+        params = AppointmentSeriesFollowingSerializer(data=request.data, context={"workspace_id": series.workspace_id})
+        params.is_valid(raise_exception=True)
+        changes = dict(params.validated_data)
+        since = changes.pop("start_from")
+
+        new_series, updated, conflicts = update_following(series, since, changes)
+        if conflicts:
+            raise AppointmentConflict({"starts": conflicts})
+        if new_series is None:
+            raise ValidationError({"start_from": "La serie no tiene citas a partir de esa fecha."})
+
+        return Response({
+            "series": AppointmentSeriesSerializer(new_series).data,
+            "updated": updated,
+        })
+
+    @action(detail=True, methods=["post"], url_path="cancel")
+    def cancel(self, request, pk=None):
+        """
+        POST /api/appointment-series/<id>/cancel/  {"start_from": "..."} (default: ahora)
+        Cancela las citas pendientes desde esa fecha y corta la serie.
+        """
+        series = self.get_object()
+        since = parse_range_param(request.data.get("start_from"), "start_from") or timezone.now()
+        cancelled = cancel_following(series, since)
+        return Response({
+            "series": AppointmentSeriesSerializer(series).data,
+            "cancelled": cancelled,
+        })
+
 
 class ConsultationViewSet(viewsets.ModelViewSet):
     serializer_class = ConsultationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    allow_stateless_auth = True
+    ordering = ("-created_at", "-id")
 
     def get_queryset(self):
-        user = self.request.user
-        return Consultation.objects.filter(
-            workspace__in=Workspace.objects.filter(
-                Q(owner=user) | Q(memberships__user=user)
-            )
-        ).select_related("client").distinct()
+        return (
+            Consultation.objects
+            .for_tenant(get_tenant_context(self.request))
+            .select_related("client")
+        )
 
     def perform_create(self, serializer):
-        workspace = get_current_workspace_for_user(self.request.user)
+        workspace = get_tenant_context(self.request).current_workspace
         if not workspace:
             raise NotFound("No hay workspace asociado al usuario.")
         professional = serializer.validated_data.get("professional") or self.request.user
@@ -460,36 +917,59 @@ class MyWorkspaceView(APIView):
     GET /api/me/workspace/
     """
     permission_classes = [permissions.IsAuthenticated]
+    allow_stateless_auth = True
 
     def get(self, request, *args, **kwargs):
-        workspace = get_current_workspace_for_user(request.user)
+        workspace = get_tenant_context(request).current_workspace
         if not workspace:
             raise NotFound("No hay workspace asociado a este usuario.")
+
+        # Se consulta en cada carga del frontend: 304 sin serializar si no cambió
+        validators = conditional.validators(request, (1, workspace.updated_at), extra=[workspace.pk])
+        not_modified = conditional.not_modified(request, validators)
+        if not_modified is not None:
+            return not_modified
+
         serializer = WorkspaceSerializer(
             workspace,
             context={"request": request},
         )
-        return Response(serializer.data)
+        return validators.apply(Response(serializer.data))
 
 
 class CaseFileViewSet(viewsets.ModelViewSet):
     serializer_class = CaseFileSerializer
     permission_classes = [permissions.IsAuthenticated]
+    allow_stateless_auth = True
+    ordering = ("-opened_at", "-id")
+    # ?ordering=activity -> actividad reciente (índice core_casefile_ws_activity)
+    orderings = {
+        "opened": ("-opened_at", "-id"),
+        "activity": ("-last_activity_at", "-id"),
+    }
+
+    def get_ordering(self):
+        key = self.request.query_params.get("ordering")
+        if key and key not in self.orderings:
+            raise ValidationError({"ordering": f"Usa: {', '.join(self.orderings)}."})
+        return self.orderings.get(key, self.ordering)
 
     def get_queryset(self):
-        user = self.request.user
-        qs = CaseFile.objects.filter(
-            workspace__in=get_allowed_workspaces_for_user(user)
-        ).select_related("client").annotate(events_count=Count("events")).distinct()
+        # Contadores y último evento ya vienen en la fila (core.casefile_stats)
+        qs = (
+            CaseFile.objects
+            .for_tenant(get_tenant_context(self.request))
+            .select_related("client")
+        )
 
         client_id = self.request.query_params.get("client")
         if client_id:
             qs = qs.filter(client_id=client_id)
 
-        return qs.order_by("-opened_at", "-id")
+        return qs.order_by(*self.get_ordering())
 
     def perform_create(self, serializer):
-        workspace = get_current_workspace_for_user(self.request.user)
+        workspace = get_tenant_context(self.request).current_workspace
         if not workspace:
             raise NotFound("No hay workspace asociado al usuario.")
 
@@ -503,13 +983,17 @@ class CaseFileViewSet(viewsets.ModelViewSet):
 class CaseEventViewSet(viewsets.ModelViewSet):
     serializer_class = CaseEventSerializer
     permission_classes = [permissions.IsAuthenticated]
+    allow_stateless_auth = True
     parser_classes = [JSONParser, FormParser, MultiPartParser]
+    ordering = ("-happened_at", "-id")
 
     def get_queryset(self):
-        user = self.request.user
-        qs = CaseEvent.objects.filter(
-            workspace__in=get_allowed_workspaces_for_user(user)
-        ).select_related("casefile", "appointment", "consultation").prefetch_related("attachments").distinct()
+        qs = (
+            CaseEvent.objects
+            .for_tenant(get_tenant_context(self.request))
+            .select_related("casefile", "appointment", "consultation")
+            .prefetch_related("attachments")
+        )
 
         casefile_id = self.request.query_params.get("casefile")
         if casefile_id:
@@ -518,7 +1002,7 @@ class CaseEventViewSet(viewsets.ModelViewSet):
         return qs.order_by("-happened_at", "-id")
 
     def perform_create(self, serializer):
-        workspace = get_current_workspace_for_user(self.request.user)
+        workspace = get_tenant_context(self.request).current_workspace
         if not workspace:
             raise NotFound("No hay workspace asociado al usuario.")
 
@@ -561,40 +1045,176 @@ class CaseEventViewSet(viewsets.ModelViewSet):
 
         created = []
         for f in files:
-            att = CaseAttachment.objects.create(
+            att = CaseAttachment(
                 workspace=workspace,
                 casefile=event.casefile,
                 event=event,
-                file=f,
                 original_name=getattr(f, "name", "") or "",
                 mime_type=getattr(f, "content_type", "") or "",
-                size_bytes=getattr(f, "size", 0) or 0,
                 uploaded_by=request.user,
                 is_private=is_private,
             )
+            # f.open() lo regresa desde el inicio: se lee para el hash y,
+            # si el contenido es nuevo, otra vez para guardarlo
+            content = store_attachment_content(att, f.open, att.original_name or "archivo")
+            att.size_bytes = content.size
+            att.save()
             created.append(att)
 
         ser = CaseAttachmentSerializer(created, many=True, context={"request": request})
         return Response(ser.data, status=status.HTTP_201_CREATED)
 
+    @action(detail=True, methods=["post"], url_path="uploads")
+    def start_upload(self, request, pk=None):
+        """
+        POST /api/caseevents/<id>/uploads/
+        JSON: {filename, size_bytes, part_size?, is_private?}
+        Inicia una subida por partes; después:
+          PUT  /api/attachment-uploads/<uuid>/parts/<n>/  (cuerpo = bytes de la parte)
+          POST /api/attachment-uploads/<uuid>/complete/
+        """
+        event = self.get_object()
+        ser = AttachmentUploadStartSerializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+        data = ser.validated_data
+
+        upload = start_upload(
+            event,
+            request.user,
+            original_name=data["filename"],
+            size_bytes=data["size_bytes"],
+            part_size=data.get("part_size"),
+            is_private=data["is_private"],
+        )
+        return Response(AttachmentUploadSerializer(upload).data, status=status.HTTP_201_CREATED)
+
 
 class CaseAttachmentViewSet(viewsets.ModelViewSet):
     serializer_class = CaseAttachmentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    allow_stateless_auth = True
     parser_classes = [FormParser, MultiPartParser]
+    ordering = ("-uploaded_at", "-id")
 
     def get_queryset(self):
-        user = self.request.user
-        return CaseAttachment.objects.filter(
-            workspace__in=get_allowed_workspaces_for_user(user)
-        ).select_related("casefile", "event").distinct()
+        return (
+            CaseAttachment.objects
+            .for_tenant(get_tenant_context(self.request))
+            .select_related("casefile", "event")
+        )
 
     def perform_create(self, serializer):
         # Recomiendo CREAR por el action de CaseEventViewSet para mantener coherencia.
         raise ValidationError("Usa /caseevents/<id>/attachments/ para subir archivos.")
 
-class ClientPortalCaseFilesView(APIView):
+    def perform_update(self, serializer):
+        upload = serializer.validated_data.pop("file", None)
+        attachment = serializer.save()
+        if upload is None:
+            return
+
+        # Reemplazo del archivo: mismo camino que una subida (blob por contenido)
+        previous_blob_id, previous_name = attachment.blob_id, attachment.file.name
+        content = store_attachment_content(attachment, upload.open, upload.name)
+        attachment.original_name = upload.name
+        attachment.mime_type = getattr(upload, "content_type", "") or attachment.mime_type
+        attachment.size_bytes = content.size
+        attachment.save()
+        if previous_blob_id:
+            release_blob(previous_blob_id)
+        elif previous_name and previous_name != attachment.file.name:
+            # Archivo propio (sin blob): nadie más lo usa
+            storage = attachment.file.storage
+            transaction.on_commit(lambda: storage.delete(previous_name))
+
+
+class CaseAttachmentDownloadView(APIView):
+    """
+    GET /api/caseattachments/<id>/download/  (opcional: download=1, variant=thumbnail|preview, token=<firmado>)
+    Descarga con permisos: equipo del workspace o, en el portal, el cliente
+    dueño del expediente (sin adjuntos privados ni eventos ocultos). Acepta
+    JWT o el token de corta vida que viene en file_url.
+    """
+    permission_classes = [AllowAny]
+    allow_stateless_auth = True
+
+    def get(self, request, pk):
+        attachment = get_object_or_404(
+            CaseAttachment.objects.select_related("event", "casefile__client", "blob"), pk=pk
+        )
+
+        token = request.query_params.get("token")
+        user_id = load_download_token(token, attachment.pk) if token else None
+        if user_id is not None:
+            user = get_user_model().objects.filter(pk=user_id, is_active=True).first()
+            if user is None:
+                raise NotFound("Adjunto no encontrado.")
+            tenant = TenantContext(user)
+        elif request.user.is_authenticated:
+            user_id = request.user.pk
+            tenant = get_tenant_context(request)
+        else:
+            raise NotAuthenticated()
+
+        # 404 y no 403: no revelar que el adjunto existe
+        if not can_download(tenant, user_id, attachment):
+            raise NotFound("Adjunto no encontrado.")
+
+        variant = request.query_params.get("variant") or None
+        if variant not in (None, "thumbnail", "preview") or (variant and not getattr(attachment, variant)):
+            raise NotFound("Adjunto no encontrado.")
+
+        as_attachment = request.query_params.get("download") in ("1", "true")
+        return serve_attachment(request, attachment, as_attachment=as_attachment, variant=variant)
+
+
+class AttachmentUploadViewSet(viewsets.GenericViewSet):
+    """
+    Subidas por partes iniciadas con POST /api/caseevents/<id>/uploads/.
+    Solo las ve quien las inició.
+
+    GET    /api/attachment-uploads/<uuid>/             estado y partes recibidas (para reanudar)
+    PUT    /api/attachment-uploads/<uuid>/parts/<n>/   sube (o reemplaza) la parte n
+    POST   /api/attachment-uploads/<uuid>/complete/    une las partes y crea el adjunto
+    DELETE /api/attachment-uploads/<uuid>/             cancela
+    """
+    serializer_class = AttachmentUploadSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        tenant = get_tenant_context(self.request)
+        return (
+            AttachmentUpload.objects
+            .filter(uploaded_by=self.request.user, workspace_id__in=tenant.workspace_ids)
+            .prefetch_related("parts")
+        )
+
+    def retrieve(self, request, pk=None):
+        return Response(self.get_serializer(self.get_object()).data)
+
+    def destroy(self, request, pk=None):
+        upload = self.get_object()
+        if upload.status == AttachmentUpload.STATUS_PENDING:
+            abort_upload(upload)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=True, methods=["put"], url_path=r"parts/(?P<index>\d+)")
+    def part(self, request, pk=None, index=None):
+        # El cuerpo se lee en bloques directo al storage: no pasa por parsers
+        upload = self.get_object()
+        part = save_part(upload, int(index), request.stream)
+        return Response({"index": part.index, "size_bytes": part.size_bytes})
+
+    @action(detail=True, methods=["post"], url_path="complete")
+    def complete(self, request, pk=None):
+        attachment = complete_upload(self.get_object())
+        ser = CaseAttachmentSerializer(attachment, context={"request": request})
+        return Response(ser.data, status=status.HTTP_201_CREATED)
+
+class ClientPortalCaseFilesView(PaginatedAPIViewMixin, APIView):
     permission_classes = [IsAuthenticated]
+    allow_stateless_auth = True
+    ordering = ("-opened_at", "-id")
 
     def get(self, request):
         user = request.user
@@ -604,12 +1224,20 @@ class ClientPortalCaseFilesView(APIView):
             raise NotFound("No se encontró un cliente asociado a este usuario.")
 
         qs = CaseFile.objects.filter(client__in=clients).order_by("-opened_at", "-id")
-        ser = ClientPortalCaseFileSerializer(qs, many=True, context={"request": request})
-        return Response(ser.data)
+
+        validators = conditional.validators(request, qs)
+        not_modified = conditional.not_modified(request, validators)
+        if not_modified is not None:
+            return not_modified
+        return validators.apply(
+            self.paginated_response(qs, ClientPortalCaseFileSerializer, context={"request": request})
+        )
 
 
-class ClientPortalCaseFileEventsView(APIView):
+class ClientPortalCaseFileEventsView(PaginatedAPIViewMixin, APIView):
     permission_classes = [IsAuthenticated]
+    allow_stateless_auth = True
+    ordering = ("-happened_at", "-id")
 
     def get(self, request, casefile_id):
         user = request.user
@@ -624,10 +1252,216 @@ class ClientPortalCaseFileEventsView(APIView):
 
         qs = (
             CaseEvent.objects
-            .filter(casefile=casefile, visible_to_client=True)
-            .prefetch_related("attachments")
+            .filter(casefile=casefile)
+            .portal_timeline()
             .order_by("-happened_at", "-id")
         )
 
-        ser = ClientPortalCaseEventSerializer(qs, many=True, context={"request": request})
-        return Response(ser.data)
+        # Los adjuntos llevan URLs firmadas con vigencia: token_epoch en la ETag
+        validators = conditional.validators(
+            request,
+            CaseEvent.objects.filter(casefile=casefile),
+            CaseAttachment.objects.filter(casefile=casefile),
+            extra=[token_epoch()],
+        )
+        not_modified = conditional.not_modified(request, validators)
+        if not_modified is not None:
+            return not_modified
+        return validators.apply(
+            self.paginated_response(qs, ClientPortalCaseEventSerializer, context={"request": request})
+        )
+
+
+
+class SearchView(APIView):
+    """
+    GET /api/search/?q=rodilla
+    Opcionales: type=client,consultation,caseevent  workspace=<id>  page_size  cursor
+    Búsqueda de texto completo en los workspaces del usuario (no en los que
+    solo es cliente), ordenada por relevancia y paginada por cursor.
+    """
+    permission_classes = [IsAuthenticated]
+    allow_stateless_auth = True
+    MIN_QUERY_LENGTH = 2
+
+    def get(self, request):
+        params = request.query_params
+        query = (params.get("q") or "").strip()
+        if len(query) < self.MIN_QUERY_LENGTH:
+            raise ValidationError({"q": f"Escribe al menos {self.MIN_QUERY_LENGTH} caracteres."})
+
+        kinds = [v for v in (params.get("type") or "").split(",") if v]
+        invalid = [v for v in kinds if v not in SEARCH_KINDS]
+        if invalid:
+            raise ValidationError({"type": f"Tipo inválido: {', '.join(invalid)}. Usa: {', '.join(SEARCH_KINDS)}."})
+
+        tenant = get_tenant_context(request)
+        workspace_ids = [ws for ws, role in tenant.roles.items() if role != WorkspaceMember.ROLE_CLIENT]
+        if params.get("workspace"):
+            try:
+                workspace_id = int(params["workspace"])
+            except ValueError:
+                raise ValidationError({"workspace": "Debe ser un id numérico."})
+            if workspace_id not in workspace_ids:
+                raise NotFound("Workspace no encontrado.")
+            workspace_ids = [workspace_id]
+
+        page_size = KeysetPagination().get_page_size(request)
+        after = decode_search_cursor(params["cursor"]) if params.get("cursor") else None
+        results = search(query, workspace_ids, kinds=kinds, after=after, limit=page_size + 1)
+
+        next_link = None
+        if len(results) > page_size:
+            results = results[:page_size]
+            next_link = replace_query_param(
+                request.build_absolute_uri(), "cursor", encode_search_cursor(results[-1])
+            )
+        return Response({"next": next_link, "results": results})
+
+
+class WorkspaceExportView(APIView):
+    """
+    GET /api/exports/<dataset>.<formato>?workspace=<id>&gzip=1
+    dataset: clients | appointments | consultations | caseevents
+    formato: csv | ndjson
+    Solo el dueño del workspace. Se genera en streaming con memoria constante.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, dataset, fmt):
+        if dataset not in EXPORTS or fmt not in EXPORT_FORMATS:
+            raise NotFound("Exportación no disponible.")
+
+        tenant = get_tenant_context(request)
+        workspace_id = request.query_params.get("workspace") or tenant.current_workspace_id
+        try:
+            workspace_id = int(workspace_id)
+        except (TypeError, ValueError):
+            raise NotFound("No hay workspace asociado al usuario.")
+        if tenant.role_for(workspace_id) != WorkspaceMember.ROLE_OWNER:
+            raise PermissionDenied("Solo el dueño del workspace puede exportar sus datos.")
+
+        compress = request.query_params.get("gzip") in ("1", "true")
+        filename = f"workspace-{workspace_id}-{dataset}-{timezone.localdate():%Y%m%d}.{fmt}"
+        if compress:
+            filename += ".gz"
+
+        response = StreamingHttpResponse(
+            iter_export(workspace_id, dataset, fmt, compress=compress),
+            content_type="application/gzip" if compress else EXPORT_FORMATS[fmt],
+        )
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        response["Cache-Control"] = "no-store"
+        return response
+
+
+class CalendarFeedLinksView(APIView):
+    """
+    GET  /api/calendar/feeds/  URLs (firmadas) de los feeds ICS a los que el
+         usuario puede suscribirse desde Google Calendar / Outlook / Apple Calendar.
+    POST /api/calendar/feeds/  rota el secreto de los feeds: las URLs
+         anteriores dejan de funcionar; responde las nuevas.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        feed_secret(request.user, rotate=True)
+        return self.get(request)
+
+    def get(self, request):
+        user = request.user
+        tenant = get_tenant_context(request)
+
+        def feed_url(kind, workspace_id=None):
+            token = make_feed_token(kind, user, workspace_id)
+            return request.build_absolute_uri(reverse("calendar-feed", args=[token]))
+
+        professional = []
+        workspace = []
+        for workspace_id, role in tenant.roles.items():
+            professional.append({"workspace": workspace_id, "url": feed_url(FEED_PROFESSIONAL, workspace_id)})
+            if role != WorkspaceMember.ROLE_CLIENT:
+                workspace.append({"workspace": workspace_id, "url": feed_url(FEED_WORKSPACE, workspace_id)})
+
+        client = None
+        if get_portal_clients_for_user(user).exists():
+            client = feed_url(FEED_CLIENT)
+
+        return Response({"professional": professional, "workspace": workspace, "client": client})
+
+
+class AppointmentCalendarFeedView(View):
+    """
+    GET /api/calendar/<token>.ics
+    Feed ICS público (protegido por el token firmado). Se genera en streaming
+    y responde 304 si el calendario no cambió (ETag / Last-Modified).
+    """
+    FEED_PAST_DAYS = 180
+    CACHE_CONTROL = "private, max-age=300"
+
+    def get(self, request, token):
+        payload = load_feed_token(token)
+        if payload is None:
+            raise Http404("Feed no encontrado.")
+
+        # Se revalida el acceso en cada request (membresías pudieron cambiar)
+        user = User.objects.filter(pk=payload["u"], is_active=True).first()
+        if user is None or not is_current_feed(payload, user):
+            raise Http404("Feed no encontrado.")
+
+        kind = payload["k"]
+        qs = Appointment.objects.filter(start__gte=timezone.now() - timedelta(days=self.FEED_PAST_DAYS))
+
+        if kind == FEED_CLIENT:
+            qs = qs.filter(client__in=list(get_portal_clients_for_user(user)))
+            name = "Mis citas"
+        else:
+            workspace_id = payload.get("w")
+            if not TenantContext(user).has_access(workspace_id):
+                raise Http404("Feed no encontrado.")
+            qs = qs.filter(workspace_id=workspace_id)
+            if kind == FEED_PROFESSIONAL:
+                qs = qs.filter(professional_id=user.pk)
+            name = "Agenda"
+
+        # Validadores baratos: un solo aggregate; incluye el updated_at de
+        # cliente, servicio y workspace porque sus nombres van en el feed
+        validators = conditional.validators(request, conditional.snapshot(qs, "client", "service", "workspace"))
+        not_modified = conditional.not_modified(request, validators)
+        if not_modified is not None:
+            not_modified["Cache-Control"] = self.CACHE_CONTROL
+            return not_modified
+
+        rows = (
+            qs.order_by("start", "id")
+            .values(
+                "id", "start", "end", "status", "updated_at", "notes_for_client",
+                "client__full_name", "service__name", "workspace__name",
+            )
+            .iterator(chunk_size=500)
+        )
+        response = StreamingHttpResponse(
+            iter_calendar(self.feed_rows(rows, kind), name, request.get_host()),
+            content_type="text/calendar; charset=utf-8",
+        )
+        validators.apply(response)
+        response["Cache-Control"] = self.CACHE_CONTROL
+        return response
+
+    @staticmethod
+    def feed_rows(rows, kind):
+        for row in rows:
+            service = row["service__name"] or "Cita"
+            if kind == FEED_CLIENT:
+                summary = f"{service} - {row['workspace__name']}"
+            else:
+                summary = f"{row['client__full_name']} - {service}"
+            yield {
+                "id": row["id"],
+                "start": row["start"],
+                "end": row["end"],
+                "status": row["status"],
+                "updated_at": row["updated_at"],
+                "summary": summary,
+                "description": row["notes_for_client"],
+            }
@@ -0,0 +1,75 @@
+# users/authentication.py
+from django.utils.functional import cached_property
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from .tokens import (
+    CLAIM_ROLE,
+    CLAIM_SUPERUSER,
+    CLAIM_TENANT_VERSION,
+    CLAIM_WORKSPACE_ROLES,
+    get_tenant_version,
+    tenant_claims_enabled,
+)
+
+
+class TenantTokenUser(TokenUser):
+    """
+    Usuario "stateless" construido desde los claims de tenant del token.
+    TenantContext usa `tenant_roles` en vez de consultar la base.
+    """
+
+    @cached_property
+    def id(self):
+        return int(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def pk(self):
+        return self.id
+
+    @property
+    def role(self):
+        return self.token.get(CLAIM_ROLE)
+
+    @property
+    def is_superuser(self):
+        return bool(self.token.get(CLAIM_SUPERUSER))
+
+    @property
+    def tenant_roles(self):
+        return {int(workspace_id): role for workspace_id, role in self.token[CLAIM_WORKSPACE_ROLES].items()}
+
+
+class TenantJWTAuthentication(JWTAuthentication):
+    """
+    Igual que JWTAuthentication, pero en requests de lectura (GET/HEAD/OPTIONS)
+    a vistas con `allow_stateless_auth = True` y claims de tenant vigentes no
+    carga el usuario de `users_user`.
+    Si la versión de los claims ya no coincide (cambió alguna membresía),
+    los claims se ignoran y se carga el usuario normalmente.
+    """
+
+    def authenticate(self, request):
+        view = (getattr(request, "parser_context", None) or {}).get("view")
+        self.allow_stateless = (
+            request.method in SAFE_METHODS
+            and getattr(view, "allow_stateless_auth", False)
+        )
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        if getattr(self, "allow_stateless", False) and self.has_current_claims(validated_token):
+            return TenantTokenUser(validated_token)
+        return super().get_user(validated_token)
+
+    def has_current_claims(self, validated_token):
+        if not tenant_claims_enabled():
+            return False
+        if CLAIM_TENANT_VERSION not in validated_token or CLAIM_WORKSPACE_ROLES not in validated_token:
+            return False
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return False
+        return get_tenant_version(user_id) == validated_token[CLAIM_TENANT_VERSION]
@@ -0,0 +1,31 @@
+# users/checks.py
+from django.conf import settings
+from django.core.checks import Error, register
+
+# Backends cuyo contenido no se comparte entre procesos
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+)
+
+
+@register()
+def tenant_claims_cache_check(app_configs, **kwargs):
+    """
+    Con JWT_TENANT_CLAIMS la vigencia de los claims se lee del cache: si
+    cada worker tiene el suyo, bump_tenant_version solo limpia el del
+    proceso que atendió el cambio y los demás siguen aceptando tokens
+    revocados hasta que expira la entrada.
+    """
+    if not getattr(settings, "JWT_TENANT_CLAIMS", False):
+        return []
+    backend = settings.CACHES.get("default", {}).get("BACKEND", "")
+    if backend in PROCESS_LOCAL_CACHES:
+        return [
+            Error(
+                "JWT_TENANT_CLAIMS requiere un cache compartido entre procesos.",
+                hint="Configura REDIS_URL (o CACHES['default']) o desactiva JWT_TENANT_CLAIMS.",
+                obj=backend,
+                id="users.E001",
+            )
+        ]
+    return []
@@ -0,0 +1,96 @@
+# users/identity.py
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import F, OuterRef, Q, Subquery
+
+from core.models import Workspace, Client
+
+IDENTITY_CACHE_TIMEOUT = 60 * 10
+
+
+def identity_cache_key(user_id, version):
+    return f"users:identity:{user_id}:{version}"
+
+
+def resolve_identity(user):
+    """
+    Rol "global", workspace principal (slug) y su nombre para /me.
+    Se calcula con un solo query anotado y se cachea por usuario y
+    `identity_version`. La versión vive en users_user (llega con el usuario
+    de la request): al incrementarla, todos los procesos dejan de leer la
+    entrada vieja aunque el cache sea local a cada proceso.
+    """
+    version = getattr(user, "identity_version", None)
+    if version is None:
+        # Usuario sin versión cargada (p. ej. el stateless del token)
+        return compute_identity(user.pk)
+
+    key = identity_cache_key(user.pk, version)
+    identity = cache.get(key)
+    if identity is None:
+        identity = compute_identity(user.pk)
+        cache.set(key, identity, IDENTITY_CACHE_TIMEOUT)
+    return identity
+
+
+def compute_identity(user_id):
+    User = get_user_model()
+
+    owned = Workspace.objects.filter(owner=OuterRef("pk")).order_by("pk")
+    member = Workspace.objects.filter(memberships__user=OuterRef("pk")).order_by("pk")
+    portal = Client.objects.filter(portal_user=OuterRef("pk"), is_active=True).order_by("pk")
+
+    row = (
+        User.objects
+        .filter(pk=user_id)
+        .annotate(
+            owned_slug=Subquery(owned.values("slug")[:1]),
+            owned_name=Subquery(owned.values("name")[:1]),
+            member_slug=Subquery(member.values("slug")[:1]),
+            member_name=Subquery(member.values("name")[:1]),
+            portal_slug=Subquery(portal.values("workspace__slug")[:1]),
+            portal_name=Subquery(portal.values("workspace__name")[:1]),
+        )
+        .values(
+            "owned_slug", "owned_name",
+            "member_slug", "member_name",
+            "portal_slug", "portal_name",
+        )
+        .first()
+    ) or {}
+
+    # Profesional si es owner de un workspace; cliente si está ligado como
+    # portal_user en un Client activo
+    if row.get("owned_slug"):
+        role = "professional"
+    elif row.get("portal_slug"):
+        role = "client"
+    else:
+        role = "unknown"
+
+    # Workspace principal: propio, luego como miembro, luego como cliente
+    for prefix in ("owned", "member", "portal"):
+        if row.get(f"{prefix}_slug"):
+            return {
+                "role": role,
+                "workspace_slug": row[f"{prefix}_slug"],
+                "workspace_name": row[f"{prefix}_name"],
+            }
+
+    return {"role": role, "workspace_slug": None, "workspace_name": None}
+
+
+def invalidate_identity(user_ids=(), workspace_id=None):
+    """
+    Incrementa identity_version (un UPDATE) de los usuarios dados y, con
+    `workspace_id`, de todos los miembros y clientes del portal de ese
+    workspace.
+    """
+    condition = Q(pk__in={user_id for user_id in user_ids if user_id})
+    if workspace_id is not None:
+        condition |= Q(workspace_memberships__workspace_id=workspace_id)
+        condition |= Q(portal_client_profiles__workspace_id=workspace_id)
+    User = get_user_model()
+    User.objects.filter(pk__in=User.objects.filter(condition).values("pk")).update(
+        identity_version=F("identity_version") + 1
+    )
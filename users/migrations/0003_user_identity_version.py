@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-17 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_tenant_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='identity_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
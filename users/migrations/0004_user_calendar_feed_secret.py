@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-17 03:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_identity_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='calendar_feed_secret',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+    ]
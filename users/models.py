@@ -6,6 +6,8 @@ from django.contrib.auth.models import (
     BaseUserManager,
 )
 
+from core.tracking import TrackedFieldsMixin
+
 
 class UserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
@@ -30,7 +32,7 @@ class UserManager(BaseUserManager):
         return self.create_user(email, password, **extra_fields)
 
 
-class User(AbstractBaseUser, PermissionsMixin):
+class User(TrackedFieldsMixin, AbstractBaseUser, PermissionsMixin):
     ROLE_SYSTEM_ADMIN = "system_admin"
     ROLE_PROFESSIONAL = "professional"
     ROLE_STAFF = "staff"
@@ -55,12 +57,26 @@ class User(AbstractBaseUser, PermissionsMixin):
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
     date_joined = models.DateTimeField(auto_now_add=True)
+    # Validadores de GET condicional donde se muestra el nombre (core.conditional)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Se incrementa cuando cambian membresías/rol; invalida los claims de
+    # tenant embebidos en los access tokens ya emitidos
+    tenant_version = models.PositiveIntegerField(default=0, editable=False)
+    # Se incrementa cuando cambia lo que muestra /me (workspace principal);
+    # forma parte de la llave de cache (ver users.identity)
+    identity_version = models.PositiveIntegerField(default=0, editable=False)
+    # Va dentro de las URLs de los feeds ICS (core.ics); rotarlo invalida
+    # las suscripciones ya compartidas
+    calendar_feed_secret = models.CharField(max_length=64, blank=True, default="", editable=False)
 
     objects = UserManager()
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["full_name"]
 
+    # Rol/superuser/activo también viajan (o dependen) del token (users.signals)
+    TRACKED_FIELDS = ("role", "is_superuser", "is_active")
+
     class Meta:
         verbose_name = "Usuario"
         verbose_name_plural = "Usuarios"
@@ -2,7 +2,10 @@ from rest_framework import serializers
 from django.db import transaction
 from django.contrib.auth import get_user_model
 from .models import User
-from core.models import Workspace, WorkspaceMember, Client
+from core.models import Workspace, WorkspaceMember
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from .identity import resolve_identity
+from .tokens import TenantRefreshToken
 
 User = get_user_model()
 
@@ -22,50 +25,25 @@ class MeSerializer(serializers.ModelSerializer):
             "workspace_name",
         ]
 
+    # Rol, workspace principal y su nombre salen de un solo query cacheado
+    # (ver users.identity.resolve_identity)
+    def _identity(self, obj):
+        if getattr(self, "_identity_user_id", None) != obj.pk:
+            self._identity_user_id = obj.pk
+            self._identity_data = resolve_identity(obj)
+        return self._identity_data
+
     # 1) Rol "global" del usuario
     def get_role(self, obj):
-        # Profesional si es owner o miembro de un workspace
-        if Workspace.objects.filter(owner=obj).exists():
-            return "professional"
-
-        if WorkspaceMember.objects.filter(
-            workspace__owner=obj
-        ).exists():
-            return "professional"
-
-        # Cliente si está ligado como portal_user en Client
-        if Client.objects.filter(portal_user=obj, is_active=True).exists():
-            return "client"
-
-        return "unknown"
+        return self._identity(obj)["role"]
 
     # 2) workspace_slug principal
     def get_workspace_slug(self, obj):
-        # Profesional: primer workspace donde es owner o miembro
-        ws = Workspace.objects.filter(owner=obj).first()
-        if not ws:
-            ws = Workspace.objects.filter(memberships__user=obj).first()
-        if ws:
-            return ws.slug
-
-        # Cliente: workspace del cliente
-        client = (
-            Client.objects.select_related("workspace")
-            .filter(portal_user=obj, is_active=True)
-            .first()
-        )
-        if client and client.workspace:
-            return client.workspace.slug
-
-        return None
+        return self._identity(obj)["workspace_slug"]
 
     # 3) nombre del workspace (solo para comodidad de front)
     def get_workspace_name(self, obj):
-        ws_slug = self.get_workspace_slug(obj)
-        if not ws_slug:
-            return None
-        ws = Workspace.objects.filter(slug=ws_slug).first()
-        return ws.name if ws else None
+        return self._identity(obj)["workspace_name"]
 
 
 class RegisterProfessionalSerializer(serializers.Serializer):
@@ -150,4 +128,12 @@ class PasswordResetTestSerializer(serializers.Serializer):
             raise serializers.ValidationError({
                 "confirm_password": "Las contraseñas no coinciden."
             })
-        return attrs
\ No newline at end of file
+        return attrs
+
+class TenantTokenObtainPairSerializer(TokenObtainPairSerializer):
+    # access token con claims de tenant (ver users.tokens)
+    token_class = TenantRefreshToken
+
+
+class TenantTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = TenantRefreshToken
@@ -0,0 +1,55 @@
+# users/signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from core.models import Workspace, WorkspaceMember, Client
+from .identity import invalidate_identity
+from .models import User
+from .tokens import bump_tenant_version
+
+
+# Valores previos: TrackedFieldsMixin (core.tracking), sin consultar en cada save
+@receiver(post_save, sender=Workspace)
+def workspace_saved(sender, instance, created, **kwargs):
+    # slug/nombre/owner se muestran en /me del owner, miembros y clientes del portal
+    if not created and not instance.tracked_changes() & {"owner_id", "slug", "name"}:
+        return
+    previous_owner_id = instance.previous_values().get("owner_id")
+    invalidate_identity([instance.owner_id, previous_owner_id], workspace_id=instance.pk)
+
+    # Nuevo dueño => cambian los workspaces del token
+    if created or previous_owner_id != instance.owner_id:
+        bump_tenant_version([instance.owner_id, previous_owner_id])
+
+
+@receiver(post_delete, sender=Workspace)
+def workspace_deleted(sender, instance, **kwargs):
+    # Miembros y clientes se borran en cascada y disparan sus propias señales
+    invalidate_identity([instance.owner_id])
+    bump_tenant_version([instance.owner_id])
+
+
+@receiver(post_save, sender=WorkspaceMember)
+@receiver(post_delete, sender=WorkspaceMember)
+def workspace_member_changed(sender, instance, **kwargs):
+    invalidate_identity([instance.user_id])
+    bump_tenant_version([instance.user_id])
+
+
+@receiver(post_save, sender=Client)
+def client_saved(sender, instance, **kwargs):
+    invalidate_identity([instance.portal_user_id, instance.previous_values().get("portal_user_id")])
+
+
+@receiver(post_delete, sender=Client)
+def client_deleted(sender, instance, **kwargs):
+    invalidate_identity([instance.portal_user_id])
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    # Rol/superuser/activo también viajan (o dependen) del token
+    if not created and instance.tracked_changes():
+        bump_tenant_version([instance.pk])
+        instance.refresh_from_db(fields=["tenant_version"])
+        instance.refresh_from_db(fields=["tenant_version"])
@@ -1,3 +1,151 @@
-from django.test import TestCase
+from django.contrib.auth.models import update_last_login
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from core.models import Client, Workspace, WorkspaceMember
+from .checks import tenant_claims_cache_check
+from .identity import identity_cache_key
+from .models import User
+
+
+class IdentityCacheTests(TestCase):
+    """
+    /me se cachea por usuario e identity_version: un cambio en otro proceso
+    (otro cache local) se nota porque la versión viene de la base.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(email="pro@example.com", password="pass12345", full_name="Pro")
+        self.workspace = Workspace.objects.create(owner=self.owner, name="Clínica", slug="clinica")
+        self.portal_user = User.objects.create_user(
+            email="cliente@example.com", password="pass12345", role=User.ROLE_CLIENT
+        )
+        Client.objects.create(workspace=self.workspace, full_name="Cliente", portal_user=self.portal_user)
+        self.api = APIClient()
+
+    def me(self, user):
+        self.api.force_authenticate(User.objects.get(pk=user.pk))
+        response = self.api.get("/api/users/me/")
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_roles_and_workspace(self):
+        self.assertEqual(self.me(self.owner)["role"], "professional")
+        data = self.me(self.portal_user)
+        self.assertEqual((data["role"], data["workspace_slug"]), ("client", "clinica"))
+
+    def test_rename_invalidates_without_deleting_cache(self):
+        self.assertEqual(self.me(self.portal_user)["workspace_name"], "Clínica")
+        stale_key = identity_cache_key(self.portal_user.pk, User.objects.get(pk=self.portal_user.pk).identity_version)
+
+        workspace = Workspace.objects.get(pk=self.workspace.pk)
+        workspace.name = "Clínica Norte"
+        workspace.save()
+
+        # La entrada vieja sigue en cache (como en otro worker) pero ya no se lee
+        self.assertIsNotNone(cache.get(stale_key))
+        self.assertEqual(self.me(self.portal_user)["workspace_name"], "Clínica Norte")
+        self.assertEqual(self.me(self.owner)["workspace_name"], "Clínica Norte")
+
+    def test_save_without_identity_changes_keeps_version(self):
+        versions = dict(User.objects.values_list("pk", "identity_version"))
+        workspace = Workspace.objects.get(pk=self.workspace.pk)
+        workspace.primary_color = "#000000"
+        # Solo el UPDATE: los valores previos vienen de from_db
+        with self.assertNumQueries(1):
+            workspace.save()
+        self.assertEqual(dict(User.objects.values_list("pk", "identity_version")), versions)
+
+    def test_new_membership_changes_identity(self):
+        staff = User.objects.create_user(email="staff@example.com", password="pass12345", role=User.ROLE_STAFF)
+        self.assertIsNone(self.me(staff)["workspace_slug"])
+        WorkspaceMember.objects.create(workspace=self.workspace, user=staff, role="assistant")
+        self.assertEqual(self.me(staff)["workspace_slug"], "clinica")
+
+
+@override_settings(JWT_TENANT_CLAIMS=True)
+class TenantClaimsTests(TestCase):
+    """Lecturas autenticadas solo con los claims del token y su revocación."""
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(email="pro@example.com", password="pass12345", full_name="Pro")
+        self.workspace = Workspace.objects.create(owner=self.owner, name="Clínica", slug="clinica")
+        WorkspaceMember.objects.create(workspace=self.workspace, user=self.owner, role=WorkspaceMember.ROLE_OWNER)
+        Client.objects.create(workspace=self.workspace, full_name="Juan Pérez")
+        self.api = APIClient()
+        response = self.api.post("/api/auth/token/", {"email": "pro@example.com", "password": "pass12345"})
+        self.assertEqual(response.status_code, 200)
+        self.refresh = response.data["refresh"]
+        self.api.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+    def list_clients(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.api.get("/api/clients/")
+        self.assertEqual(response.status_code, 200)
+        loaded_user = any("users_user" in query["sql"] for query in ctx.captured_queries)
+        return [row["full_name"] for row in response.data["results"]], loaded_user
+
+    def test_stateless_read(self):
+        self.assertEqual(self.list_clients(), (["Juan Pérez"], False))
+
+    def test_version_cache_miss_falls_back_to_database(self):
+        cache.clear()
+        names, loaded_user = self.list_clients()
+        self.assertEqual(names, ["Juan Pérez"])
+        # El miss lee solo tenant_version; los roles siguen saliendo del token
+        self.assertTrue(loaded_user)
+        self.assertEqual(self.list_clients(), (["Juan Pérez"], False))
+
+    def test_membership_change_revokes_claims(self):
+        other = User.objects.create_user(email="otro@example.com", password="pass12345")
+        workspace = Workspace.objects.create(owner=other, name="Otra", slug="otra")
+        Client.objects.create(workspace=workspace, full_name="Ana López")
+        WorkspaceMember.objects.create(workspace=workspace, user=self.owner, role="assistant")
+
+        # El token viejo ya no vale para lecturas stateless: se carga el usuario
+        names, loaded_user = self.list_clients()
+        self.assertEqual(sorted(names), ["Ana López", "Juan Pérez"])
+        self.assertTrue(loaded_user)
+
+        response = self.api.post("/api/auth/token/refresh/", {"refresh": self.refresh})
+        self.api.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        names, loaded_user = self.list_clients()
+        self.assertEqual(sorted(names), ["Ana López", "Juan Pérez"])
+        self.assertFalse(loaded_user)
+
+    def test_role_change_bumps_version_without_reloading(self):
+        user = User.objects.get(pk=self.owner.pk)
+        version = user.tenant_version
+        # Login: solo el UPDATE de last_login (los claims previos vienen de from_db)
+        with self.assertNumQueries(1):
+            update_last_login(None, user)
+        self.assertEqual(User.objects.get(pk=user.pk).tenant_version, version)
+
+        user.role = User.ROLE_STAFF
+        user.save()
+        self.assertEqual(user.tenant_version, version + 1)
+
+        # Instancia sin los campos cargados: se consulta una vez antes de guardar
+        user = User.objects.only("email").get(pk=user.pk)
+        user.is_active = False
+        user.save()
+        self.assertEqual(user.tenant_version, version + 2)
+
+    @override_settings(JWT_TENANT_CLAIMS=False)
+    def test_disabled_always_loads_user(self):
+        self.assertEqual(self.list_clients(), (["Juan Pérez"], True))
+
+    def test_check_requires_shared_cache(self):
+        local = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+        shared = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://localhost"}}
+        with override_settings(CACHES=local):
+            self.assertEqual([error.id for error in tenant_claims_cache_check(None)], ["users.E001"])
+        with override_settings(CACHES=shared):
+            self.assertEqual(tenant_claims_cache_check(None), [])
+        with override_settings(CACHES=local, JWT_TENANT_CLAIMS=False):
+            self.assertEqual(tenant_claims_cache_check(None), [])
@@ -0,0 +1,94 @@
+# users/tokens.py
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import F
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+TENANT_VERSION_CACHE_TIMEOUT = 60 * 60
+
+# Claims de tenant embebidos en el access token
+CLAIM_TENANT_VERSION = "tv"
+CLAIM_ROLE = "role"
+CLAIM_SUPERUSER = "su"
+CLAIM_WORKSPACES = "ws"
+CLAIM_WORKSPACE_ROLES = "wsr"
+
+
+def tenant_claims_enabled():
+    return getattr(settings, "JWT_TENANT_CLAIMS", False)
+
+
+def tenant_version_cache_key(user_id):
+    return f"users:tenant_version:{user_id}"
+
+
+def get_tenant_version(user_id):
+    """
+    Versión vigente de los claims de tenant del usuario.
+    Se lee del cache; solo en un miss se consulta la tabla de usuarios.
+    """
+    key = tenant_version_cache_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = (
+            get_user_model().objects
+            .filter(pk=user_id)
+            .values_list("tenant_version", flat=True)
+            .first()
+        )
+        if version is None:
+            return None
+        cache.set(key, version, TENANT_VERSION_CACHE_TIMEOUT)
+    return version
+
+
+def bump_tenant_version(user_ids):
+    user_ids = {user_id for user_id in user_ids if user_id}
+    if not user_ids:
+        return
+    get_user_model().objects.filter(pk__in=user_ids).update(tenant_version=F("tenant_version") + 1)
+    cache.delete_many([tenant_version_cache_key(user_id) for user_id in user_ids])
+
+
+def tenant_claims_for_user(user):
+    # Import local: core.tenancy importa modelos de core
+    from core.tenancy import TenantContext
+
+    roles = TenantContext(user).roles
+    # Deja la versión en cache para que las lecturas no toquen users_user
+    cache.set(tenant_version_cache_key(user.pk), user.tenant_version, TENANT_VERSION_CACHE_TIMEOUT)
+    return {
+        CLAIM_TENANT_VERSION: user.tenant_version,
+        CLAIM_ROLE: user.role,
+        CLAIM_SUPERUSER: bool(user.is_superuser),
+        CLAIM_WORKSPACES: sorted(roles),
+        CLAIM_WORKSPACE_ROLES: {str(workspace_id): role for workspace_id, role in roles.items()},
+    }
+
+
+class TenantRefreshToken(RefreshToken):
+    """
+    Refresh token cuyos access tokens llevan los claims de tenant
+    (si JWT_TENANT_CLAIMS está activo). Los claims se recalculan en cada
+    refresh, nunca se copian del refresh token.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token._tenant_user = user
+        return token
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        if tenant_claims_enabled():
+            user = getattr(self, "_tenant_user", None)
+            if user is None:
+                user = get_user_model().objects.get(
+                    **{api_settings.USER_ID_FIELD: self[api_settings.USER_ID_CLAIM]}
+                )
+            access.payload.update(tenant_claims_for_user(user))
+        return access